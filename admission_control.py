@@ -0,0 +1,201 @@
+"""
+LLMCalladmission控制
+限制同时发往AI服务商的request数，超出部分进入有界waiting队列，
+队列已满或waitingtimeout时立即拒绝，避免所有user一起等满300s timeout
+"""
+
+import asyncio
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterator, AsyncIterator
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class AdmissionRejected(Exception):
+    """admission被拒绝：waiting队列已满或排队timeout"""
+
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.message = message
+        self.reason = reason  # "queue_full" | "timeout"
+
+@dataclass
+class AdmissionTicket:
+    """已获得的执行slot"""
+    controller: str
+    wait_time: float
+    queued: bool
+
+class _Waiter:
+    """排队中的request，wake由sync/async两种waiting方式各自提供"""
+
+    __slots__ = ("wake", "granted")
+
+    def __init__(self, wake: Callable[[], None]):
+        self.wake = wake
+        self.granted = False
+
+class AdmissionController:
+    """有界并发 + 有界队列 + 排队deadline
+
+    内部只用threading.Lock保护状态，因此同一个实例可以同时服务
+    Gradio事件循环、后台事件循环和普通线程。
+    """
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters: Deque[_Waiter] = deque()
+
+        self._admitted = 0
+        self._rejected_queue_full = 0
+        self._rejected_timeout = 0
+        self._peak_queue_depth = 0
+        self._wait_times: Deque[float] = deque(maxlen=1000)
+
+    def _try_enter(self, waiter: _Waiter) -> bool:
+        """有空闲slot时直接占用；否则入队，队列已满则拒绝"""
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not self._waiters:
+                self._in_flight += 1
+                return True
+            if len(self._waiters) >= self.max_queue:
+                self._rejected_queue_full += 1
+                raise AdmissionRejected(
+                    f"当前Generaterequest过多（{self._in_flight} 个执行中，{len(self._waiters)} 个排队），请稍后重试",
+                    "queue_full"
+                )
+            self._waiters.append(waiter)
+            self._peak_queue_depth = max(self._peak_queue_depth, len(self._waiters))
+            return False
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """waiting方放弃排队；返回True表示slot已在放弃前移交给它"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+            return False
+
+    def _admit(self, start: float, queued: bool) -> AdmissionTicket:
+        wait_time = time.monotonic() - start
+        with self._lock:
+            self._admitted += 1
+            self._wait_times.append(wait_time)
+        if queued:
+            logger.info(f"🎟️ [{self.name}] 排队 {wait_time:.2f}s 后获得执行slot")
+        return AdmissionTicket(controller=self.name, wait_time=wait_time, queued=queued)
+
+    def _timeout_error(self) -> AdmissionRejected:
+        with self._lock:
+            self._rejected_timeout += 1
+        logger.warning(f"⏰ [{self.name}] 排队超过 {self.queue_timeout:.0f}s，拒绝request")
+        return AdmissionRejected(
+            f"AI服务繁忙，排队超过 {self.queue_timeout:.0f}s，请稍后重试",
+            "timeout"
+        )
+
+    def release(self):
+        """释放slot：有排队者时直接移交，否则归还"""
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.wake()
+            else:
+                self._in_flight -= 1
+
+    @contextmanager
+    def slot(self) -> Iterator[AdmissionTicket]:
+        """同步获取执行slot"""
+        start = time.monotonic()
+        event = threading.Event()
+        waiter = _Waiter(event.set)
+        queued = not self._try_enter(waiter)
+        if queued and not event.wait(self.queue_timeout):
+            if not self._abandon(waiter):
+                raise self._timeout_error()
+
+        ticket = self._admit(start, queued)
+        try:
+            yield ticket
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def async_slot(self) -> AsyncIterator[AdmissionTicket]:
+        """异步获取执行slot，排队期间只挂起协程"""
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(True))
+
+        waiter = _Waiter(wake)
+        queued = not self._try_enter(waiter)
+        if queued:
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+            except asyncio.TimeoutError:
+                if not self._abandon(waiter):
+                    raise self._timeout_error()
+            except asyncio.CancelledError:
+                # 排队期间被取消：若slot已移交则立即转给下一个
+                if self._abandon(waiter):
+                    self.release()
+                raise
+
+        ticket = self._admit(start, queued)
+        try:
+            yield ticket
+        finally:
+            self.release()
+
+    def has_capacity(self) -> bool:
+        """当前是否有空闲slot且无人排队"""
+        with self._lock:
+            return self._in_flight < self.max_in_flight and not self._waiters
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """队列深度、waitingtime等admission指标"""
+        with self._lock:
+            wait_times = sorted(self._wait_times)
+            metrics = {
+                "name": self.name,
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self._in_flight,
+                "max_queue": self.max_queue,
+                "queue_depth": len(self._waiters),
+                "peak_queue_depth": self._peak_queue_depth,
+                "admitted": self._admitted,
+                "rejected_queue_full": self._rejected_queue_full,
+                "rejected_timeout": self._rejected_timeout
+            }
+
+        metrics["avg_wait_time"] = round(sum(wait_times) / len(wait_times), 3) if wait_times else 0.0
+        metrics["p95_wait_time"] = round(wait_times[min(len(wait_times) - 1, int(len(wait_times) * 0.95))], 3) if wait_times else 0.0
+        metrics["max_wait_time"] = round(wait_times[-1], 3) if wait_times else 0.0
+        return metrics
+
+# 全局LLMadmission控制器：方案Generate和tip词Optimize共享同一个服务商配额
+llm_admission = AdmissionController(
+    "llm",
+    max_in_flight=config.admission.max_in_flight,
+    max_queue=config.admission.max_queue,
+    queue_timeout=config.admission.queue_timeout
+)
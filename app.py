@@ -1,22 +1,25 @@
 import gradio as gr
-import requests
 import os
 import logging
 import json
-import tempfile
-import re
-import html
-from datetime import datetime, timedelta
-from typing import Optional, Tuple, Dict, Any, List
-from urllib.parse import urlparse
+from datetime import datetime
+from typing import Optional, Tuple, Dict, Any, List, Iterator, AsyncIterator
 
 # Import modular components
 from config import config
 # Removed mcp_direct_client, using enhanced_mcp_client
-from export_manager import export_manager
 from prompt_optimizer import prompt_optimizer
-from explanation_manager import explanation_manager, ProcessingStage
+from explanation_manager import ExplanationManager
 from plan_editor import plan_editor
+from async_runtime import background_loop
+from prompt_templates import prompt_templates
+from job_queue import job_queue
+from mcp_health import mcp_health
+# Generation pipeline (importable without the UI); re-exported for existing callers
+from generation_pipeline import (
+    generate_development_plan_async, generate_development_plan, run_generation_pipeline, GenerationError,
+    get_mcp_status_display, format_response, create_temp_markdown_file
+)
 
 # Configure logging
 logging.basicConfig(
@@ -25,14 +28,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# API configuration
-API_KEY = config.ai_model.api_key
-API_URL = config.ai_model.api_url
-
 # Application startup initialization
 logger.info("🚀 VibeDoc: Your AI Product Manager & Architect")
 logger.info("📦 Version: 2.0.0 | Open Source Edition")
 logger.info(f"📊 Configuration: {json.dumps(config.get_config_summary(), ensure_ascii=False, indent=2)}")
+for template_stats in prompt_templates.get_stats():
+    logger.info(f"📐 Prompt template {template_stats['version']}: "
+                f"static prefix {template_stats['static_bytes']} bytes / ~{template_stats['static_tokens']} tokens")
 
 # Validate configuration
 config_errors = config.validate_config()
@@ -40,13 +42,15 @@ if config_errors:
     for key, error in config_errors.items():
         logger.warning(f"⚠️ Configuration Warning {key}: {error}")
 
-def get_processing_explanation() -> str:
-    """Get detailed explanation of the processing steps"""
-    return explanation_manager.get_processing_explanation()
+def get_processing_explanation(trace: Optional[ExplanationManager]) -> str:
+    """Get detailed explanation of the processing steps of one request"""
+    if trace is None:
+        return "暂无Process记录"
+    return trace.get_processing_explanation()
 
-def show_explanation() -> Tuple[str, str, str]:
-    """Show processing explanation"""
-    explanation = get_processing_explanation()
+def show_explanation(trace: Optional[ExplanationManager]) -> Tuple[str, str, str]:
+    """Show processing explanation of this session's last generation"""
+    explanation = get_processing_explanation(trace)
     return (
         gr.update(visible=False),  # Hide plan_output
         gr.update(value=explanation, visible=True),  # Show process_explanation
@@ -62,6 +66,10 @@ def hide_explanation() -> Tuple[str, str, str]:
     )
 
 def optimize_user_idea(user_idea: str) -> Tuple[str, str]:
+    """Synchronous facade for optimize_user_idea_async"""
+    return background_loop.run(optimize_user_idea_async(user_idea))
+
+async def optimize_user_idea_async(user_idea: str) -> Tuple[str, str]:
     """
     Optimize user's input idea description
     
@@ -75,7 +83,7 @@ def optimize_user_idea(user_idea: str) -> Tuple[str, str]:
         return "", "❌ Please enter your product idea first!"
     
     # Call prompt optimizer
-    success, optimized_idea, suggestions = prompt_optimizer.optimize_user_input(user_idea)
+    success, optimized_idea, suggestions = await prompt_optimizer.optimize_user_input_async(user_idea)
     
     if success:
         optimization_info = f"""
@@ -93,1227 +101,56 @@ def optimize_user_idea(user_idea: str) -> Tuple[str, str]:
     else:
         return user_idea, f"⚠️ Optimization failed: {suggestions}"
 
-def validate_input(user_idea: str) -> Tuple[bool, str]:
-    """Validate user input"""
-    if not user_idea or not user_idea.strip():
-        return False, "❌ Please enter your product idea!"
-    
-    if len(user_idea.strip()) < 10:
-        return False, "❌ Product idea description is too short, please provide more details"
-    
-    return True, ""
-
-def validate_url(url: str) -> bool:
-    """Validate URL format"""
-    try:
-        result = urlparse(url)
-        return all([result.scheme, result.netloc])
-    except Exception:
-        return False
-
-def fetch_knowledge_from_url_via_mcp(url: str) -> tuple[bool, str]:
-    """Fetch knowledge from URL via enhanced async MCP service"""
-    from enhanced_mcp_client import call_fetch_mcp_async, call_deepwiki_mcp_async
-    from urllib.parse import urlparse
-    
-    # Intelligent MCP service selection - use proper domain parsing
-    parsed_url = urlparse(url.lower())
-    domain = parsed_url.netloc
-    
-    if domain.endswith("deepwiki.org") or domain == "deepwiki.org":
-        # DeepWiki MCP specifically handles deepwiki.org domain
-        try:
-            logger.info(f"🔍 Detected deepwiki.org link, using async DeepWiki MCP: {url}")
-            result = call_deepwiki_mcp_async(url)
-            
-            if result.success and result.data and len(result.data.strip()) > 10:
-                logger.info(f"✅ DeepWiki MCP async call successful, content length: {len(result.data)}, elapsed time: {result.execution_time:.2f}s")
-                return True, result.data
-            else:
-                logger.warning(f"⚠️ DeepWiki MCP failed, switching to Fetch MCP: {result.error_message}")
-        except Exception as e:
-            logger.error(f"❌ DeepWiki MCP call exception, switching to Fetch MCP: {str(e)}")
-    
-    # Use generic async Fetch MCP service
-    try:
-        logger.info(f"🌐 Using async Fetch MCP to retrieve content: {url}")
-        result = call_fetch_mcp_async(url, max_length=8000)  # Increased length limit
-        
-        if result.success and result.data and len(result.data.strip()) > 10:
-            logger.info(f"✅ Fetch MCP async call successful, content length: {len(result.data)}, elapsed time: {result.execution_time:.2f}s")
-            return True, result.data
-        else:
-            logger.warning(f"⚠️ Fetch MCP call failed: {result.error_message}")
-            return False, f"MCP service call failed: {result.error_message or 'Unknown error'}"
-    except Exception as e:
-        logger.error(f"❌ Fetch MCP call exception: {str(e)}")
-        return False, f"MCP service call exception: {str(e)}"
-
-def get_mcp_status_display() -> str:
-    """Get MCP service status display"""
-    try:
-        from enhanced_mcp_client import async_mcp_client
-
-        # Quick test of connectivity for both services
-        services_status = []
-
-        # Test Fetch MCP
-        fetch_test_result = async_mcp_client.call_mcp_service_async(
-            "fetch", "fetch", {"url": "https://httpbin.org/get", "max_length": 100}
-        )
-        fetch_ok = fetch_test_result.success
-        fetch_time = fetch_test_result.execution_time
-
-        # Test DeepWiki MCP
-        deepwiki_test_result = async_mcp_client.call_mcp_service_async(
-            "deepwiki", "deepwiki_fetch", {"url": "https://deepwiki.org/openai/openai-python", "mode": "aggregate"}
-        )
-        deepwiki_ok = deepwiki_test_result.success
-        deepwiki_time = deepwiki_test_result.execution_time
-
-        # Build status display
-        fetch_icon = "✅" if fetch_ok else "❌"
-        deepwiki_icon = "✅" if deepwiki_ok else "❌"
-
-        status_lines = [
-            "## 🚀 Async MCP Service Status",
-            f"- {fetch_icon} **Fetch MCP**: {'Online' if fetch_ok else 'Offline'} (General web scraping)"
-        ]
-        
-        if fetch_ok:
-            status_lines.append(f"  ⏱️ Response time: {fetch_time:.2f}s")
-        
-        status_lines.append(f"- {deepwiki_icon} **DeepWiki MCP**: {'Online' if deepwiki_ok else 'Offline'} (deepwiki.org only)")
-        
-        if deepwiki_ok:
-            status_lines.append(f"  ⏱️ Response time: {deepwiki_time:.2f}s")
-        
-        status_lines.extend([
-            "",
-            "🧠 **Intelligent Async Routing:**",
-            "- `deepwiki.org` → DeepWiki MCP (async processing)",
-            "- Other websites → Fetch MCP (async processing)", 
-            "- HTTP 202 → SSE listening → Result retrieval",
-            "- Auto fallback + error recovery"
-        ])
-        
-        return "\n".join(status_lines)
-        
-    except Exception as e:
-        return f"## MCP Service Status\n- ❌ **Check failed**: {str(e)}\n- 💡 Please ensure enhanced_mcp_client.py file exists"
-
-def call_mcp_service(url: str, payload: Dict[str, Any], service_name: str, timeout: int = 120) -> Tuple[bool, str]:
-    """Unified MCP service call function
-    
-    Args:
-        url: MCP service URL
-        payload: Request payload
-        service_name: Service name (for logging)
-        timeout: Timeout duration
-        
-    Returns:
-        (success, data): Success flag and returned data
-    """
-    try:
-        logger.info(f"🔥 DEBUG: Calling {service_name} MCP service at {url}")
-        logger.info(f"🔥 DEBUG: Payload: {json.dumps(payload, ensure_ascii=False, indent=2)}")
-        
-        response = requests.post(
-            url,
-            headers={"Content-Type": "application/json"},
-            json=payload,
-            timeout=timeout
-        )
-        
-        logger.info(f"🔥 DEBUG: Response status: {response.status_code}")
-        logger.info(f"🔥 DEBUG: Response headers: {dict(response.headers)}")
-        
-        try:
-            response_data = response.json()
-            logger.info(f"🔥 DEBUG: Response JSON: {json.dumps(response_data, ensure_ascii=False, indent=2)}")
-        except:
-            response_text = response.text[:1000]  # Only print first 1000 characters
-            logger.info(f"🔥 DEBUG: Response text: {response_text}")
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            # Check multiple possible response formats
-            content = None
-            if "data" in data and data["data"]:
-                content = data["data"]
-            elif "result" in data and data["result"]:
-                content = data["result"]
-            elif "content" in data and data["content"]:
-                content = data["content"]
-            elif "message" in data and data["message"]:
-                content = data["message"]
-            else:
-                # If none of the above, try using the entire response directly
-                content = str(data)
-            
-            if content and len(str(content).strip()) > 10:
-                logger.info(f"✅ {service_name} MCP service returned {len(str(content))} characters")
-                return True, str(content)
-            else:
-                logger.warning(f"⚠️ {service_name} MCP service returned empty or invalid data: {data}")
-                return False, f"❌ {service_name} MCP returned empty data or format error"
-        else:
-            logger.error(f"❌ {service_name} MCP service failed with status {response.status_code}")
-            logger.error(f"❌ Response content: {response.text[:500]}")
-            return False, f"❌ {service_name} MCP call failed: HTTP {response.status_code}"
-            
-    except requests.exceptions.Timeout:
-        logger.error(f"⏰ {service_name} MCP service timeout after {timeout}s")
-        return False, f"❌ {service_name} MCP call timeout"
-    except requests.exceptions.ConnectionError as e:
-        logger.error(f"🔌 {service_name} MCP service connection failed: {str(e)}")
-        return False, f"❌ {service_name} MCP connection failed"
-    except Exception as e:
-        logger.error(f"💥 {service_name} MCP service error: {str(e)}")
-        return False, f"❌ {service_name} MCP call error: {str(e)}"
-
-def fetch_external_knowledge(reference_url: str) -> str:
-    """Fetch external knowledge base content - Using modular MCP manager to prevent fake link generation"""
-    if not reference_url or not reference_url.strip():
-        return ""
-    
-    # Verify if URL is accessible
-    url = reference_url.strip()
-    logger.info(f"🔍 Starting to process external reference link: {url}")
-    
-    try:
-        # Simple HEAD request to check if URL exists
-        logger.info(f"🌐 Verify link accessibility: {url}")
-        response = requests.head(url, timeout=10, allow_redirects=True)
-        logger.info(f"📡 Link verification result: HTTP {response.status_code}")
-        
-        if response.status_code >= 400:
-            logger.warning(f"⚠️ Provided URL is not accessible: {url} (HTTP {response.status_code})")
-            return f"""
-## ⚠️ Reference Link Status Alert
-
-**🔗 Provided link**: {url}
-
-**❌ Link status**: Unable to access (HTTP {response.status_code})
-
-**💡 suggestions**: 
-- Please check if the link is correct
-- Or remove the reference link and use pure AI generation mode
-- AI will generate a professional development plan based on the idea description
-
----
-"""
-        else:
-            logger.info(f"✅ Link accessible, status code: {response.status_code}")
-            
-    except requests.exceptions.Timeout:
-        logger.warning(f"⏰ URL verification timeout: {url}")
-        return f"""
-## 🔗 参考linkProcess说明
-
-**📍 Provided link**: {url}
-
-**⏰ Processstatus**: linkValidatetimeout
-
-**🤖 AIProcess**: 将基于创意content进行Intelligent Analysis，not依赖外部link
-
-**💡 说明**: 为确保Generate质量，AI会根据Idea DescriptionGenerateComplete Solution，避免引用not确定的外部content
-
----
-"""
-    except Exception as e:
-        logger.warning(f"⚠️ URLValidatefailed: {url} - {str(e)}")
-        return f"""
-## 🔗 参考linkProcess说明
-
-**📍 Provided link**: {url}
-
-**🔍 Processstatus**: 暂时unable toValidatelinkavailable性 ({str(e)[:100]})
-
-**🤖 AIProcess**: 将基于创意content进行Intelligent Analysis，not依赖外部link
-
-**💡 说明**: 为确保Generate质量，AI会根据Idea DescriptionGenerateComplete Solution，避免引用not确定的外部content
-
----
-"""
-    
-    # attemptCallMCPservice
-    logger.info(f"🔄 attemptCallMCPserviceGet知识...")
-    mcp_start_time = datetime.now()
-    success, knowledge = fetch_knowledge_from_url_via_mcp(url)
-    mcp_duration = (datetime.now() - mcp_start_time).total_seconds()
-    
-    logger.info(f"📊 MCPserviceCallresult: successful={success}, contentlength={len(knowledge) if knowledge else 0}, 耗时={mcp_duration:.2f}s")
-    
-    if success and knowledge and len(knowledge.strip()) > 50:
-        # MCPservicesuccessful返回有效content
-        logger.info(f"✅ MCPservicesuccessfulGet知识，contentlength: {len(knowledge)} 字符")
-        
-        # Validate返回的content是否包含实际知识而not是errorinformation
-        if not any(keyword in knowledge.lower() for keyword in ['error', 'failed', 'error', 'failed', 'notavailable']):
-            return f"""
-## 📚 外部知识库参考
-
-**🔗 来源link**: {url}
-
-**✅ Getstatus**: MCPservicesuccessfulGet
-
-**📊 content概览**: 已Get {len(knowledge)} 字符的参考资料
-
----
-
-{knowledge}
-
----
-"""
-        else:
-            logger.warning(f"⚠️ MCP返回content包含errorinformation: {knowledge[:200]}")
-    else:
-        # MCPservicefailed或返回无效content，提供明确说明
-        logger.warning(f"⚠️ MCPserviceCallfailed或返回无效content")
-        
-        # 详细诊断MCPservicestatus
-        mcp_status = get_mcp_status_display()
-        logger.info(f"🔍 MCPservicestatusdetails: {mcp_status}")
-        
-        return f"""
-## 🔗 外部知识Process说明
-
-**📍 参考link**: {url}
-
-**🎯 Process方式**: Intelligent Analysismode
-
-**� MCPservicestatus**: 
-{mcp_status}
-
-**�💭 Process策略**: current外部知识service暂时notavailable，AI将基于以下方式Generate方案：
-- ✅ 基于Idea Description进行深度分析
-- ✅ 结合行业最佳实践
-- ✅ 提供完整的Technical Solution
-- ✅ Generate实用的Coding Prompts
-
-**🎉 优势**: 确保Generatecontent的准确性和可靠性，避免引用not确定的外部information
-
-**🔧 技术细节**: 
-- MCPCall耗时: {mcp_duration:.2f}s
-- 返回contentlength: {len(knowledge) if knowledge else 0} 字符
-- servicestatus: {'successful' if success else 'failed'}
-
----
-"""
-
-def generate_enhanced_reference_info(url: str, source_type: str, error_msg: str = None) -> str:
-    """Generate增强的参考information，当MCPservicenotavailable时提供有用的上下文"""
-    from urllib.parse import urlparse
-    
-    parsed_url = urlparse(url)
-    domain = parsed_url.netloc
-    path = parsed_url.path
-    
-    # Infer content type based on URL structure - use proper domain parsing
-    from urllib.parse import urlparse
-    content_hints = []
-    
-    # Parse domain properly to avoid substring attacks
-    try:
-        parsed = urlparse(url if url.startswith(('http://', 'https://')) else f'https://{url}')
-        domain = parsed.netloc.lower()
-    except:
-        domain = ""
-    
-    # Detect common technical sites - check domain endings for security
-    if domain.endswith("github.com") or domain == "github.com":
-        content_hints.append("💻 Open source code repository")
-    elif domain.endswith("stackoverflow.com") or domain == "stackoverflow.com":
-        content_hints.append("❓ Technical Q&A")
-    elif domain.endswith("medium.com") or domain == "medium.com":
-        content_hints.append("📝 Technical blog")
-    elif domain.endswith("dev.to") or domain == "dev.to":
-        content_hints.append("👨‍💻 Developer community")
-    elif domain.endswith("csdn.net") or domain == "csdn.net":
-        content_hints.append("🇨🇳 CSDN technical blog")
-    elif domain.endswith("juejin.cn") or domain == "juejin.cn":
-        content_hints.append("💎 Juejin technical article")
-    elif domain.endswith("zhihu.com") or domain == "zhihu.com":
-        content_hints.append("🧠 Zhihu technical discussion")
-    elif "blog" in domain:
-        content_hints.append("📖 Technical blog")
-    elif "docs" in domain:
-        content_hints.append("📚 技术文档")
-    elif "wiki" in domain:
-        content_hints.append("📖 知识库")
-    else:
-        content_hints.append("🔗 参考资料")
-    
-    # 根据path推断content
-    if "/article/" in path or "/post/" in path:
-        content_hints.append("📄 文章content")
-    elif "/tutorial/" in path:
-        content_hints.append("📚 教程指南")
-    elif "/docs/" in path:
-        content_hints.append("📖 技术文档")
-    elif "/guide/" in path:
-        content_hints.append("📋 使用指南")
-    
-    hint_text = " | ".join(content_hints) if content_hints else "📄 网页content"
-    
-    reference_info = f"""
-## 🔗 {source_type}参考
-
-**📍 来源link：** [{domain}]({url})
-
-**🏷️ contenttype：** {hint_text}
-
-**🤖 AI增强分析：** 
-> 虽然MCPservice暂时notavailable，但AI将基于linkinformation和上下文进行Intelligent Analysis，
-> 并在Generate的Development Plan中融入该参考资料的相关性suggestions。
-
-**📋 参考价值：**
-- ✅ 提供技术选型参考
-- ✅ 补充实施细节
-- ✅ 增强方案可行性
-- ✅ 丰富最佳实践
-
----
-"""
-    
-    if error_msg and not error_msg.startswith("❌"):
-        reference_info += f"\n**⚠️ servicestatus：** {error_msg}\n"
-    
-    return reference_info
-
-def validate_and_fix_content(content: str) -> str:
-    """Validate和FixGenerate的content，包括Mermaid语法、linkValidate等"""
-    if not content:
-        return content
-    
-    logger.info("🔍 startcontentValidate和Fix...")
-    
-    # 记录Fix项目
-    fixes_applied = []
-    
-    # 计算初始quality score
-    initial_quality_score = calculate_quality_score(content)
-    logger.info(f"📊 初始contentquality score: {initial_quality_score}/100")
-    
-    # 1. FixMermaid图table语法error
-    original_content = content
-    content = fix_mermaid_syntax(content)
-    if content != original_content:
-        fixes_applied.append("FixMermaid图table语法")
-    
-    # 2. Validate和清理虚假link
-    original_content = content
-    content = validate_and_clean_links(content)
-    if content != original_content:
-        fixes_applied.append("清理虚假link")
-    
-    # 3. Fix日期一致性
-    original_content = content
-    content = fix_date_consistency(content)
-    if content != original_content:
-        fixes_applied.append("Update过期日期")
-    
-    # 4. Fixformatproblem
-    original_content = content
-    content = fix_formatting_issues(content)
-    if content != original_content:
-        fixes_applied.append("Fixformatproblem")
-    
-    # 重新计算quality score
-    final_quality_score = calculate_quality_score(content)
-    
-    # 移除质量报告Show，只记录log
-    if final_quality_score > initial_quality_score + 5:
-        improvement = final_quality_score - initial_quality_score
-        logger.info(f"📈 contentQuality improvement: {initial_quality_score}/100 → {final_quality_score}/100 (improvement{improvement}分)")
-        if fixes_applied:
-            logger.info(f"🔧 ApplyFix: {', '.join(fixes_applied)}")
-    
-    logger.info(f"✅ contentValidate和Fixcompleted，最终quality score: {final_quality_score}/100")
-    if fixes_applied:
-        logger.info(f"🔧 Apply了以下Fix: {', '.join(fixes_applied)}")
-    
-    return content
-
-def calculate_quality_score(content: str) -> int:
-    """计算contentquality score（0-100）"""
-    if not content:
-        return 0
-    
-    score = 0
-    max_score = 100
-    
-    # 1. 基础contentcompleteness (30分)
-    if len(content) > 500:
-        score += 15
-    if len(content) > 2000:
-        score += 15
-    
-    # 2. 结构completeness (25分)
-    structure_checks = [
-        '# 🚀 AIGenerate的Development Plan',  # title
-        '## 🤖 AI编程助手tip词',   # AItip词部分
-        '```mermaid',              # Mermaid图table
-        '项目开发甘特图',           # 甘特图
-    ]
-    
-    for check in structure_checks:
-        if check in content:
-            score += 6
-    
-    # 3. 日期准确性 (20分)
-    import re
-    current_year = datetime.now().year
-    
-    # Check是否有currenty份或以后的日期
-    recent_dates = re.findall(r'202[5-9]-\d{2}-\d{2}', content)
-    if recent_dates:
-        score += 10
-    
-    # Check是否没有过期日期
-    old_dates = re.findall(r'202[0-3]-\d{2}-\d{2}', content)
-    if not old_dates:
-        score += 10
-    
-    # 4. link质量 (15分)
-    fake_link_patterns = [
-        r'blog\.csdn\.net/username',
-        r'github\.com/username', 
-        r'example\.com',
-        r'xxx\.com'
-    ]
-    
-    has_fake_links = any(re.search(pattern, content, re.IGNORECASE) for pattern in fake_link_patterns)
-    if not has_fake_links:
-        score += 15
-    
-    # 5. Mermaid语法质量 (10分)
-    mermaid_issues = [
-        r'## 🎯 [A-Z]',  # error的title在图table中
-        r'```mermaid\n## 🎯',  # formaterror
-    ]
-    
-    has_mermaid_issues = any(re.search(pattern, content, re.MULTILINE) for pattern in mermaid_issues)
-    if not has_mermaid_issues:
-        score += 10
-    
-    return min(score, max_score)
-
-def fix_mermaid_syntax(content: str) -> str:
-    """FixMermaid图table中的语法error并Optimize渲染"""
-    import re
-    
-    # Fix常见的Mermaid语法error
-    fixes = [
-        # 移除图table代码中的额外符号和标记
-        (r'## 🎯 ([A-Z]\s*-->)', r'\1'),
-        (r'## 🎯 (section [^)]+)', r'\1'),
-        (r'(\n|\r\n)## 🎯 ([A-Z]\s*-->)', r'\n    \2'),
-        (r'(\n|\r\n)## 🎯 (section [^\n]+)', r'\n    \2'),
-        
-        # Fix节点定义中的多余符号
-        (r'## 🎯 ([A-Z]\[[^\]]+\])', r'\1'),
-        
-        # 确保Mermaid代码块format正确
-        (r'```mermaid\n## 🎯', r'```mermaid'),
-        
-        # 移除title级别error
-        (r'\n##+ 🎯 ([A-Z])', r'\n    \1'),
-        
-        # Fix中文节点名称的problem - 彻底清理引号format
-        (r'([A-Z]+)\["([^"]+)"\]', r'\1["\2"]'),  # standardformat：A["文本"]
-        (r'([A-Z]+)\[""([^"]+)""\]', r'\1["\2"]'),  # 双引号error：A[""文本""]
-        (r'([A-Z]+)\["⚡"([^"]+)""\]', r'\1["\2"]'),  # 带emojierror
-        (r'([A-Z]+)\[([^\]]*[^\x00-\x7F][^\]]*)\]', r'\1["\2"]'),  # 中文无引号
-        
-        # 确保flowchart语法正确
-        (r'graph TB\n\s*graph', r'graph TB'),
-        (r'flowchart TD\n\s*flowchart', r'flowchart TD'),
-        
-        # Fix箭头语法
-        (r'-->', r' --> '),
-        (r'-->([A-Z])', r'--> \1'),
-        (r'([A-Z])-->', r'\1 -->'),
-    ]
-    
-    for pattern, replacement in fixes:
-        content = re.sub(pattern, replacement, content, flags=re.MULTILINE)
-    
-    # addMermaid渲染增强标记
-    content = enhance_mermaid_blocks(content)
-    
-    return content
-
-def enhance_mermaid_blocks(content: str) -> str:
-    """简化Mermaid代码块Process，避免渲染冲突"""
-    import re
-    
-    # 查找所有Mermaid代码块并直接返回，notadd额外包装器
-    # 因为包装器可能导致渲染problem
-    mermaid_pattern = r'```mermaid\n(.*?)\n```'
-    
-    def clean_mermaid_block(match):
-        mermaid_content = match.group(1)
-        # 直接返回清理过的Mermaid块
-        return f'```mermaid\n{mermaid_content}\n```'
-    
-    content = re.sub(mermaid_pattern, clean_mermaid_block, content, flags=re.DOTALL)
-    
-    return content
-
-def validate_and_clean_links(content: str) -> str:
-    """Validate和清理虚假link，增强link质量"""
-    import re
-    
-    # 检测并移除虚假linkmode
-    fake_link_patterns = [
-        # Markdownlinkformat
-        r'\[([^\]]+)\]\(https?://blog\.csdn\.net/username/article/details/\d+\)',
-        r'\[([^\]]+)\]\(https?://github\.com/username/[^\)]+\)',
-        r'\[([^\]]+)\]\(https?://[^/]*example\.com[^\)]*\)',
-        r'\[([^\]]+)\]\(https?://[^/]*xxx\.com[^\)]*\)',
-        r'\[([^\]]+)\]\(https?://[^/]*test\.com[^\)]*\)',
-        r'\[([^\]]+)\]\(https?://localhost[^\)]*\)',
-        
-        # 新增：更多虚假linkmode
-        r'\[([^\]]+)\]\(https?://medium\.com/@[^/]+/[^\)]*\d{9,}[^\)]*\)',  # Medium虚假文章
-        r'\[([^\]]+)\]\(https?://github\.com/[^/]+/[^/\)]*education[^\)]*\)',  # GitHub虚假教育项目
-        r'\[([^\]]+)\]\(https?://www\.kdnuggets\.com/\d{4}/\d{2}/[^\)]*\)',  # KDNuggets虚假文章
-        r'\[([^\]]+)\]\(https0://[^\)]+\)',  # error的协议
-        
-        # 纯URLformat
-        r'https?://blog\.csdn\.net/username/article/details/\d+',
-        r'https?://github\.com/username/[^\s\)]+',
-        r'https?://[^/]*example\.com[^\s\)]*',
-        r'https?://[^/]*xxx\.com[^\s\)]*',
-        r'https?://[^/]*test\.com[^\s\)]*',
-        r'https?://localhost[^\s\)]*',
-        r'https0://[^\s\)]+',  # error的协议
-        r'https?://medium\.com/@[^/]+/[^\s]*\d{9,}[^\s]*',
-        r'https?://github\.com/[^/]+/[^/\s]*education[^\s]*',
-        r'https?://www\.kdnuggets\.com/\d{4}/\d{2}/[^\s]*',
-    ]
-    
-    for pattern in fake_link_patterns:
-        # 将虚假link替换为普通文本description
-        def replace_fake_link(match):
-            if match.groups():
-                return f"**{match.group(1)}** (基于行业standard)"
-            else:
-                return "（基于行业最佳实践）"
-        
-        content = re.sub(pattern, replace_fake_link, content, flags=re.IGNORECASE)
-    
-    # Validate并增强真实link
-    content = enhance_real_links(content)
-    
-    return content
-
-def enhance_real_links(content: str) -> str:
-    """Validate并增强真实link的available性"""
-    import re
-    
-    # 查找所有markdownlink
-    link_pattern = r'\[([^\]]+)\]\(([^)]+)\)'
-    
-    def validate_link(match):
-        link_text = match.group(1)
-        link_url = match.group(2)
-        
-        # Check是否是有效的URLformat
-        if not validate_url(link_url):
-            return f"**{link_text}** (参考资源)"
-        
-        # Check是否是常见的技术文档网站
-        trusted_domains = [
-            'docs.python.org', 'nodejs.org', 'reactjs.org', 'vuejs.org',
-            'angular.io', 'flask.palletsprojects.com', 'fastapi.tiangolo.com',
-            'docker.com', 'kubernetes.io', 'github.com', 'gitlab.com',
-            'stackoverflow.com', 'developer.mozilla.org', 'w3schools.com',
-            'jwt.io', 'redis.io', 'mongodb.com', 'postgresql.org',
-            'mysql.com', 'nginx.org', 'apache.org'
-        ]
-        
-        # 如果是受信任的域名，保留link
-        for domain in trusted_domains:
-            if domain in link_url.lower():
-                return f"[{link_text}]({link_url})"
-        
-        # 对于其他link，Convert为安全的文本引用
-        return f"**{link_text}** (技术参考)"
-    
-    content = re.sub(link_pattern, validate_link, content)
-    
-    return content
-
-def fix_date_consistency(content: str) -> str:
-    """Fix日期一致性problem"""
-    import re
-    from datetime import datetime
-    
-    current_year = datetime.now().year
-    
-    # 替换2024y以前的日期为currenty份
-    old_year_patterns = [
-        r'202[0-3]-\d{2}-\d{2}',  # 2020-2023的日期
-        r'202[0-3]y',            # 2020-2023y
-    ]
-    
-    for pattern in old_year_patterns:
-        def replace_old_date(match):
-            old_date = match.group(0)
-            if '-' in old_date:
-                # 日期format：YYYY-MM-DD
-                parts = old_date.split('-')
-                return f"{current_year}-{parts[1]}-{parts[2]}"
-            else:
-                # y份format：YYYYy
-                return f"{current_year}y"
-        
-        content = re.sub(pattern, replace_old_date, content)
-    
-    return content
-
-def fix_formatting_issues(content: str) -> str:
-    """Fixformatproblem"""
-    import re
-    
-    # Fix常见的formatproblem
-    fixes = [
-        # Fix空的或formaterror的title
-        (r'#### 🚀 \*\*$', r'#### 🚀 **开发阶段**'),
-        (r'#### 🚀 第阶段：\*\*', r'#### 🚀 **第1阶段**：'),
-        (r'### 📋 (\d+)\. \*\*第\d+阶段', r'### 📋 \1. **第\1阶段'),
-        
-        # Fixtable格formatproblem
-        (r'\n## 🎯 \| ([^|]+) \| ([^|]+) \| ([^|]+) \|', r'\n| \1 | \2 | \3 |'),
-        (r'\n### 📋 (\d+)\. \*\*([^*]+)\*\*：', r'\n**\1. \2**：'),
-        (r'\n### 📋 (\d+)\. \*\*([^*]+)\*\*$', r'\n**\1. \2**'),
-        
-        # Fix多余的空行
-        (r'\n{4,}', r'\n\n\n'),
-        
-        # Fixnot完整的段落end
-        (r'##\n\n---', r'## 总结\n\n以上是完整的Development Plan和Technical Solution。\n\n---'),
-    ]
-    
-    for pattern, replacement in fixes:
-        content = re.sub(pattern, replacement, content, flags=re.MULTILINE)
-    
-    return content
-
-def generate_development_plan(user_idea: str, reference_url: str = "") -> Tuple[str, str, str]:
-    """
-    基于user创意Generate完整的产品Development Plan和对应的AI编程助手tip词。
-    
-    Args:
-        user_idea (str): user的Product Idea Description
-        reference_url (str): 可选的参考link
-        
-    Returns:
-        Tuple[str, str, str]: Development Plan、AI Coding Prompts、临时filepath
-    """
-    # startProcess链条追踪
-    explanation_manager.start_processing()
-    start_time = datetime.now()
-    
-    # 步骤1: ValidateEnter
-    validation_start = datetime.now()
-    is_valid, error_msg = validate_input(user_idea)
-    validation_duration = (datetime.now() - validation_start).total_seconds()
-    
-    explanation_manager.add_processing_step(
-        stage=ProcessingStage.INPUT_VALIDATION,
-        title="EnterValidate",
-        description="ValidateuserEnter的Idea Description是否符合requirements",
-        success=is_valid,
-        details={
-            "Enterlength": len(user_idea.strip()) if user_idea else 0,
-            "包含参考link": bool(reference_url),
-            "Validateresult": "through" if is_valid else error_msg
-        },
-        duration=validation_duration,
-        quality_score=100 if is_valid else 0,
-        evidence=f"userEnter: '{user_idea[:50]}...' (length: {len(user_idea.strip()) if user_idea else 0}字符)"
-    )
-    
-    if not is_valid:
-        return error_msg, "", None
-    
-    # 步骤2: API密钥Check
-    api_check_start = datetime.now()
-    if not API_KEY:
-        api_check_duration = (datetime.now() - api_check_start).total_seconds()
-        explanation_manager.add_processing_step(
-            stage=ProcessingStage.AI_GENERATION,
-            title="API密钥Check",
-            description="CheckAI模型API密钥configuration",
-            success=False,
-            details={"error": "API密钥未configuration"},
-            duration=api_check_duration,
-            quality_score=0,
-            evidence="系统环境变量中not foundSILICONFLOW_API_KEY"
-        )
-        
-        logger.error("API key not configured")
-        error_msg = """
-## ❌ configurationerror：未SetAPI密钥
-
-### 🔧 解决方法：
-
-1. **GetAPI密钥**：
-   - visit [Silicon Flow](https://siliconflow.cn) 
-   - 注册账户并GetAPI密钥
-
-2. **configuration环境变量**：
-   ```bash
-   export SILICONFLOW_API_KEY=your_api_key_here
-   ```
-
-3. **魔塔平台configuration**：
-   - 在创空间Set中add环境变量
-   - 变量名：`SILICONFLOW_API_KEY`
-   - 变量值：你的实际API密钥
-
-### 📋 configurationcompleted后重启Apply即可使用完整feature！
-
----
-
-**💡 tip**：API密钥是必填项，没有它就unable toCallAIserviceGenerateDevelopment Plan。
-"""
-        return error_msg, "", None
-    
-    # 步骤3: Fetch external knowledge base content
-    knowledge_start = datetime.now()
-    retrieved_knowledge = fetch_external_knowledge(reference_url)
-    knowledge_duration = (datetime.now() - knowledge_start).total_seconds()
-    
-    explanation_manager.add_processing_step(
-        stage=ProcessingStage.KNOWLEDGE_RETRIEVAL,
-        title="外部知识Get",
-        description="从MCPserviceGet外部参考知识",
-        success=bool(retrieved_knowledge and "successfulGet" in retrieved_knowledge),
-        details={
-            "参考link": reference_url or "无",
-            "MCPservicestatus": get_mcp_status_display(),
-            "知识contentlength": len(retrieved_knowledge) if retrieved_knowledge else 0
-        },
-        duration=knowledge_duration,
-        quality_score=80 if retrieved_knowledge else 50,
-        evidence=f"Get的知识content: '{retrieved_knowledge[:100]}...' (length: {len(retrieved_knowledge) if retrieved_knowledge else 0}字符)"
-    )
-    
-    # Getcurrent日期并计算项目start日期
-    current_date = datetime.now()
-    # 项目start日期：下w一start（给user准备time）
-    days_until_monday = (7 - current_date.weekday()) % 7
-    if days_until_monday == 0:  # 如果今d是w一，则下w一start
-        days_until_monday = 7
-    project_start_date = current_date + timedelta(days=days_until_monday)
-    project_start_str = project_start_date.strftime("%Y-%m-%d")
-    current_year = current_date.year
-    
-    # build系统tip词 - 防止虚假linkGenerate，强化Coding PromptsGenerate，增强视觉化content，加强日期上下文
-    system_prompt = f"""你是一个资深技术项目经理，精通产品规划和 AI 编程助手（如 GitHub Copilot、ChatGPT Code）tip词撰写。
-
-📅 **currenttime上下文**：今d是 {current_date.strftime("%Yy%mm%d日")}，currenty份是 {current_year} y。所有项目time必须基于currenttime合理规划。
-
-🔴 重torequirements：
-1. 当收到外部知识库参考时，你必须在Development Plan中明确引用和融合这些information
-2. 必须在Development Plan的开头部分提及参考来源（如CSDN博客、GitHub项目等）
-3. 必须根据外部参考调整技术选型和实施suggestions
-4. 必须在相关章节中使用"参考XXXsuggestions"等table述
-5. 开发阶段必须有明确编号（第1阶段、第2阶段等）
-
-🚫 严禁行为（严格执行）：
-- **绝对notto编造任何虚假的link或参考资料**
-- **禁止Generate任何does not exist的URL，包括但not限于：**
-  - ❌ https://medium.com/@username/... (user名+数字IDformat)
-  - ❌ https://github.com/username/... (占位符user名)
-  - ❌ https://blog.csdn.net/username/... 
-  - ❌ https://www.kdnuggets.com/y份/m份/... (虚构文章)
-  - ❌ https://example.com, xxx.com, test.com 等test域名
-  - ❌ 任何以https0://开头的error协议link
-- **notto在"参考来源"部分add任何link，除nonuser明确提供**
-- **notto使用"参考文献"、"延伸阅读"等titleadd虚假link**
-
-✅ 正确做法：
-- If no external reference is provided，**完全省略"参考来源"部分**
-- 只引用user实际提供的参考link（如果有的话）
-- 当外部知识notavailable时，明确说明是基于最佳实践Generate
-- 使用 "基于行业standard"、"参考常见架构"、"遵循最佳实践" 等table述
-- **Development Plan应直接start，notto虚构任何外部资源**
-
-📊 视觉化contentrequirements（新增）：
-- 必须在Technical Solution中包含架构图的Mermaid代码
-- 必须在Development Plan中包含甘特图的Mermaid代码
-- 必须在featuremodule中包含flowchart的Mermaid代码
-- 必须包含技术栈对比table格
-- 必须包含项目里程碑timetable
-
-🎯 Mermaid图tableformatrequirements（严格遵循）：
-
-⚠️ **严格禁止errorformat**：
-- ❌ 绝对notto使用 `A[""文本""]` format（双重引号）
-- ❌ 绝对notto使用 `## 🎯` 等title在图tableinternal
-- ❌ 绝对notto在节点名称中使用emoji符号
-
-✅ **正确的Mermaid语法**：
-
-**架构图example**：
-```mermaid
-flowchart TD
-    A["user界面"] --> B["业务逻辑层"]
-    B --> C["datavisit层"]
-    C --> D["data库"]
-    B --> E["外部API"]
-    F["缓存"] --> B
-```
-
-**flowchartexample**：
-```mermaid
-flowchart TD
-    Start([start]) --> Input[userEnter]
-    Input --> Validate{{ValidateEnter}}
-    Validate -->|有效| Process[Processdata]
-    Validate -->|无效| Error[Showerror]
-    Process --> Save[Saveresult]
-    Save --> Success[successfultip]
-    Error --> Input
-    Success --> End([end])
-```
-
-**甘特图example（必须使用真实的项目start日期）**：
-```mermaid
-gantt
-    title 项目开发甘特图
-    dateFormat YYYY-MM-DD
-    axisFormat %m-%d
-    
-    section 需求分析
-    Requirement Research     :done, req1, {project_start_str}, 3d
-    Requirement Organization     :done, req2, after req1, 4d
-    
-    section 系统Design
-    Architecture Design     :active, design1, after req2, 7d
-    UIDesign       :design2, after design1, 5d
-    
-    section 开发实施
-    Backend Development     :dev1, after design2, 14d
-    Frontend Development     :dev2, after design2, 14d
-    Integration Testing     :test1, after dev1, 7d
-    
-    section 部署上线
-    Deployment Preparation     :deploy1, after test1, 3d
-    Official Launch     :deploy2, after deploy1, 2d
-```
-
-⚠️ **日期Generate规则**：
-- 项目start日期：{project_start_str}（下w一start）
-- All dates must be based on {current_year} yand later
-- 严禁使用 2024 y以前的日期
-- 里程碑日期必须与甘特图保持一致
-
-🎯 必须严格按照Mermaid语法规范Generate图table，not能有formaterror
-
-🎯 AI Coding Promptsformatrequirements（重to）：
-- 必须在Development Plan后Generate专门的"# AI编程助手tip词"部分
-- 每个featuremodule必须有一个专门的AI Coding Prompts
-- 每个tip词必须使用```代码块format，方便Copy
-- tip词contentto基于具体项目feature，notto使用通用模板
-- tip词to详细、具体、可直接用于AI编程工具
-- 必须包含完整的上下文和具体requirements
-
-🔧 tip词结构requirements：
-每个tip词使用以下format：
-
-## [feature名称]开发tip词
-
-```
-请为[具体项目名称]开发[具体featuredescription]。
-
-项目背景：
-[基于Development Plan的项目背景]
-
-featurerequirements：
-1. [具体requirements1]
-2. [具体requirements2]
-...
-
-技术约束：
-- 使用[具体技术栈]
-- 遵循[具体规范]
-- 实现[具体性能requirements]
-
-outputrequirements：
-- 完整可运行代码
-- 详细注释说明
-- errorProcess机制
-- test用例
-```
-
-请严格按照此formatGenerate个性化的Coding Prompts，确保每个tip词都基于具体项目需求。
-
-formatrequirements：先outputDevelopment Plan，然后outputCoding Prompts部分。"""
-
-    # buildusertip词
-    user_prompt = f"""产品创意：{user_idea}"""
-    
-    # 如果successfulGet到外部知识，则注入到tip词中
-    if retrieved_knowledge and not any(keyword in retrieved_knowledge for keyword in ["❌", "⚠️", "Process说明", "暂时notavailable"]):
-        user_prompt += f"""
-
-# 外部知识库参考
-{retrieved_knowledge}
-
-请基于上述外部知识库参考和产品创意Generate："""
-    else:
-        user_prompt += """
-
-请Generate："""
-    
-    user_prompt += """
-1. 详细的Development Plan（包含产品概述、Technical Solution、Development Plan、部署方案、推广策略等）
-2. 每个featuremodule对应的AI编程助手tip词
-
-确保tip词具体、可操作，能直接用于AI编程工具。"""
-
-    try:
-        logger.info("🚀 startCallAI APIGenerateDevelopment Plan...")
-        
-        # 步骤3: AIGenerate准备
-        ai_prep_start = datetime.now()
-        
-        # buildrequestdata
-        request_data = {
-            "model": "Qwen/Qwen2.5-72B-Instruct",
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            "max_tokens": 4096,  # Fix：API限制最大4096 tokens
-            "temperature": 0.7
-        }
-        
-        ai_prep_duration = (datetime.now() - ai_prep_start).total_seconds()
-        
-        explanation_manager.add_processing_step(
-            stage=ProcessingStage.AI_GENERATION,
-            title="AIrequest准备",
-            description="buildAI模型requestparameter和tip词",
-            success=True,
-            details={
-                "AI模型": request_data['model'],
-                "系统tip词length": f"{len(system_prompt)} 字符",
-                "usertip词length": f"{len(user_prompt)} 字符",
-                "最大Token数": request_data['max_tokens'],
-                "温度parameter": request_data['temperature']
-            },
-            duration=ai_prep_duration,
-            quality_score=95,
-            evidence=f"准备Call {request_data['model']} 模型，tip词总length: {len(system_prompt + user_prompt)} 字符"
-        )
-        
-        # 记录requestinformation（not包含完整tip词以避免logtoo long）
-        logger.info(f"📊 APIrequest模型: {request_data['model']}")
-        logger.info(f"📏 系统tip词length: {len(system_prompt)} 字符")
-        logger.info(f"📏 usertip词length: {len(user_prompt)} 字符")
-        
-        # 步骤4: AI APICall
-        api_call_start = datetime.now()
-        logger.info(f"🌐 CurrentlyCallAPI: {API_URL}")
-        
-        response = requests.post(
-            API_URL,
-            headers={"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"},
-            json=request_data,
-            timeout=300  # Optimize：Generate方案Timeout duration为300s（5min）
-        )
-        
-        api_call_duration = (datetime.now() - api_call_start).total_seconds()
-        
-        logger.info(f"📈 API响应status码: {response.status_code}")
-        logger.info(f"⏱️ APICall耗时: {api_call_duration:.2f}s")
-        
-        if response.status_code == 200:
-            content = response.json().get("choices", [{}])[0].get("message", {}).get("content", "")
-            
-            content_length = len(content) if content else 0
-            logger.info(f"📝 Generatecontentlength: {content_length} 字符")
-            
-            explanation_manager.add_processing_step(
-                stage=ProcessingStage.AI_GENERATION,
-                title="AIcontentGenerate",
-                description="AI模型successfulGenerateDevelopment Plancontent",
-                success=bool(content),
-                details={
-                    "响应status": f"HTTP {response.status_code}",
-                    "Generatecontentlength": f"{content_length} 字符",
-                    "APICall耗时": f"{api_call_duration:.2f}s",
-                    "平均Generate速度": f"{content_length / api_call_duration:.1f} 字符/s" if api_call_duration > 0 else "N/A"
-                },
-                duration=api_call_duration,
-                quality_score=90 if content_length > 1000 else 70,
-                evidence=f"successfulGenerate {content_length} 字符的Development Plancontent，包含Technical Solution和Coding Prompts"
-            )
-            
-            if content:
-                # 步骤5: content后Process
-                postprocess_start = datetime.now()
-                
-                # 后Process：确保content结构化
-                final_plan_text = format_response(content)
-                
-                # ApplycontentValidate和Fix
-                final_plan_text = validate_and_fix_content(final_plan_text)
-                
-                postprocess_duration = (datetime.now() - postprocess_start).total_seconds()
-                
-                explanation_manager.add_processing_step(
-                    stage=ProcessingStage.CONTENT_FORMATTING,
-                    title="content后Process",
-                    description="format化和ValidateGenerate的content",
-                    success=True,
-                    details={
-                        "format化Process": "Markdown结构Optimize",
-                        "contentValidate": "Mermaid语法Fix, linkCheck",
-                        "最终contentlength": f"{len(final_plan_text)} 字符",
-                        "Process耗时": f"{postprocess_duration:.2f}s"
-                    },
-                    duration=postprocess_duration,
-                    quality_score=85,
-                    evidence=f"completedcontent后Process，最终output {len(final_plan_text)} 字符的Complete Development Plan"
-                )
-                
-                # Create临时file
-                temp_file = create_temp_markdown_file(final_plan_text)
-                
-                # 如果临时fileCreatefailed，使用None避免Gradio权限error
-                if not temp_file:
-                    temp_file = None
-                
-                # 总Processtime
-                total_duration = (datetime.now() - start_time).total_seconds()
-                logger.info(f"🎉 Development PlanGeneratecompleted，Total time: {total_duration:.2f}s")
-                
-                return final_plan_text, extract_prompts_section(final_plan_text), temp_file
-            else:
-                explanation_manager.add_processing_step(
-                    stage=ProcessingStage.AI_GENERATION,
-                    title="AIGeneratefailed",
-                    description="AI模型返回空content",
-                    success=False,
-                    details={
-                        "响应status": f"HTTP {response.status_code}",
-                        "error原因": "AI返回空content"
-                    },
-                    duration=api_call_duration,
-                    quality_score=0,
-                    evidence="AI APICallsuccessful但返回空的content"
-                )
-                
-                logger.error("API returned empty content")
-                return "❌ AI返回空content，请稍后重试", "", None
-        else:
-            # 记录详细的errorinformation
-            logger.error(f"API request failed with status {response.status_code}")
-            try:
-                error_detail = response.json()
-                logger.error(f"APIerrordetails: {error_detail}")
-                error_message = error_detail.get('message', '未知error')
-                error_code = error_detail.get('code', '')
-                
-                explanation_manager.add_processing_step(
-                    stage=ProcessingStage.AI_GENERATION,
-                    title="AI APICallfailed",
-                    description="AI模型APIrequestfailed",
-                    success=False,
-                    details={
-                        "HTTPstatus码": response.status_code,
-                        "error代码": error_code,
-                        "error消息": error_message
-                    },
-                    duration=api_call_duration,
-                    quality_score=0,
-                    evidence=f"API返回error: HTTP {response.status_code} - {error_message}"
-                )
-                
-                return f"❌ APIrequestfailed: HTTP {response.status_code} (error代码: {error_code}) - {error_message}", "", None
-            except:
-                logger.error(f"API响应content: {response.text[:500]}")
-                
-                explanation_manager.add_processing_step(
-                    stage=ProcessingStage.AI_GENERATION,
-                    title="AI APICallfailed",
-                    description="AI模型APIrequestfailed，unable toParseerrorinformation",
-                    success=False,
-                    details={
-                        "HTTPstatus码": response.status_code,
-                        "响应content": response.text[:200]
-                    },
-                    duration=api_call_duration,
-                    quality_score=0,
-                    evidence=f"APIrequestfailed，status码: {response.status_code}"
-                )
-                
-                return f"❌ APIrequestfailed: HTTP {response.status_code} - {response.text[:200]}", "", None
-            
-    except requests.exceptions.Timeout:
-        logger.error("API request timeout")
-        return "❌ APIrequesttimeout，请稍后重试", "", None
-    except requests.exceptions.ConnectionError:
-        logger.error("API connection failed")
-        return "❌ 网络connectionfailed，请Check网络Set", "", None
-    except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
-        return f"❌ Processerror: {str(e)}", "", None
-
-def extract_prompts_section(content: str) -> str:
-    """从完整content中提取AI Coding Prompts部分"""
-    lines = content.split('\n')
-    prompts_section = []
-    in_prompts_section = False
-    
-    for line in lines:
-        if any(keyword in line for keyword in ['Coding Prompts', '编程助手', 'Prompt', 'AI助手']):
-            in_prompts_section = True
-        if in_prompts_section:
-            prompts_section.append(line)
-    
-    return '\n'.join(prompts_section) if prompts_section else "not foundCoding Prompts部分"
-
-def create_temp_markdown_file(content: str) -> str:
-    """Create临时markdownfile"""
+async def generate_development_plan_for_ui(user_idea: str, reference_url: str = "") -> AsyncIterator[Tuple[Any, ...]]:
+    """Gradio handler: the plan outputs plus this session's processing trace (kept in gr.State)"""
+    trace = ExplanationManager()
     try:
-        import tempfile
-        import os
-        
-        # Create临时file，使用更安全的方法
-        with tempfile.NamedTemporaryFile(
-            mode='w', 
-            suffix='.md', 
-            delete=False, 
-            encoding='utf-8'
-        ) as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-        
-        # Validatefile是否Createsuccessful
-        if os.path.exists(temp_file_path):
-            logger.info(f"✅ successfulCreate临时file: {temp_file_path}")
-            return temp_file_path
-        else:
-            logger.warning("⚠️ 临时fileCreate后does not exist")
-            return ""
-            
-    except PermissionError as e:
-        logger.error(f"❌ 权限error，unable toCreate临时file: {e}")
-        return ""
-    except Exception as e:
-        logger.error(f"❌ Create临时filefailed: {e}")
-        return ""
+        async for result in generate_development_plan_async(user_idea, reference_url, trace):
+            yield (*result, trace)
+    except GenerationError as e:
+        yield e.message, "", None, trace
+
+def submit_plan_job(user_idea: str, reference_url: str = "") -> Dict[str, Any]:
+    """Queue a background generation job and return its ID immediately"""
+    if not job_queue.available:
+        return {"error": "后台任务队列未启用"}
+    return job_queue.submit(user_idea, reference_url).to_dict(include_content=False)
+
+def get_plan_job(job_id: str, include_content: bool = False) -> Dict[str, Any]:
+    """Poll a background job's status and progress"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return {"job_id": job_id, "error": "任务not存在或已过期"}
+    return job.to_dict(include_content=include_content)
+
+def watch_plan_job(job_id: str) -> Iterator[Dict[str, Any]]:
+    """Stream a background job's snapshots until it finishes"""
+    found = False
+    for job in job_queue.watch(job_id, timeout=config.ai_model.timeout * 2):
+        found = True
+        yield job.to_dict(include_content=job.done)
+    if not found:
+        yield {"job_id": job_id, "error": "任务not存在或已过期"}
+
+def cancel_plan_job(job_id: str) -> Dict[str, Any]:
+    """Cancel a queued or running background job"""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return {"job_id": job_id, "error": "任务not存在或已过期"}
+    return job.to_dict(include_content=False)
+
+def fetch_plan_job(job_id: str) -> Tuple[str, str, Optional[str]]:
+    """Fetch a finished job's plan, prompts and markdown file"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return "❌ 任务not存在或已过期", "", None
+    if not job.done:
+        return f"⏳ 任务{'排队中' if job.status == 'queued' else 'Generate中'}，已Generate {len(job.plan_text)} 字符", "", None
+    file_path = job.file_path if job.file_path and os.path.exists(job.file_path) else None
+    if job.status == "succeeded" and file_path is None:
+        # 临时file可能已被清理，按Save的方案重新Create
+        file_path = create_temp_markdown_file(job.plan_text)
+    return job.plan_text or job.error, job.prompts, file_path
 
 def enable_plan_editing(plan_content: str) -> Tuple[str, str]:
     """启用方案Editfeature"""
@@ -1676,255 +513,6 @@ def reset_plan_edits() -> str:
         logger.error(f"Resetfailed: {str(e)}")
         return f"❌ Resetfailed: {str(e)}"
 
-def fix_links_for_new_window(content: str) -> str:
-    """Fix所有link为新窗口Open，解决魔塔平台linkproblem"""
-    import re
-    
-    # 匹配所有markdownlinkformat [text](url)
-    def replace_markdown_link(match):
-        text = match.group(1)
-        url = match.group(2)
-        return f'<a href="{url}" target="_blank" rel="noopener noreferrer">{text}</a>'
-    
-    # 替换markdownlink
-    content = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', replace_markdown_link, content)
-    
-    # 匹配所有HTMLlink并addtarget="_blank"
-    def add_target_blank(match):
-        full_tag = match.group(0)
-        if 'target=' not in full_tag:
-            # 在>前addtarget="_blank"
-            return full_tag.replace('>', ' target="_blank" rel="noopener noreferrer">')
-        return full_tag
-    
-    # 替换HTMLlink
-    content = re.sub(r'<a [^>]*href=[^>]*>', add_target_blank, content)
-    
-    return content
-
-def format_response(content: str) -> str:
-    """format化AI回复，美化Show并保持原始AIGenerate的tip词"""
-    
-    # Fix所有link为新窗口Open
-    content = fix_links_for_new_window(content)
-    
-    # addtime戳和format化title
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # 分割Development Plan和AI Coding Prompts
-    parts = content.split('# AI编程助手tip词')
-    
-    if len(parts) >= 2:
-        # 有明确的AI Coding Prompts部分
-        plan_content = parts[0].strip()
-        prompts_content = '# AI编程助手tip词' + parts[1]
-        
-        # 美化AI Coding Prompts部分
-        enhanced_prompts = enhance_prompts_display(prompts_content)
-        
-        formatted_content = f"""
-<div class="plan-header">
-
-# 🚀 AIGenerate的Development Plan
-
-<div class="meta-info">
-
-**⏰ Generation Time：** {timestamp}  
-**🤖 AI模型：** Qwen2.5-72B-Instruct  
-**💡 基于user创意Intelligent AnalysisGenerate**  
-**🔗 AgentApplyMCP Service Enhancement**
-
-</div>
-
-</div>
-
----
-
-{enhance_markdown_structure(plan_content)}
-
----
-
-{enhanced_prompts}
-"""
-    else:
-        # 没有明确分割，使用原始content
-        formatted_content = f"""
-<div class="plan-header">
-
-# 🚀 AIGenerate的Development Plan
-
-<div class="meta-info">
-
-**⏰ Generation Time：** {timestamp}  
-**🤖 AI模型：** Qwen2.5-72B-Instruct  
-**💡 基于user创意Intelligent AnalysisGenerate**  
-**🔗 AgentApplyMCP Service Enhancement**
-
-</div>
-
-</div>
-
----
-
-{enhance_markdown_structure(content)}
-"""
-    
-    return formatted_content
-
-def enhance_prompts_display(prompts_content: str) -> str:
-    """简化AI Coding PromptsShow"""
-    lines = prompts_content.split('\n')
-    enhanced_lines = []
-    in_code_block = False
-    
-    for line in lines:
-        stripped = line.strip()
-        
-        # Processtitle
-        if stripped.startswith('# AI编程助手tip词'):
-            enhanced_lines.append('')
-            enhanced_lines.append('<div class="prompts-highlight">')
-            enhanced_lines.append('')
-            enhanced_lines.append('# 🤖 AI编程助手tip词')
-            enhanced_lines.append('')
-            enhanced_lines.append('> 💡 **使用说明**：以下tip词基于您的项目需求定制Generate，可直接Copy到 GitHub Copilot、ChatGPT、Claude 等AI编程工具中使用')
-            enhanced_lines.append('')
-            continue
-            
-        # Process二级title（featuremodule）
-        if stripped.startswith('## ') and not in_code_block:
-            title = stripped[3:].strip()
-            enhanced_lines.append('')
-            enhanced_lines.append(f'### 🎯 {title}')
-            enhanced_lines.append('')
-            continue
-            
-        # Process代码块start
-        if stripped.startswith('```') and not in_code_block:
-            in_code_block = True
-            enhanced_lines.append('')
-            enhanced_lines.append('```')
-            continue
-            
-        # Process代码块end
-        if stripped.startswith('```') and in_code_block:
-            in_code_block = False
-            enhanced_lines.append('```')
-            enhanced_lines.append('')
-            continue
-            
-        # 其他content直接add
-        enhanced_lines.append(line)
-    
-    # end高亮区域
-    enhanced_lines.append('')
-    enhanced_lines.append('</div>')
-    
-    return '\n'.join(enhanced_lines)
-
-def extract_prompts_section(content: str) -> str:
-    """从完整content中提取AI Coding Prompts部分"""
-    # 分割content，查找AI Coding Prompts部分
-    parts = content.split('# AI编程助手tip词')
-    
-    if len(parts) >= 2:
-        prompts_content = '# AI编程助手tip词' + parts[1]
-        # 清理和format化tip词content，移除HTML标签以便Copy
-        clean_prompts = clean_prompts_for_copy(prompts_content)
-        return clean_prompts
-    else:
-        # 如果没有找到明确的tip词部分，attempt其他关键词
-        lines = content.split('\n')
-        prompts_section = []
-        in_prompts_section = False
-        
-        for line in lines:
-            if any(keyword in line for keyword in ['Coding Prompts', '编程助手', 'Prompt', 'AI助手']):
-                in_prompts_section = True
-            if in_prompts_section:
-                prompts_section.append(line)
-        
-        return '\n'.join(prompts_section) if prompts_section else "not foundCoding Prompts部分"
-
-def clean_prompts_for_copy(prompts_content: str) -> str:
-    """清理tip词content，移除HTML标签，OptimizeCopyexperience"""
-    import re
-    
-    # 移除HTML标签
-    clean_content = re.sub(r'<[^>]+>', '', prompts_content)
-    
-    # 清理多余的空行
-    lines = clean_content.split('\n')
-    cleaned_lines = []
-    
-    for line in lines:
-        stripped = line.strip()
-        if stripped:
-            cleaned_lines.append(line)
-        elif cleaned_lines and cleaned_lines[-1].strip():  # 避免连续空行
-            cleaned_lines.append('')
-    
-    return '\n'.join(cleaned_lines)
-
-# Delete多余的旧代码，这里应该是enhance_markdown_structure函数
-def enhance_markdown_structure(content: str) -> str:
-    """增强Markdown结构，add视觉亮点和层级"""
-    lines = content.split('\n')
-    enhanced_lines = []
-    
-    for line in lines:
-        stripped = line.strip()
-        
-        # 增强一级title
-        if stripped and not stripped.startswith('#') and len(stripped) < 50 and '：' not in stripped and '.' not in stripped[:5]:
-            if any(keyword in stripped for keyword in ['产品概述', 'Technical Solution', 'Development Plan', '部署方案', '推广策略', 'AI', '编程助手', 'tip词']):
-                enhanced_lines.append(f"\n## 🎯 {stripped}\n")
-                continue
-        
-        # 增强二级title
-        if stripped and '.' in stripped[:5] and len(stripped) < 100:
-            if stripped[0].isdigit():
-                enhanced_lines.append(f"\n### 📋 {stripped}\n")
-                continue
-                
-        # 增强feature列table
-        if stripped.startswith('主tofeature') or stripped.startswith('目标user'):
-            enhanced_lines.append(f"\n#### 🔹 {stripped}\n")
-            continue
-            
-        # 增强技术栈部分
-        if stripped in ['前端', '后端', 'AI 模型', '工具和库']:
-            enhanced_lines.append(f"\n#### 🛠️ {stripped}\n")
-            continue
-            
-        # 增强阶段title
-        if '阶段' in stripped and '：' in stripped:
-            if '第' in stripped and '阶段' in stripped:
-                try:
-                    # 更健壮的阶段号提取逻辑
-                    parts = stripped.split('第')
-                    if len(parts) > 1:
-                        phase_part = parts[1].split('阶段')[0].strip()
-                        phase_name = stripped.split('：')[1].strip() if '：' in stripped else ''
-                        enhanced_lines.append(f"\n#### 🚀 第{phase_part}阶段：{phase_name}\n")
-                    else:
-                        enhanced_lines.append(f"\n#### 🚀 {stripped}\n")
-                except:
-                    enhanced_lines.append(f"\n#### 🚀 {stripped}\n")
-            else:
-                enhanced_lines.append(f"\n#### 🚀 {stripped}\n")
-            continue
-            
-        # 增强任务列table
-        if stripped.startswith('任务：'):
-            enhanced_lines.append(f"\n**📝 {stripped}**\n")
-            continue
-            
-        # 保持原有缩进的其他content
-        enhanced_lines.append(line)
-    
-    return '\n'.join(enhanced_lines)
-
 # 自定义CSS - 保持美化UI
 custom_css = """
 .main-container {
@@ -3997,7 +2585,8 @@ with gr.Blocks(
             label="AIGenerate的Development Plan"
         )
         
-        # Process过程说明区域
+        # Process过程说明区域（Process链条按会话保存，并发用户互not干扰）
+        explanation_state = gr.State(None)
         process_explanation = gr.Markdown(
             visible=False,
             elem_classes="process-explanation"
@@ -4176,9 +2765,10 @@ with gr.Blocks(
     
     # Optimize按钮事件
     optimize_btn.click(
-        fn=optimize_user_idea,
+        fn=optimize_user_idea_async,
         inputs=[idea_input],
-        outputs=[idea_input, optimization_result]
+        outputs=[idea_input, optimization_result],
+        concurrency_limit=config.ui_concurrency_limit
     ).then(
         fn=lambda: gr.update(visible=True),
         outputs=[optimization_result]
@@ -4193,6 +2783,7 @@ with gr.Blocks(
     # Process过程说明按钮事件
     show_explanation_btn.click(
         fn=show_explanation,
+        inputs=[explanation_state],
         outputs=[plan_output, process_explanation, hide_explanation_btn]
     )
     
@@ -4202,10 +2793,11 @@ with gr.Blocks(
     )
     
     generate_btn.click(
-        fn=generate_development_plan,
+        fn=generate_development_plan_for_ui,
         inputs=[idea_input, reference_url_input],
-        outputs=[plan_output, prompts_for_copy, download_file],
-        api_name="generate_plan"
+        outputs=[plan_output, prompts_for_copy, download_file, explanation_state],
+        api_name="generate_plan",
+        concurrency_limit=config.ui_concurrency_limit
     ).then(
         fn=lambda: gr.update(visible=True),
         outputs=[download_file]
@@ -4217,6 +2809,20 @@ with gr.Blocks(
         outputs=[download_info]
     )
     
+    # 后台任务API：提交后立即返回任务ID，客户端轮询/订阅进度，completed后再取result
+    gr.api(submit_plan_job, api_name="submit_plan_job")
+    gr.api(get_plan_job, api_name="get_plan_job")
+    gr.api(watch_plan_job, api_name="watch_plan_job")
+    gr.api(cancel_plan_job, api_name="cancel_plan_job")
+    job_id_input = gr.Textbox(visible=False)
+    job_fetch_btn = gr.Button(visible=False)
+    job_fetch_btn.click(
+        fn=fetch_plan_job,
+        inputs=[job_id_input],
+        outputs=[plan_output, prompts_for_copy, download_file],
+        api_name="fetch_plan_job"
+    )
+    
     # Copy按钮事件（使用JavaScript实现）
     copy_plan_btn.click(
         fn=None,
@@ -4276,9 +2882,29 @@ with gr.Blocks(
         }"""
     )
 
+def start_background_services():
+    """Start the job workers, MCP health prober and MCP tool discovery.
+    
+    Only the serving process calls this (never at import time), so importing app from
+    scripts or tools does not start workers that would pick up the UI process's jobs.
+    """
+    from enhanced_mcp_client import async_mcp_client
+    
+    # 后台任务工作线程与UI共用同一条Generate流水线
+    job_queue.start(generate_development_plan_async)
+    
+    # 后台探测MCPservice健康status，status面板和熔断器读取缓存result；同时预先发现各service的工具
+    mcp_health.start(async_mcp_client.probe)
+    background_loop.submit(async_mcp_client.discover_all())
+
 # 启动Apply - 开源version
 if __name__ == "__main__":
+    import socket
+    import uvicorn
+    from rest_api import create_server
+    
     logger.info("🚀 Starting VibeDoc Application")
+    start_background_services()
     logger.info(f"🌍 Environment: {config.environment}")
     logger.info(f"� Version: 2.0.0 - Open Source Edition")
     logger.info(f"�🔧 External Services: {[s.name for s in config.get_enabled_mcp_services()]}")
@@ -4290,13 +2916,19 @@ if __name__ == "__main__":
     for port in ports_to_try:
         try:
             logger.info(f"🌐 Attempting to launch on port: {port}")
-            demo.launch(
-                server_name="0.0.0.0",
-                server_port=port,
-                share=False,  # 开源version默认not分享
-                show_error=config.debug,
-                prevent_thread_lock=False
-            )
+            if config.rest_api.enabled:
+                # REST API与UI共用一个uvicorn服务
+                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+                    probe.bind(("0.0.0.0", port))
+                uvicorn.run(create_server(demo, generate_development_plan_async), host="0.0.0.0", port=port)
+            else:
+                demo.launch(
+                    server_name="0.0.0.0",
+                    server_port=port,
+                    share=False,  # 开源version默认not分享
+                    show_error=config.debug,
+                    prevent_thread_lock=False
+                )
             launched = True
             logger.info(f"✅ Application successfully launched on port {port}")
             logger.info(f"🔗 Local URL: http://localhost:{port}")
@@ -0,0 +1,80 @@
+"""
+后台事件循环runtime
+异步流水线是唯一实现，同步调用方（旧接口、脚本）through这里的后台事件循环驱动协程，
+避免在每次Call时新建事件循环，也让异步connection池可以跨Call复用
+"""
+
+import asyncio
+import threading
+import logging
+from typing import AsyncIterator, Awaitable, Iterator, Optional, TypeVar
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class BackgroundLoop:
+    """在守护线程中运行的共享事件循环"""
+
+    def __init__(self, name: str = "vibedoc-async"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Get（必要时启动）后台事件循环"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                ready = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(ready,), name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+            return self._loop
+
+    def _run(self, ready: threading.Event):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        ready.set()
+        logger.info(f"🔁 后台事件循环已启动: {self.name}")
+        self._loop.run_forever()
+
+    def in_loop(self) -> bool:
+        """current是否运行在后台事件循环线程内"""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Awaitable[T]) -> Future:
+        """提交协程到后台循环，返回concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """同步waiting协程result"""
+        if self.in_loop():
+            raise RuntimeError("BackgroundLoop.run 不能在后台事件循环内部Call")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout=timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def iterate(self, agen: AsyncIterator[T]) -> Iterator[T]:
+        """把异步生成器桥接为同步生成器，生成器被关闭时同步关闭异步生成器"""
+        try:
+            while True:
+                try:
+                    yield self.run(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            aclose = getattr(agen, "aclose", None)
+            if aclose is not None:
+                try:
+                    self.run(aclose())
+                except Exception as e:
+                    logger.debug(f"⚠️ 关闭异步生成器时出错: {e}")
+
+# 全局后台事件循环
+background_loop = BackgroundLoop()
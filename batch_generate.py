@@ -0,0 +1,211 @@
+"""
+批量Generate命令行工具
+从JSONL读取创意（每行 {"idea": ..., "reference_url": ..., "id": ...}），有界并发 + 限速地
+CallGenerate流水线，每completed一个就追加写入结果JSONL；结果file同时作为检查点，
+崩溃或中断后用同样的命令重新运行即可从断点继续
+
+用法：
+    python batch_generate.py ideas.jsonl results.jsonl --concurrency 4 --rate 30
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class BatchItem:
+    """一条待Generate的创意"""
+    item_id: str
+    idea: str
+    reference_url: str = ""
+
+@dataclass
+class BatchReport:
+    """吞吐statistics"""
+    total: int = 0
+    skipped: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    output_tokens: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    durations: List[float] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        finished = self.succeeded + self.failed
+        durations = sorted(self.durations)
+        return {
+            "total": self.total,
+            "skipped": self.skipped,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "elapsed_seconds": round(elapsed, 1),
+            "plans_per_minute": round(finished * 60 / elapsed, 2),
+            "output_tokens_per_second": round(self.output_tokens / elapsed, 1),
+            "p50_seconds": round(durations[len(durations) // 2], 1) if durations else 0.0,
+            "p95_seconds": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 1) if durations else 0.0
+        }
+
+def item_id_for(record: Dict[str, Any]) -> str:
+    """优先使用记录自带的id，否则按创意和参考link生成稳定id，保证断点续跑时能对上"""
+    if record.get("id") not in (None, ""):
+        return str(record["id"])
+    raw = f"{record.get('idea', '')}\x00{record.get('reference_url', '')}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+def load_items(path: str) -> List[BatchItem]:
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise SystemExit(f"{path}:{line_no}: invalid JSON: {e}")
+            if isinstance(record, str):
+                record = {"idea": record}
+            items.append(BatchItem(item_id_for(record), record.get("idea", ""), record.get("reference_url", "") or ""))
+    return items
+
+def load_checkpoint(path: str, retry_failed: bool) -> Set[str]:
+    """结果file中已completed的id；retry_failed时failed的会重新Generate"""
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 崩溃时写了一半的行
+            if record.get("status") == "succeeded" or not retry_failed:
+                done.add(record["id"])
+    return done
+
+class RateLimiter:
+    """把request启动均匀隔开到每分钟不超过rate个"""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+async def run_batch(items: List[BatchItem], output_path: str, concurrency: int, rate: float,
+                    retry_failed: bool = False, markdown_dir: Optional[str] = None) -> BatchReport:
+    # 延迟导入：流水线module会初始化LLM客户端和缓存；不导入app，避免构建UI
+    from generation_pipeline import generate_development_plan_async, GenerationError
+    from usage_tracker import usage_tracker
+
+    def completion_tokens() -> int:
+        """本进程LLMCall累计收到的outputtoken（API返回的usage，缺失时才按文本估算）"""
+        return sum(totals["completion_tokens"] for totals in usage_tracker.get_stats())
+
+    done = load_checkpoint(output_path, retry_failed)
+    report = BatchReport(total=len(items))
+    pending = [item for item in items if item.item_id not in done]
+    report.skipped = len(items) - len(pending)
+    if report.skipped:
+        logger.info(f"⏭️ 检查点中已completed {report.skipped} 条，跳过")
+    if markdown_dir:
+        os.makedirs(markdown_dir, exist_ok=True)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    limiter = RateLimiter(rate)
+    write_lock = asyncio.Lock()
+    output = open(output_path, "a", encoding="utf-8")
+    tokens_at_start = completion_tokens()
+
+    async def generate(item: BatchItem):
+        async with semaphore:
+            await limiter.wait()
+            started = time.monotonic()
+            plan_text, prompts, file_path = "", "", None
+            error = ""
+            try:
+                async for plan_text, prompts, file_path in generate_development_plan_async(item.idea, item.reference_url):
+                    pass
+            except GenerationError as e:
+                error = e.message
+            except Exception as e:
+                error = str(e)
+            duration = time.monotonic() - started
+
+        succeeded = not error
+        record = {
+            "id": item.item_id,
+            "idea": item.idea,
+            "reference_url": item.reference_url,
+            "status": "succeeded" if succeeded else "failed",
+            "plan": plan_text if succeeded else "",
+            "prompts": prompts,
+            "error": error,
+            "duration": round(duration, 2)
+        }
+        if succeeded and markdown_dir:
+            with open(os.path.join(markdown_dir, f"{item.item_id}.md"), "w", encoding="utf-8") as f:
+                f.write(plan_text)
+
+        async with write_lock:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            os.fsync(output.fileno())
+            report.durations.append(duration)
+            if succeeded:
+                report.succeeded += 1
+            else:
+                report.failed += 1
+            report.output_tokens = completion_tokens() - tokens_at_start
+            finished = report.succeeded + report.failed
+        logger.info(f"{'✅' if succeeded else '❌'} [{finished}/{len(pending)}] {item.item_id} {duration:.1f}s")
+
+    try:
+        await asyncio.gather(*(generate(item) for item in pending))
+    finally:
+        output.close()
+    return report
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Batch-generate development plans from a JSONL idea list")
+    parser.add_argument("input", help="JSONL file, one {\"idea\": ..., \"reference_url\": ..., \"id\": ...} per line")
+    parser.add_argument("output", help="results JSONL; also the checkpoint used to resume")
+    parser.add_argument("--concurrency", type=int, default=4, help="plans generated at the same time (default 4)")
+    parser.add_argument("--rate", type=float, default=0, help="max plans started per minute, 0 = unlimited")
+    parser.add_argument("--retry-failed", action="store_true", help="regenerate items that failed in a previous run")
+    parser.add_argument("--markdown-dir", help="also write each plan to <dir>/<id>.md")
+    args = parser.parse_args(argv)
+
+    from config import config
+    logging.basicConfig(level=getattr(logging, config.log_level), format=config.log_format)
+    from async_runtime import background_loop
+
+    items = load_items(args.input)
+    report = background_loop.run(run_batch(
+        items, args.output, args.concurrency, args.rate, args.retry_failed, args.markdown_dir
+    ))
+    summary = report.summary()
+    logger.info(f"📊 批量Generatecompleted: {json.dumps(summary, ensure_ascii=False)}")
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0 if report.failed == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,8 +4,10 @@ Support multiple environments、多MCPserviceconfiguration
 """
 
 import os
+import json
+import tempfile
 from typing import Dict, List, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from dotenv import load_dotenv
 
 # Load环境变量
@@ -20,6 +22,7 @@ class MCPServiceConfig:
     timeout: int = 30
     enabled: bool = True
     health_check_path: str = "/health"
+    tools_refresh_seconds: int = 3600  # tools/list发现的工具schema缓存多久后重新获取
 
 @dataclass
 class AIModelConfig:
@@ -31,6 +34,161 @@ class AIModelConfig:
     max_tokens: int = 8000
     temperature: float = 0.7
     timeout: int = 300  # 增加到300s（5min）解决timeoutproblem
+    stream: bool = True  # streamGenerate，降低首屏waitingtime
+
+@dataclass
+class ModelEndpointConfig:
+    """单个OpenAI兼容模型endpoint"""
+    name: str
+    api_url: str
+    api_key: str
+    model_name: str
+    weight: float = 1.0  # 相对权重，越大分到的流量越多
+    max_concurrency: int = 8  # 该endpoint同时in-flight的request上限
+    input_price: Optional[float] = None  # 每百万Entertoken价格，None时使用UsageConfig的默认价格
+    output_price: Optional[float] = None  # 每百万outputtoken价格
+
+@dataclass
+class ModelRouterConfig:
+    """多endpoint路由configuration"""
+    ewma_alpha: float = 0.3  # 延迟和error率EWMA平滑系数
+    eject_error_rate: float = 0.5  # EWMAerror率超过此值即摘除
+    eject_consecutive_failures: int = 3
+    eject_min_requests: int = 5  # 请求数not足时not按error率摘除
+    ejection_seconds: float = 30.0  # 首次摘除时长，连续摘除按倍数增长
+    max_ejection_seconds: float = 300.0
+
+@dataclass
+class HTTPTransportConfig:
+    """共享HTTP传输层configuration"""
+    pool_connections: int = 10  # 缓存的host connection池数量
+    pool_maxsize: int = 20  # 每个host保持的最大connection数
+    pool_block: bool = False  # connection池耗尽时是否阻塞waiting
+    max_retries: int = 2  # 幂等request(GET/HEAD)的retry次数
+    backoff_factor: float = 0.5
+    retry_statuses: tuple = (502, 503, 504)
+
+@dataclass
+class AdmissionConfig:
+    """LLMCalladmission控制configuration"""
+    max_in_flight: int = 8  # 同时发往AI服务商的最大request数
+    max_queue: int = 32  # 超出并发后最多排队的request数
+    queue_timeout: float = 30.0  # 排队deadline（s），超过即拒绝
+
+@dataclass
+class LLMResilienceConfig:
+    """LLMCallretry、deadline和对冲configuration"""
+    max_attempts: int = 3  # 含首次Call的最大attempt次数
+    backoff_base: float = 1.0  # 指数退避基数（s）
+    backoff_max: float = 20.0  # 单次退避上限（s），Retry-After不受此限制
+    retry_statuses: tuple = (429, 500, 502, 503, 504)
+    deadline: float = 300.0  # 单次LLMCall（含retry）的总deadline（s）
+    hedge_enabled: bool = False  # 首字节超过p95延迟时再发一个对冲request
+    hedge_percentile: float = 0.95
+    hedge_min_samples: int = 20  # 样本数不足时not对冲
+    hedge_min_delay: float = 1.0
+    latency_window: int = 500
+
+@dataclass
+class PlanCacheConfig:
+    """Development Plan缓存configuration"""
+    enabled: bool = True
+    db_path: str = ""
+    ttl_seconds: int = 86400  # 方案包含日期信息，默认缓存1d
+    memory_entries: int = 256
+    max_disk_entries: int = 5000
+    max_disk_mb: int = 200
+
+@dataclass
+class MCPCacheConfig:
+    """MCP工具Callresult缓存configuration"""
+    enabled: bool = True
+    persist: bool = True  # 同时写入SQLite，重启后仍可命中
+    db_path: str = ""
+    default_ttl: int = 3600
+    service_ttls: Dict[str, int] = field(default_factory=dict)  # service key -> TTL（秒）
+    stale_seconds: int = 86400  # 过期后这段time内仍返回旧result，同时后台刷新
+    memory_entries: int = 512
+    max_disk_entries: int = 5000
+
+    def ttl_for(self, service_key: str) -> int:
+        return self.service_ttls.get(service_key, self.default_ttl)
+
+@dataclass
+class MCPRoutingConfig:
+    """参考link按域名选择MCP获取策略
+
+    - race: DeepWiki和Fetch并发Call，先返回有效content的胜出，另一个取消
+    - sequential: 先DeepWiki，failed后再Fetch
+    - fetch: 只用Fetch
+    """
+    domain_strategies: Dict[str, str] = field(default_factory=lambda: {"deepwiki.org": "race"})
+    default_strategy: str = "fetch"
+
+    def strategy_for(self, domain: str) -> str:
+        """按域名（含子域名）匹配策略，最长后缀优先"""
+        domain = domain.lower().split(":")[0]
+        for suffix in sorted(self.domain_strategies, key=len, reverse=True):
+            if domain == suffix or domain.endswith("." + suffix):
+                return self.domain_strategies[suffix]
+        return self.default_strategy
+
+@dataclass
+class MCPHealthConfig:
+    """MCPservice健康探测与熔断configuration"""
+    enabled: bool = True  # 后台定期探测；关闭后熔断仅由真实Call的result驱动
+    probe_interval: float = 60.0
+    probe_timeout: float = 15.0
+    failure_threshold: int = 3  # 连续failed几次后熔断
+    open_seconds: float = 30.0  # 首次熔断时长，再次熔断时加倍
+    max_open_seconds: float = 300.0
+
+@dataclass
+class JobQueueConfig:
+    """后台Generate任务队列configuration"""
+    enabled: bool = True
+    db_path: str = ""
+    workers: int = 2
+    max_attempts: int = 2  # 进程崩溃时中断的任务最多重新执行的次数
+    retention_seconds: int = 86400  # 已结束任务的保留time
+    progress_interval: float = 1.0  # 写入Generate进度的最小间隔（秒）
+    lease_seconds: float = 60.0  # 运行中任务的心跳超过这么久没有更新，才视为所属进程已退出并重新入队
+
+@dataclass
+class IdeaSimilarityConfig:
+    """相似创意indexconfiguration"""
+    enabled: bool = True
+    mode: str = "serve"  # "serve": 直接返回相似方案；"suggest": 仅tip已有相似方案
+    max_distance: int = 3  # SimHash汉明距离阈值（64位）
+    max_entries: int = 1_000_000
+
+@dataclass
+class PipelineConfig:
+    """方案Generate流水线configuration"""
+    knowledge_deadline: float = 8.0  # 外部知识Get的waiting上限（秒）
+    knowledge_strategy: str = "wait"  # "wait" | "skip" | "hedge"；后两者放弃知识时会在方案开头tip
+    sectioned_generation: bool = False  # 按段落拆分为多个并发LLMCall
+    token_budget: int = 12000  # 单次LLMCall（含自动续写）的总output token上限
+    max_continuations: int = 3  # finish_reason为length时最多续写次数
+    context_window: int = 32768  # 模型上下文窗口（tokens）
+    context_margin: int = 256  # token估算误差的安全余量
+    max_knowledge_tokens: int = 3000  # 注入tip词的外部知识上限
+    coalesce_generations: bool = True  # 合并Enter相同的并发Generaterequest
+
+@dataclass
+class UsageConfig:
+    """Token用量与成本统计configuration"""
+    input_price: float = 0.0  # 每百万Entertoken价格
+    output_price: float = 0.0  # 每百万outputtoken价格
+    currency: str = "CNY"
+    stream_usage: bool = True  # stream request附带 stream_options.include_usage，让API在最后一个chunk返回usage
+
+@dataclass
+class RestAPIConfig:
+    """无界面REST APIconfiguration（与Gradio UI挂载在同一服务上）"""
+    enabled: bool = False
+    prefix: str = "/api/v1"
+    api_key: str = ""  # 要求 Authorization: Bearer <key> 或 X-API-Key；为空时只开放/metrics和/usage
 
 class AppConfig:
     """Apply总configuration类"""
@@ -39,26 +197,153 @@ class AppConfig:
         self.environment = os.getenv("ENVIRONMENT", "development")
         self.debug = os.getenv("DEBUG", "false").lower() == "true"
         self.port = int(os.getenv("PORT", "7860"))
+        # 异步事件处理器不占用worker线程，可放开Gradio的单事件并发限制
+        self.ui_concurrency_limit = int(os.getenv("UI_CONCURRENCY_LIMIT", "200"))
+        
+        # 机器对机器调用的REST API
+        self.rest_api = RestAPIConfig(
+            enabled=os.getenv("REST_API_ENABLED", "false").lower() == "true",
+            prefix=os.getenv("REST_API_PREFIX", "/api/v1"),
+            api_key=os.getenv("REST_API_KEY", "")
+        )
         
         # AI模型configuration
         self.ai_model = AIModelConfig(
             api_key=os.getenv("SILICONFLOW_API_KEY", ""),
-            timeout=int(os.getenv("API_TIMEOUT", "300"))
+            timeout=int(os.getenv("API_TIMEOUT", "300")),
+            stream=os.getenv("API_STREAM", "true").lower() == "true"
+        )
+        
+        # 模型endpoint列table：MODEL_ENDPOINTS为JSON数组，未configuration时使用上面的单一模型
+        self.model_endpoints = self._load_model_endpoints()
+        self.model_router = ModelRouterConfig(
+            ewma_alpha=float(os.getenv("MODEL_ROUTER_EWMA_ALPHA", "0.3")),
+            eject_error_rate=float(os.getenv("MODEL_ROUTER_EJECT_ERROR_RATE", "0.5")),
+            eject_consecutive_failures=int(os.getenv("MODEL_ROUTER_EJECT_FAILURES", "3")),
+            ejection_seconds=float(os.getenv("MODEL_ROUTER_EJECTION_SECONDS", "30"))
+        )
+        
+        # Token用量与成本statistics
+        self.usage = UsageConfig(
+            input_price=float(os.getenv("LLM_INPUT_PRICE", "0")),
+            output_price=float(os.getenv("LLM_OUTPUT_PRICE", "0")),
+            currency=os.getenv("LLM_PRICE_CURRENCY", "CNY"),
+            stream_usage=os.getenv("LLM_STREAM_USAGE", "true").lower() == "true"
         )
         
-        # 简化MCPserviceconfiguration - Use built-in directlyURL，避免环境变量复杂性
+        # 共享HTTP传输层configuration
+        self.http = HTTPTransportConfig(
+            pool_connections=int(os.getenv("HTTP_POOL_CONNECTIONS", "10")),
+            pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "20")),
+            max_retries=int(os.getenv("HTTP_MAX_RETRIES", "2")),
+            backoff_factor=float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+        )
+        
+        # LLMadmission控制configuration
+        self.admission = AdmissionConfig(
+            max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "8")),
+            max_queue=int(os.getenv("LLM_MAX_QUEUE", "32")),
+            queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+        )
+        
+        # LLMCall弹性configuration：总deadline沿用API_TIMEOUT
+        self.llm_resilience = LLMResilienceConfig(
+            max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "3")),
+            backoff_base=float(os.getenv("LLM_BACKOFF_BASE", "1.0")),
+            backoff_max=float(os.getenv("LLM_BACKOFF_MAX", "20")),
+            deadline=float(self.ai_model.timeout),
+            hedge_enabled=os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true",
+            hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+        )
+        
+        # 本地缓存/持久化data目录
+        self.cache_dir = os.getenv("VIBEDOC_CACHE_DIR", os.path.join(tempfile.gettempdir(), "vibedoc_cache"))
+        
+        # Development Plan缓存configuration
+        self.plan_cache = PlanCacheConfig(
+            enabled=os.getenv("PLAN_CACHE_ENABLED", "true").lower() == "true",
+            db_path=os.path.join(self.cache_dir, "plan_cache.sqlite3"),
+            ttl_seconds=int(os.getenv("PLAN_CACHE_TTL", "86400")),
+            memory_entries=int(os.getenv("PLAN_CACHE_MEMORY_ENTRIES", "256")),
+            max_disk_entries=int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "5000")),
+            max_disk_mb=int(os.getenv("PLAN_CACHE_MAX_MB", "200"))
+        )
+        
+        # MCP工具result缓存configuration
+        self.mcp_cache = MCPCacheConfig(
+            enabled=os.getenv("MCP_CACHE_ENABLED", "true").lower() == "true",
+            persist=os.getenv("MCP_CACHE_PERSIST", "true").lower() == "true",
+            db_path=os.path.join(self.cache_dir, "mcp_cache.sqlite3"),
+            default_ttl=int(os.getenv("MCP_CACHE_TTL", "3600")),
+            service_ttls={key: int(value) for key, value in self._parse_key_values(
+                os.getenv("MCP_CACHE_SERVICE_TTLS", "fetch=3600,deepwiki=86400")).items()},
+            stale_seconds=int(os.getenv("MCP_CACHE_STALE_SECONDS", "86400")),
+            memory_entries=int(os.getenv("MCP_CACHE_MEMORY_ENTRIES", "512")),
+            max_disk_entries=int(os.getenv("MCP_CACHE_MAX_ENTRIES", "5000"))
+        )
+        
+        # 参考link的MCP获取策略（按域名）
+        self.mcp_routing = MCPRoutingConfig(
+            domain_strategies=self._parse_key_values(os.getenv("MCP_DOMAIN_STRATEGIES", "deepwiki.org=race")),
+            default_strategy=os.getenv("MCP_DEFAULT_STRATEGY", "fetch")
+        )
+        
+        # MCPservice健康探测与熔断configuration
+        self.mcp_health = MCPHealthConfig(
+            enabled=os.getenv("MCP_HEALTH_ENABLED", "true").lower() == "true",
+            probe_interval=float(os.getenv("MCP_PROBE_INTERVAL", "60")),
+            probe_timeout=float(os.getenv("MCP_PROBE_TIMEOUT", "15")),
+            failure_threshold=int(os.getenv("MCP_BREAKER_FAILURES", "3")),
+            open_seconds=float(os.getenv("MCP_BREAKER_OPEN_SECONDS", "30")),
+            max_open_seconds=float(os.getenv("MCP_BREAKER_MAX_OPEN_SECONDS", "300"))
+        )
+        
+        # 后台任务队列configuration
+        self.job_queue = JobQueueConfig(
+            enabled=os.getenv("JOB_QUEUE_ENABLED", "true").lower() == "true",
+            db_path=os.path.join(self.cache_dir, "jobs.sqlite3"),
+            workers=int(os.getenv("JOB_WORKERS", "2")),
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "2")),
+            retention_seconds=int(os.getenv("JOB_RETENTION", "86400")),
+            progress_interval=float(os.getenv("JOB_PROGRESS_INTERVAL", "1.0")),
+            lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "60"))
+        )
+        
+        # 相似创意indexconfiguration
+        self.idea_similarity = IdeaSimilarityConfig(
+            enabled=os.getenv("SIMILAR_IDEA_ENABLED", "true").lower() == "true",
+            mode=os.getenv("SIMILAR_IDEA_MODE", "serve"),
+            max_distance=int(os.getenv("SIMILAR_IDEA_MAX_DISTANCE", "3")),
+            max_entries=int(os.getenv("SIMILAR_IDEA_MAX_ENTRIES", "1000000"))
+        )
+        
+        # Generate流水线configuration
+        self.pipeline = PipelineConfig(
+            knowledge_deadline=float(os.getenv("KNOWLEDGE_DEADLINE", "8")),
+            knowledge_strategy=os.getenv("KNOWLEDGE_STRATEGY", "wait"),
+            sectioned_generation=os.getenv("SECTIONED_GENERATION", "false").lower() == "true",
+            token_budget=int(os.getenv("GENERATION_TOKEN_BUDGET", "12000")),
+            max_continuations=int(os.getenv("GENERATION_MAX_CONTINUATIONS", "3")),
+            context_window=int(os.getenv("MODEL_CONTEXT_WINDOW", "32768")),
+            max_knowledge_tokens=int(os.getenv("KNOWLEDGE_MAX_TOKENS", "3000")),
+            coalesce_generations=os.getenv("COALESCE_GENERATIONS", "true").lower() == "true"
+        )
+        
+        # MCPserviceconfiguration - 默认使用内置URL，可用环境变量覆盖；工具列表由客户端通过tools/list发现
         self.mcp_services = {
             "deepwiki": MCPServiceConfig(
                 name="DeepWiki MCP",
-                url="https://mcp.api-inference.modelscope.net/d4ed08072d2846/sse",
+                url=os.getenv("DEEPWIKI_MCP_URL", "https://mcp.api-inference.modelscope.net/d4ed08072d2846/sse"),
                 timeout=int(os.getenv("MCP_TIMEOUT", "60")),
-                enabled=True  # 默认启用，简化configuration
+                enabled=True,  # 默认启用，简化configuration
+                tools_refresh_seconds=int(os.getenv("MCP_TOOLS_REFRESH", "3600"))
             ),
             "fetch": MCPServiceConfig(
                 name="Fetch MCP", 
-                url="https://mcp.api-inference.modelscope.net/6ec508e067dc41/sse",
+                url=os.getenv("FETCH_MCP_URL", "https://mcp.api-inference.modelscope.net/6ec508e067dc41/sse"),
                 timeout=int(os.getenv("MCP_TIMEOUT", "60")),
-                enabled=True  # 默认启用，简化configuration
+                enabled=True,  # 默认启用，简化configuration
+                tools_refresh_seconds=int(os.getenv("MCP_TOOLS_REFRESH", "3600"))
             )
         }
         
@@ -72,6 +357,41 @@ class AppConfig:
         self.log_level = os.getenv("LOG_LEVEL", "INFO")
         self.log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     
+    def _load_model_endpoints(self) -> List[ModelEndpointConfig]:
+        """ParseMODEL_ENDPOINTS；每项可用api_key直接给出密钥，或用api_key_env指定环境变量名"""
+        raw = os.getenv("MODEL_ENDPOINTS", "").strip()
+        if not raw:
+            return [ModelEndpointConfig(
+                name=self.ai_model.provider,
+                api_url=self.ai_model.api_url,
+                api_key=self.ai_model.api_key,
+                model_name=self.ai_model.model_name
+            )]
+        
+        endpoints = []
+        for index, item in enumerate(json.loads(raw)):
+            endpoints.append(ModelEndpointConfig(
+                name=item.get("name", f"endpoint-{index}"),
+                api_url=item.get("api_url", self.ai_model.api_url),
+                api_key=item.get("api_key") or os.getenv(item.get("api_key_env", ""), "") or self.ai_model.api_key,
+                model_name=item.get("model", self.ai_model.model_name),
+                weight=float(item.get("weight", 1.0)),
+                max_concurrency=int(item.get("max_concurrency", 8)),
+                input_price=float(item["input_price"]) if "input_price" in item else None,
+                output_price=float(item["output_price"]) if "output_price" in item else None
+            ))
+        return endpoints
+    
+    @staticmethod
+    def _parse_key_values(raw: str) -> Dict[str, str]:
+        """Parse "fetch=3600,deepwiki=86400" format的键值列table"""
+        values = {}
+        for item in raw.split(","):
+            if "=" in item:
+                key, value = item.split("=", 1)
+                values[key.strip().lower()] = value.strip()
+        return values
+    
     def get_enabled_mcp_services(self) -> List[MCPServiceConfig]:
         """Get已启用的MCPservice列table"""
         return [service for service in self.mcp_services.values() if service.enabled]
@@ -89,7 +409,7 @@ class AppConfig:
         errors = {}
         
         # ValidateAI模型configuration
-        if not self.ai_model.api_key:
+        if not any(endpoint.api_key for endpoint in self.model_endpoints):
             errors["ai_model"] = "SILICONFLOW_API_KEY 未configuration"
         
         # ValidateMCPserviceconfiguration
@@ -110,7 +430,8 @@ class AppConfig:
             "ai_model": {
                 "provider": self.ai_model.provider,
                 "model": self.ai_model.model_name,
-                "configured": bool(self.ai_model.api_key)
+                "configured": bool(self.ai_model.api_key),
+                "endpoints": [endpoint.name for endpoint in self.model_endpoints]
             },
             "mcp_services": {
                 "total": len(self.mcp_services),
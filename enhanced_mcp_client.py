@@ -1,21 +1,44 @@
 #!/usr/bin/env python3
 """
 增强版MCPdirect client - 支持魔塔平台异步MCPservice
-ProcessHTTP 202异步响应，throughSSEGetresult
+ProcessHTTP 202异步响应，through每个service一条长连SSE会话Getresult（按JSON-RPC id多路复用）。
+基于asyncio实现：会话和所有Call都运行在后台事件循环中，并发Call只占用协程而not是线程；
+同步调用方使用call_mcp_service_async等facade
 """
 
-import requests
+import asyncio
+import itertools
 import json
 import time
 import threading
-import queue
 import logging
-from typing import Dict, Any, Optional, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 from dataclasses import dataclass
-from urllib.parse import urljoin
+from urllib.parse import parse_qs, urljoin, urlparse
+
+import httpx
+
+from http_transport import http_transport
+from async_runtime import background_loop
+from mcp_cache import mcp_result_cache, CachedMCPResult
+from mcp_health import mcp_health, CallPermit
+from config import config, MCPServiceConfig
 
 logger = logging.getLogger(__name__)
 
+# 工具发现failed后首次重试的间隔（秒），之后每次failed加倍，最长到service的tools_refresh_seconds
+TOOL_DISCOVERY_RETRY_SECONDS = 10.0
+# Call路径上最多waiting工具发现的time（秒）；超时则本次not做本地Validate，发现在后台继续
+TOOL_DISCOVERY_WAIT_SECONDS = 5.0
+
+SSE_HEADERS = {
+    "Accept": "text/event-stream",
+    "Cache-Control": "no-cache"
+}
+
+class MCPConnectionError(Exception):
+    """SSE会话建立failed或已断开"""
+
 @dataclass
 class AsyncMCPResult:
     """异步MCPCallresult"""
@@ -25,6 +48,177 @@ class AsyncMCPResult:
     execution_time: float
     session_id: Optional[str] = None
     error_message: Optional[str] = None
+    from_cache: bool = False
+
+class MCPSession:
+    """一个MCPservice的长连SSE会话（只在后台事件循环中使用）
+
+    读取任务持续消费SSE事件流：endpoint事件给出本会话的POST地址，其余message事件按
+    JSON-RPC id分发给waiting中的request，多个并发tools/call共用同一条SSE connection。
+    connection断开时waiting中的request立即failed，下一次Call时重新建立会话。
+    """
+
+    def __init__(self, service_url: str, name: str, connect_timeout: float = 15, idle_timeout: float = 300):
+        self.service_url = service_url
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout  # 这么久没有任何事件（含ping）则断开
+        self.session_id: Optional[str] = None
+        self._endpoint: Optional[asyncio.Future] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._stats = {"connections": 0, "requests": 0}
+
+    async def _connect(self) -> str:
+        """返回当前会话的POST地址；没有可用会话时启动读取任务并waitingendpoint事件"""
+        if self._reader is None:
+            loop = asyncio.get_running_loop()
+            self._endpoint = loop.create_future()
+            self._reader = loop.create_task(self._read_loop(self._endpoint))
+        # shield：单个调用方timeout或取消not影响其他waiting同一会话的调用方
+        return await asyncio.wait_for(asyncio.shield(self._endpoint), self.connect_timeout)
+
+    async def request(self, method: str, params: Dict[str, Any], timeout: float) -> Tuple[str, Any]:
+        """发送JSON-RPCrequest并waiting响应，返回("success", 响应) 或 ("error"/"timeout", 说明)"""
+        for attempt in range(2):
+            try:
+                endpoint = await self._connect()
+            except asyncio.TimeoutError:
+                return "error", "Getendpointtimeout"
+            except MCPConnectionError as e:
+                return "error", str(e)
+            
+            request_id = next(self._ids)
+            future = asyncio.get_running_loop().create_future()
+            self._pending[request_id] = future
+            self._stats["requests"] += 1
+            try:
+                logger.info(f"📤 发送request到: {endpoint}")
+                response = await http_transport.async_request(
+                    "POST",
+                    endpoint,
+                    json={"jsonrpc": "2.0", "id": request_id, "method": method, "params": params},
+                    headers={"Content-Type": "application/json", "Accept": "application/json"},
+                    timeout=10
+                )
+                logger.info(f"📊 request响应: HTTP {response.status_code}")
+                
+                if response.status_code in (404, 410) and attempt == 0:
+                    # 会话已在service端失效：断开后用新会话重发一次
+                    logger.warning(f"♻️ {self.name} 会话已失效，重新connection")
+                    self.reset()
+                    continue
+                if response.status_code == 200:
+                    # 同步响应
+                    try:
+                        return "success", response.json()
+                    except json.JSONDecodeError:
+                        return "success", response.text
+                if response.status_code != 202:
+                    return "error", f"HTTP {response.status_code}: {response.text[:200]}"
+                
+                logger.info("✅ request已接受，waiting异步result...")
+                try:
+                    return await asyncio.wait_for(future, timeout)
+                except asyncio.TimeoutError:
+                    return "timeout", "waiting异步resulttimeout"
+            except httpx.HTTPError as e:
+                return "error", f"request异常: {str(e) or type(e).__name__}"
+            finally:
+                self._pending.pop(request_id, None)
+        return "error", "会话已失效"
+
+    def reset(self, reason: str = "会话已失效"):
+        """丢弃当前会话并关闭SSEconnection，下一次request会重新建立会话"""
+        reader = self._reader
+        self._detach(reason)
+        if reader is not None:
+            reader.cancel()
+
+    def _detach(self, error: str):
+        """清空当前会话status，waiting中的request和connection立即failed"""
+        if self._endpoint is not None and not self._endpoint.done():
+            self._endpoint.set_exception(MCPConnectionError(error))
+            self._endpoint.exception()  # 没有调用方waiting时也not告警
+        self._reader, self._endpoint, self.session_id = None, None, None
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_result(("error", error))
+
+    async def _read_loop(self, endpoint: asyncio.Future):
+        error = "SSEconnection已断开"
+        try:
+            logger.info(f"🔗 connectionSSE: {self.service_url}")
+            async with http_transport.async_stream(
+                "GET", self.service_url, headers=SSE_HEADERS,
+                timeout=httpx.Timeout(self.connect_timeout, read=self.idle_timeout)
+            ) as response:
+                self._stats["connections"] += 1
+                if response.status_code != 200:
+                    error = f"SSEconnectionfailed: HTTP {response.status_code}"
+                    logger.error(f"❌ {error}")
+                    return
+                
+                # 按SSE规范累积event/data行，空行时派发一个事件
+                event, data_lines = "message", []
+                async for line in response.aiter_lines():
+                    if line:
+                        if line.startswith("event:"):
+                            event = line[6:].strip()
+                        elif line.startswith("data:"):
+                            data_lines.append(line[5:].lstrip(" "))
+                        continue
+                    if data_lines:
+                        self._dispatch(endpoint, event, "\n".join(data_lines).strip())
+                    event, data_lines = "message", []
+        except httpx.ReadTimeout:
+            error = "SSEconnection空闲timeout"
+            logger.info(f"⏰ {self.name} {error}，下次Call时重新connection")
+        except Exception as e:
+            error = f"SSEconnection异常: {str(e)}"
+            logger.warning(f"⚠️ {self.name} {error}")
+        finally:
+            if self._endpoint is endpoint:
+                self._detach(error)
+
+    def _dispatch(self, endpoint: asyncio.Future, event: str, data: str):
+        if event == "endpoint" or ("/messages/" in data and "session_id=" in data and not endpoint.done()):
+            url = urljoin(self.service_url, data)
+            self.session_id = (parse_qs(urlparse(url).query).get("session_id") or [None])[0]
+            logger.info(f"✅ Getsession_id: {self.session_id}")
+            if not endpoint.done():
+                endpoint.set_result(url)
+            return
+        
+        try:
+            message = json.loads(data)
+        except json.JSONDecodeError:
+            message = None
+        if isinstance(message, dict):
+            future = self._pending.get(message.get("id"))
+        elif len(data) > 10 and len(self._pending) == 1:
+            # 纯文本result无法按id对应，只有一个waiting中的request时才归给它
+            future = next(iter(self._pending.values()))
+            message = {"result": {"text": data}}
+        else:
+            future = None
+        if future is None or future.done():
+            logger.debug(f"📨 SSE事件: {event} {data[:100]}")
+            return
+        logger.info("✅ 收到MCP响应")
+        future.set_result(("success", message))
+
+    def get_stats(self) -> Dict[str, Any]:
+        endpoint = self._endpoint
+        return {
+            "name": self.name,
+            "connected": endpoint is not None and endpoint.done() and endpoint.exception() is None,
+            "session_id": self.session_id,
+            "pending": len(self._pending),
+            **self._stats
+        }
 
 class AsyncMCPClient:
     """异步MCP客户端 - 专为魔塔平台Optimize"""
@@ -32,129 +226,98 @@ class AsyncMCPClient:
     def __init__(self):
         self.timeout = 60
         self.result_timeout = 30  # waiting异步result的Timeout duration
+        self._sessions: Dict[str, MCPSession] = {}
+        self._refreshing: Set[str] = set()  # 正在后台刷新的缓存key
+        self._refresh_lock = threading.Lock()
         
-        # 魔塔MCPserviceconfiguration
-        self.mcp_services = {
-            "fetch": {
-                "url": "https://mcp.api-inference.modelscope.net/6ec508e067dc41/sse",
-                "name": "Fetch MCP",
-                "enabled": True,
-                "tools": {
-                    "fetch": {
-                        "url": "string",
-                        "max_length": "integer", 
-                        "start_index": "integer",
-                        "raw": "boolean"
-                    }
-                }
-            },
-            "deepwiki": {
-                "url": "https://mcp.api-inference.modelscope.net/d4ed08072d2846/sse",
-                "name": "DeepWiki MCP", 
-                "enabled": True,
-                "tools": {
-                    "deepwiki_fetch": {
-                        "url": "string",
-                        "mode": "string",
-                        "maxDepth": "integer"
-                    }
-                }
-            }
-        }
+        # MCPserviceconfiguration（config.mcp_services）；各service提供的工具由tools/list发现
+        self.mcp_services: Dict[str, MCPServiceConfig] = config.mcp_services
+        self._tools: Dict[str, Dict[str, Dict[str, Any]]] = {}  # service key -> 工具名 -> inputSchema
+        self._tools_fetched: Dict[str, float] = {}  # service key -> 上次成功发现的time（monotonic）
+        self._tools_failures: Dict[str, int] = {}  # service key -> 连续发现failed次数
+        self._tools_retry_at: Dict[str, float] = {}  # service key -> 发现failed后下次重试的time（monotonic）
+        self._discovering: Dict[str, asyncio.Task] = {}
+        for service_key, service_config in self.mcp_services.items():
+            mcp_health.register(service_key, service_config.name)
     
-    def _get_sse_endpoint(self, service_url: str) -> Tuple[bool, Optional[str], Optional[str]]:
-        """GetSSE endpoint和session_id"""
-        try:
-            headers = {
-                "Accept": "text/event-stream",
-                "Cache-Control": "no-cache"
-            }
-            
-            logger.info(f"🔗 connectionSSE: {service_url}")
-            response = requests.get(service_url, headers=headers, timeout=15, stream=True)
-            
-            if response.status_code != 200:
-                logger.error(f"❌ SSEconnectionfailed: HTTP {response.status_code}")
-                return False, None, None
-            
-            # ParseSSE事件
-            for line in response.iter_lines(decode_unicode=True):
-                if line.startswith('data: '):
-                    data = line[6:]  # remove 'data: ' 前缀
-                    if '/messages/' in data and 'session_id=' in data:
-                        session_id = data.split('session_id=')[1]
-                        logger.info(f"✅ Getsession_id: {session_id}")
-                        response.close()
-                        return True, data, session_id
-                elif line == "":
-                    break
-            
-            response.close()
-            logger.error("❌ 未Get到有效的endpoint")
-            return False, None, None
-            
-        except Exception as e:
-            logger.error(f"💥 SSEconnection异常: {str(e)}")
-            return False, None, None
+    def _session(self, service_key: str) -> MCPSession:
+        """service对应的长连会话（首次Call时创建，只在后台事件循环中访问）"""
+        session = self._sessions.get(service_key)
+        if session is None:
+            service_config = self.mcp_services[service_key]
+            session = MCPSession(service_config.url, service_config.name)
+            self._sessions[service_key] = session
+        return session
     
-    def _listen_for_result(self, service_url: str, session_id: str, result_queue: queue.Queue):
-        """监听SSE流Get异步result"""
-        try:
-            headers = {
-                "Accept": "text/event-stream",
-                "Cache-Control": "no-cache"
-            }
-            
-            logger.info(f"👂 start监听result...")
-            response = requests.get(service_url, headers=headers, timeout=self.result_timeout, stream=True)
-            
-            if response.status_code != 200:
-                result_queue.put(("error", f"监听connectionfailed: HTTP {response.status_code}"))
-                return
-            
-            # 监听SSE事件
-            for line in response.iter_lines(decode_unicode=True):
-                if line.startswith('data: '):
-                    data_str = line[6:]
-                    try:
-                        # attemptParseJSONdata
-                        data = json.loads(data_str)
-                        if isinstance(data, dict):
-                            # Check是否是MCP响应
-                            if "result" in data or "error" in data:
-                                logger.info("✅ 收到MCP响应")
-                                result_queue.put(("success", data))
-                                break
-                            elif "id" in data:  # 可能是MCP响应
-                                result_queue.put(("success", data))
-                                break
-                    except json.JSONDecodeError:
-                        # nonJSONdata，可能是纯文本result
-                        if len(data_str.strip()) > 10:
-                            logger.info("✅ 收到文本响应")
-                            result_queue.put(("success", {"result": {"text": data_str}}))
-                            break
-                elif line.startswith('event: '):
-                    event_type = line[7:]
-                    logger.debug(f"📨 SSE事件: {event_type}")
-            
-            response.close()
-            
-        except requests.exceptions.Timeout:
-            logger.warning("⏰ result监听timeout")
-            result_queue.put(("timeout", "waitingresulttimeout"))
-        except Exception as e:
-            logger.error(f"💥 监听异常: {str(e)}")
-            result_queue.put(("error", f"监听异常: {str(e)}"))
+    async def call_tool(self, service_key: str, tool_name: str, tool_args: Dict[str, Any],
+                        use_cache: bool = True) -> AsyncMCPResult:
+        """CallMCP工具；可在任意事件循环中await，实际在后台事件循环的共享会话上执行，
+        调用方被取消时request随之取消。use_cache=False时跳过result缓存（如连通性检查）"""
+        cached = await self._cached_result_async(service_key, tool_name, tool_args) if use_cache else None
+        if cached is not None:
+            return cached
+        call = self._call_tool(service_key, tool_name, tool_args, use_cache)
+        if background_loop.in_loop():
+            return await call
+        return await asyncio.wrap_future(background_loop.submit(call))
+    
+    def call_mcp_service_async(self, service_key: str, tool_name: str, tool_args: Dict[str, Any],
+                               use_cache: bool = True) -> AsyncMCPResult:
+        """call_tool 的同步facade"""
+        cached = self._cached_result(service_key, tool_name, tool_args) if use_cache else None
+        if cached is not None:
+            return cached
+        return background_loop.run(self._call_tool(service_key, tool_name, tool_args, use_cache))
+    
+    def _cached_result(self, service_key: str, tool_name: str, tool_args: Dict[str, Any]) -> Optional[AsyncMCPResult]:
+        """查询result缓存；已过TTL的result照常返回，同时在后台刷新"""
+        if service_key not in self.mcp_services:
+            return None
+        start_time = time.time()
+        key = mcp_result_cache.make_key(service_key, tool_name, tool_args)
+        return self._cache_hit(mcp_result_cache.get(key), service_key, tool_name, tool_args, start_time)
     
-    def call_mcp_service_async(
-        self,
-        service_key: str,
-        tool_name: str,
-        tool_args: Dict[str, Any]
-    ) -> AsyncMCPResult:
-        """异步CallMCPservice"""
+    async def _cached_result_async(self, service_key: str, tool_name: str,
+                                   tool_args: Dict[str, Any]) -> Optional[AsyncMCPResult]:
+        """_cached_result的异步version：磁盘缓存查询not占用调用方的事件循环"""
+        if service_key not in self.mcp_services:
+            return None
+        start_time = time.time()
+        key = mcp_result_cache.make_key(service_key, tool_name, tool_args)
+        entry = await mcp_result_cache.get_async(key)
+        return self._cache_hit(entry, service_key, tool_name, tool_args, start_time)
+    
+    def _cache_hit(self, entry: Optional[CachedMCPResult], service_key: str, tool_name: str,
+                   tool_args: Dict[str, Any], start_time: float) -> Optional[AsyncMCPResult]:
+        if entry is None:
+            return None
+        key = entry.key
+        service_name = self.mcp_services[service_key].name
+        if entry.stale:
+            self._refresh(key, service_key, tool_name, tool_args)
+        logger.info(f"⚡ {service_name} 命中result缓存（{entry.source}{'，已过期，后台刷新' if entry.stale else ''}）")
+        return AsyncMCPResult(
+            success=True,
+            data=entry.data,
+            service_name=service_name,
+            execution_time=time.time() - start_time,
+            from_cache=True
+        )
+    
+    def _refresh(self, key: str, service_key: str, tool_name: str, tool_args: Dict[str, Any]):
+        """在后台事件循环中重新Call工具并更新缓存，同一key同时只刷新一次"""
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
         
+        def done(_):
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+        background_loop.submit(self._call_tool(service_key, tool_name, tool_args)).add_done_callback(done)
+    
+    async def _call_tool(self, service_key: str, tool_name: str, tool_args: Dict[str, Any],
+                         store: bool = True) -> AsyncMCPResult:
         if service_key not in self.mcp_services:
             return AsyncMCPResult(
                 success=False,
@@ -164,157 +327,202 @@ class AsyncMCPClient:
                 error_message=f"未知service: {service_key}"
             )
         
-        service_config = self.mcp_services[service_key]
-        service_url = service_config["url"]
-        service_name = service_config["name"]
+        service_name = self.mcp_services[service_key].name
+        if not self.mcp_services[service_key].enabled:
+            return AsyncMCPResult(
+                success=False,
+                data="",
+                service_name=service_name,
+                execution_time=0.0,
+                error_message=f"{service_name} 未启用"
+            )
+        
+        # 先检查熔断：熔断中的service连工具发现也not做
+        permit = mcp_health.allow(service_key)
+        if permit is None:
+            logger.info(f"🚫 {service_name} 熔断中，跳过Call")
+            return AsyncMCPResult(
+                success=False,
+                data="",
+                service_name=service_name,
+                execution_time=0.0,
+                error_message=f"{service_name} 暂not可用（熔断中）"
+            )
+        try:
+            return await self._call_allowed(service_key, tool_name, tool_args, store, permit)
+        finally:
+            # 被取消（包括工具发现期间）或Validatefailed、没有记录result时归还试探名额；已记录result时无操作
+            mcp_health.release(service_key, permit)
+    
+    async def _call_allowed(self, service_key: str, tool_name: str, tool_args: Dict[str, Any],
+                            store: bool, permit: CallPermit) -> AsyncMCPResult:
+        """熔断器已放行后的Call：工具发现、本地Validate和实际request"""
+        service_name = self.mcp_services[service_key].name
+        # 按发现的工具schema本地Validateparameter，无效Call不再浪费一次远程往返；
+        # 工具列表not可用（发现failed、退避中或waiting超时）或工具没有schema时不做Validate，照常Call
+        try:
+            tools = await asyncio.wait_for(self.list_tools(service_key), TOOL_DISCOVERY_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            tools = {}
+        invalid = None
+        if tools and tool_name not in tools:
+            invalid = f"{service_name} 没有工具 {tool_name}（可用: {', '.join(sorted(tools))}）"
+        elif tools.get(tool_name):
+            invalid = validate_tool_args(tools[tool_name], tool_args)
+        if invalid:
+            logger.warning(f"⚠️ {service_name} parameterValidatefailed: {invalid}")
+            return AsyncMCPResult(
+                success=False,
+                data="",
+                service_name=service_name,
+                execution_time=0.0,
+                error_message=invalid
+            )
         
+        session = self._session(service_key)
         start_time = time.time()
         
         logger.info(f"🚀 startCall {service_name}")
         logger.info(f"📊 工具: {tool_name}")
         logger.info(f"📋 parameter: {json.dumps(tool_args, ensure_ascii=False)}")
         
-        # 步骤1: GetSSE endpoint
-        success, endpoint_path, session_id = self._get_sse_endpoint(service_url)
-        if not success:
+        result_type, result_data = await session.request(
+            "tools/call", {"name": tool_name, "arguments": tool_args}, self.result_timeout
+        )
+        execution_time = time.time() - start_time
+        
+        if result_type != "success":
+            mcp_health.record_failure(service_key, str(result_data), permit)
             return AsyncMCPResult(
                 success=False,
                 data="",
                 service_name=service_name,
-                execution_time=time.time() - start_time,
-                error_message="Getendpointfailed"
+                execution_time=execution_time,
+                session_id=session.session_id,
+                error_message=str(result_data)
             )
         
-        # 步骤2: 启动result监听器
-        result_queue = queue.Queue()
-        listener_thread = threading.Thread(
-            target=self._listen_for_result,
-            args=(service_url, session_id, result_queue)
+        mcp_health.record_success(service_key, execution_time, permit)
+        content = self._extract_content_from_response(result_data)
+        if content and len(content.strip()) > 10:
+            logger.info(f"✅ {service_name} 异步Callsuccessful!")
+            if store and not content.startswith("error: "):
+                # 磁盘写入放到线程池，not阻塞后台事件循环
+                await asyncio.to_thread(mcp_result_cache.put, mcp_result_cache.make_key(service_key, tool_name, tool_args),
+                                        service_key, content)
+            return AsyncMCPResult(
+                success=True,
+                data=content,
+                service_name=service_name,
+                execution_time=execution_time,
+                session_id=session.session_id
+            )
+        return AsyncMCPResult(
+            success=False,
+            data="",
+            service_name=service_name,
+            execution_time=execution_time,
+            session_id=session.session_id,
+            error_message="响应contentis empty"
         )
-        listener_thread.daemon = True
-        listener_thread.start()
+    
+    async def list_tools(self, service_key: str, refresh: bool = False) -> Dict[str, Dict[str, Any]]:
+        """service提供的工具（工具名 -> inputSchema），来自tools/list并缓存
+
+        首次使用时同步发现；超过tools_refresh_seconds后先返回旧列表，同时在后台重新发现。
+        发现failed时返回旧列表（没有则为空），并在退避期内not再重新发现。只在后台事件循环中Call
+        """
+        service_config = self.mcp_services.get(service_key)
+        if service_config is None or not service_config.enabled:
+            return {}
+        tools = self._tools.get(service_key)
+        fetched = self._tools_fetched.get(service_key)
+        fresh = fetched is not None and time.monotonic() - fetched < service_config.tools_refresh_seconds
+        if tools is not None and fresh and not refresh:
+            return tools
+        if not refresh and time.monotonic() < self._tools_retry_at.get(service_key, 0.0):
+            return tools or {}
         
-        # waitinga short segmenttime确保监听器就绪
-        time.sleep(0.5)
+        task = self._discovering.get(service_key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._discover_tools(service_key))
+            self._discovering[service_key] = task
+            task.add_done_callback(lambda _: self._discovering.pop(service_key, None))
+        if tools is not None and not refresh:
+            return tools
+        # shield：单个调用方被取消not影响其他waiting同一次发现的调用方
+        return await asyncio.shield(task)
+    
+    async def _discover_tools(self, service_key: str) -> Dict[str, Dict[str, Any]]:
+        service_name = self.mcp_services[service_key].name
+        previous = self._tools.get(service_key, {})
+        if not mcp_health.is_available(service_key):
+            return previous
         
-        # 步骤3: 发送MCPrequest
         try:
-            base_url = service_url.replace('/sse', '')
-            full_endpoint = urljoin(base_url, endpoint_path)
-            
-            mcp_request = {
-                "jsonrpc": "2.0",
-                "id": int(time.time() * 1000),
-                "method": "tools/call",
-                "params": {
-                    "name": tool_name,
-                    "arguments": tool_args
-                }
-            }
-            
-            headers = {
-                "Content-Type": "application/json",
-                "Accept": "application/json"
-            }
-            
-            logger.info(f"📤 发送request到: {full_endpoint}")
-            response = requests.post(full_endpoint, json=mcp_request, headers=headers, timeout=10)
-            
-            logger.info(f"📊 request响应: HTTP {response.status_code}")
-            
-            if response.status_code == 202:  # Accepted - 异步Process
-                logger.info("✅ request已接受，waiting异步result...")
-                
-                # 步骤4: waiting异步result
-                try:
-                    result_type, result_data = result_queue.get(timeout=self.result_timeout)
-                    
-                    execution_time = time.time() - start_time
-                    
-                    if result_type == "success":
-                        # Parseresultdata
-                        content = self._extract_content_from_response(result_data)
-                        if content and len(content.strip()) > 10:
-                            logger.info(f"✅ {service_name} 异步Callsuccessful!")
-                            return AsyncMCPResult(
-                                success=True,
-                                data=content,
-                                service_name=service_name,
-                                execution_time=execution_time,
-                                session_id=session_id
-                            )
-                        else:
-                            return AsyncMCPResult(
-                                success=False,
-                                data="",
-                                service_name=service_name,
-                                execution_time=execution_time,
-                                session_id=session_id,
-                                error_message="响应contentis empty"
-                            )
-                    else:
-                        return AsyncMCPResult(
-                            success=False,
-                            data="",
-                            service_name=service_name,
-                            execution_time=execution_time,
-                            session_id=session_id,
-                            error_message=str(result_data)
-                        )
-                        
-                except queue.Empty:
-                    return AsyncMCPResult(
-                        success=False,
-                        data="",
-                        service_name=service_name,
-                        execution_time=time.time() - start_time,
-                        session_id=session_id,
-                        error_message="waiting异步resulttimeout"
-                    )
-            
-            elif response.status_code == 200:
-                # 同步响应
-                try:
-                    data = response.json()
-                    content = self._extract_content_from_response(data)
-                    execution_time = time.time() - start_time
-                    
-                    return AsyncMCPResult(
-                        success=bool(content and len(content.strip()) > 10),
-                        data=content or "",
-                        service_name=service_name,
-                        execution_time=execution_time,
-                        session_id=session_id,
-                        error_message=None if content else "响应contentis empty"
-                    )
-                except json.JSONDecodeError:
-                    content = response.text
-                    return AsyncMCPResult(
-                        success=len(content.strip()) > 10,
-                        data=content,
-                        service_name=service_name,
-                        execution_time=time.time() - start_time,
-                        session_id=session_id
-                    )
-            else:
-                return AsyncMCPResult(
-                    success=False,
-                    data="",
-                    service_name=service_name,
-                    execution_time=time.time() - start_time,
-                    session_id=session_id,
-                    error_message=f"HTTP {response.status_code}: {response.text[:200]}"
-                )
-                
+            result_type, result_data = await self._session(service_key).request("tools/list", {}, self.result_timeout)
         except Exception as e:
+            result_type, result_data = "error", str(e)
+        listed = result_data.get("result", {}).get("tools") if result_type == "success" and isinstance(result_data, dict) else None
+        if not isinstance(listed, list):
+            error = result_data.get("error") if isinstance(result_data, dict) else result_data
+            failures = self._tools_failures[service_key] = self._tools_failures.get(service_key, 0) + 1
+            retry_in = min(self.mcp_services[service_key].tools_refresh_seconds,
+                           TOOL_DISCOVERY_RETRY_SECONDS * 2 ** (failures - 1))
+            self._tools_retry_at[service_key] = time.monotonic() + retry_in
+            logger.warning(f"⚠️ {service_name} 工具发现failed（{retry_in:.0f}s 后重试）: {error}")
+            return previous
+        
+        tools = {
+            tool["name"]: tool.get("inputSchema") or {}
+            for tool in listed if isinstance(tool, dict) and tool.get("name")
+        }
+        self._tools[service_key] = tools
+        self._tools_fetched[service_key] = time.monotonic()
+        self._tools_failures.pop(service_key, None)
+        self._tools_retry_at.pop(service_key, None)
+        logger.info(f"🧰 {service_name} 发现 {len(tools)} 个工具: {', '.join(sorted(tools))}")
+        return tools
+    
+    async def discover_all(self):
+        """启动时预先发现所有已启用service的工具"""
+        await asyncio.gather(*(self.list_tools(key) for key, service in self.mcp_services.items() if service.enabled))
+    
+    def service_for_tool(self, tool_name: str, preferred: Optional[str] = None) -> Optional[str]:
+        """提供该工具的service：优先preferred，否则取第一个发现了该工具的已启用service；
+        还没有发现result时退回preferred"""
+        candidates = [key for key, service in self.mcp_services.items()
+                      if service.enabled and tool_name in self._tools.get(key, {})]
+        if preferred in candidates or (not candidates and preferred in self.mcp_services):
+            return preferred
+        return candidates[0] if candidates else None
+    
+    async def call_discovered_tool(self, tool_name: str, tool_args: Dict[str, Any],
+                                   preferred: Optional[str] = None) -> AsyncMCPResult:
+        """按工具名CallMCP工具，service由发现的工具列表决定"""
+        service_key = self.service_for_tool(tool_name, preferred)
+        if service_key is None:
             return AsyncMCPResult(
                 success=False,
                 data="",
-                service_name=service_name,
-                execution_time=time.time() - start_time,
-                session_id=session_id,
-                error_message=f"request异常: {str(e)}"
+                service_name=tool_name,
+                execution_time=0.0,
+                error_message=f"没有service提供工具: {tool_name}"
             )
+        return await self.call_tool(service_key, tool_name, tool_args)
+    
+    def get_tool_stats(self) -> Dict[str, List[str]]:
+        """各service已发现的工具名"""
+        return {key: sorted(tools) for key, tools in list(self._tools.items())}
+    
+    async def probe(self, service_key: str) -> Tuple[bool, str]:
+        """健康探测：发送JSON-RPC ping，收到任何响应（包括error响应）即视为service可用"""
+        result_type, result_data = await self._session(service_key).request("ping", {}, self.result_timeout)
+        return result_type == "success", "" if result_type == "success" else str(result_data)
+    
+    def get_session_stats(self) -> List[Dict[str, Any]]:
+        """各service长连会话的status"""
+        return [{"service": key, **session.get_stats()} for key, session in list(self._sessions.items())]
     
     def _extract_content_from_response(self, response_data: Any) -> Optional[str]:
         """从响应中提取content"""
@@ -371,25 +579,62 @@ class AsyncMCPClient:
             logger.warning(f"⚠️ content提取failed: {e}")
             return str(response_data) if response_data else None
 
+_JSON_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+    "null": type(None),
+}
+
+def validate_tool_args(schema: Dict[str, Any], tool_args: Dict[str, Any]) -> Optional[str]:
+    """按工具inputSchema（JSON Schema的常用子集：required、properties的type/enum、
+    additionalProperties=false）Validateparameter，返回error说明，有效时返回None"""
+    if not isinstance(tool_args, dict):
+        return "parameter必须是object"
+    missing = [name for name in schema.get("required", []) if name not in tool_args]
+    if missing:
+        return f"缺少必填parameter: {', '.join(missing)}"
+    
+    properties = schema.get("properties") or {}
+    for name, value in tool_args.items():
+        spec = properties.get(name)
+        if spec is None:
+            if schema.get("additionalProperties") is False:
+                return f"未知parameter: {name}"
+            continue
+        types = spec.get("type")
+        if types:
+            types = types if isinstance(types, list) else [types]
+            # bool是int的子类，integer/number不接受布尔值
+            if not any(isinstance(value, _JSON_TYPES.get(t, object)) and not (isinstance(value, bool) and t != "boolean")
+                       for t in types):
+                return f"parameter {name} 应为 {'/'.join(types)}，实际为 {type(value).__name__}"
+        if "enum" in spec and value not in spec["enum"]:
+            return f"parameter {name} 取值无效: {value!r}（可选: {', '.join(map(str, spec['enum']))}）"
+    return None
+
 # 全局实例
 async_mcp_client = AsyncMCPClient()
 
 # 便捷函数
+async def call_fetch_mcp(url: str, max_length: int = 5000) -> AsyncMCPResult:
+    """CallFetch MCPservice"""
+    return await async_mcp_client.call_discovered_tool("fetch", {"url": url, "max_length": max_length}, preferred="fetch")
+
+async def call_deepwiki_mcp(url: str, mode: str = "aggregate") -> AsyncMCPResult:
+    """CallDeepWiki MCPservice"""
+    return await async_mcp_client.call_discovered_tool("deepwiki_fetch", {"url": url, "mode": mode}, preferred="deepwiki")
+
 def call_fetch_mcp_async(url: str, max_length: int = 5000) -> AsyncMCPResult:
-    """异步CallFetch MCPservice"""
-    return async_mcp_client.call_mcp_service_async(
-        "fetch",
-        "fetch",
-        {"url": url, "max_length": max_length}
-    )
+    """call_fetch_mcp 的同步facade"""
+    return background_loop.run(call_fetch_mcp(url, max_length))
 
 def call_deepwiki_mcp_async(url: str, mode: str = "aggregate") -> AsyncMCPResult:
-    """异步CallDeepWiki MCPservice"""
-    return async_mcp_client.call_mcp_service_async(
-        "deepwiki",
-        "deepwiki_fetch", 
-        {"url": url, "mode": mode}
-    )
+    """call_deepwiki_mcp 的同步facade"""
+    return background_loop.run(call_deepwiki_mcp(url, mode))
 
 if __name__ == "__main__":
     # test异步MCP客户端
@@ -48,6 +48,11 @@ class ExplanationManager:
         self.quality_metrics.clear()
         logger.info("🔄 startProcess链条追踪")
     
+    def follow(self, other: "ExplanationManager"):
+        """共享另一条Process链条的步骤（合并到进行中的相同request时展示同一条链条）"""
+        self.processing_steps = other.processing_steps
+        self.quality_metrics = other.quality_metrics
+    
     def add_processing_step(self, 
                           stage: ProcessingStage,
                           title: str,
@@ -0,0 +1,1752 @@
+"""
+Development Plan生成流水线
+Enter校验、外部知识Get（MCP）、prompt组装、LLMstreamGenerate和后Process。
+不依赖Gradio UI，可由app、REST API、后台任务和批量工具直接导入，导入时不启动任何后台服务
+"""
+
+import asyncio
+import contextlib
+import httpx
+import requests
+import os
+import logging
+import json
+from datetime import datetime, timedelta
+from typing import Optional, Tuple, Dict, Any, List, Iterator, AsyncIterator, Awaitable, Callable
+from urllib.parse import urlparse
+
+from config import config
+from explanation_manager import ExplanationManager, ProcessingStage
+from http_transport import http_transport
+from async_runtime import background_loop
+from admission_control import llm_admission, AdmissionRejected
+from llm_client import stream_completion_with_continuation, CompletionStats, LLMError
+from model_router import model_router
+from prompt_assembler import prompt_assembler, AssembledPrompt
+from prompt_templates import prompt_templates, GENERATION_SYSTEM, GENERATION_USER, GENERATION_USER_WITH_KNOWLEDGE
+from sectioned_generation import stream_sectioned_completion, merge_sections, PLAN_SECTIONS
+from plan_cache import plan_cache
+from idea_similarity import idea_index, SimilarIdea, simhash, idea_preview
+from single_flight import generation_flights
+from mcp_health import mcp_health
+
+logger = logging.getLogger(__name__)
+
+class GenerationError(Exception):
+    """Generatefailed；message为展示给user的说明（如"❌ APIrequestfailed: ..."）"""
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+# Generation parameters (also part of the plan cache key).
+# model_router replaces the model per endpoint; GENERATION_MODEL names the default model group.
+GENERATION_MODEL = config.ai_model.model_name
+
+GENERATION_TEMPERATURE = 0.7
+
+GENERATION_MAX_TOKENS = 4096  # Fix：API限制最大4096 tokens
+
+# Derived from the registered templates' versions and content fingerprints
+PROMPT_TEMPLATE_VERSION = prompt_templates.version_key(
+    GENERATION_SYSTEM.name, GENERATION_USER.name, GENERATION_USER_WITH_KNOWLEDGE.name
+)
+
+def validate_input(user_idea: str) -> Tuple[bool, str]:
+    """Validate user input"""
+    if not user_idea or not user_idea.strip():
+        return False, "❌ Please enter your product idea!"
+    
+    if len(user_idea.strip()) < 10:
+        return False, "❌ Product idea description is too short, please provide more details"
+    
+    return True, ""
+
+def similarity_context(reference_url: str) -> str:
+    """Everything except the idea text that must match for a cached plan to be reusable"""
+    return plan_cache.make_key("", reference_url, GENERATION_MODEL, PROMPT_TEMPLATE_VERSION, GENERATION_TEMPERATURE)
+
+def check_similar_idea(user_idea: str, reference_url: str) -> Optional[SimilarIdea]:
+    """Look up a near-duplicate idea that already has a generated plan"""
+    similar = idea_index.find_similar(user_idea, similarity_context(reference_url))
+    if similar:
+        logger.info(f"🔁 Similar idea found (distance={similar.distance}): {similar.idea_preview}")
+    return similar
+
+# 相似创意index只在内存中：启动时用方案缓存里持久化的指纹恢复，重启后仍能匹配已缓存的方案
+idea_index.load(plan_cache.idea_fingerprints())
+
+def validate_url(url: str) -> bool:
+    """Validate URL format"""
+    try:
+        result = urlparse(url)
+        return all([result.scheme, result.netloc])
+    except Exception:
+        return False
+
+def fetch_knowledge_from_url_via_mcp(url: str) -> tuple[bool, str]:
+    """Synchronous facade for fetch_knowledge_from_url_via_mcp_async"""
+    return background_loop.run(fetch_knowledge_from_url_via_mcp_async(url))
+
+def is_usable_mcp_result(result) -> bool:
+    """MCP result carries real content (not an empty body or an extracted JSON-RPC error)"""
+    data = (result.data or "").strip()
+    return bool(result.success and len(data) > 10 and not data.startswith("error:"))
+
+async def race_mcp_calls(calls: List[Tuple[str, Callable[[], Awaitable[Any]]]]) -> tuple[bool, str]:
+    """Run MCP calls concurrently; the first usable result wins and the others are cancelled"""
+    tasks = {asyncio.ensure_future(factory()): name for name, factory in calls}
+    errors = []
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = tasks[task]
+                try:
+                    result = task.result()
+                except Exception as e:
+                    logger.warning(f"⚠️ {name} call exception during race: {str(e)}")
+                    errors.append(f"{name}: {str(e)}")
+                    continue
+                if is_usable_mcp_result(result):
+                    logger.info(f"🏁 {name} won the race, content length: {len(result.data)}, elapsed time: {result.execution_time:.2f}s")
+                    return True, result.data
+                logger.warning(f"⚠️ {name} returned no usable content during race: {result.error_message}")
+                errors.append(f"{name}: {result.error_message or 'empty content'}")
+        return False, f"MCP service call failed: {'; '.join(errors) or 'Unknown error'}"
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+async def fetch_knowledge_from_url_via_mcp_async(url: str) -> tuple[bool, str]:
+    """Fetch knowledge from URL via enhanced async MCP service; cancelling the caller cancels the MCP calls
+
+    The strategy is chosen per domain (config.mcp_routing): race DeepWiki against Fetch,
+    try DeepWiki then Fetch, or use Fetch only.
+    """
+    from enhanced_mcp_client import call_fetch_mcp, call_deepwiki_mcp
+    from urllib.parse import urlparse
+    
+    # Intelligent MCP service selection - use proper domain parsing
+    domain = urlparse(url.lower()).netloc
+    strategy = config.mcp_routing.strategy_for(domain)
+    
+    # Services whose circuit breaker is open are skipped without a round-trip
+    deepwiki_up = mcp_health.is_available("deepwiki")
+    fetch_up = mcp_health.is_available("fetch")
+    if strategy in ("race", "sequential") and not deepwiki_up:
+        logger.info(f"🚫 DeepWiki MCP circuit open, using Fetch MCP only for {domain}")
+        strategy = "fetch"
+    if strategy == "race" and not fetch_up:
+        logger.info(f"🚫 Fetch MCP circuit open, using DeepWiki MCP only for {domain}")
+        strategy = "sequential"
+    if strategy == "fetch" and not fetch_up:
+        logger.warning(f"🚫 No MCP service available for {domain}, skipping MCP")
+        return False, "MCP service unavailable: circuit breaker open"
+    
+    if strategy == "race":
+        logger.info(f"🏁 Racing DeepWiki MCP against Fetch MCP for {domain}: {url}")
+        return await race_mcp_calls([
+            ("DeepWiki MCP", lambda: call_deepwiki_mcp(url)),
+            ("Fetch MCP", lambda: call_fetch_mcp(url, max_length=8000))
+        ])
+    
+    if strategy == "sequential":
+        # DeepWiki first, Fetch only after it fails
+        try:
+            logger.info(f"🔍 Using async DeepWiki MCP for {domain}: {url}")
+            result = await call_deepwiki_mcp(url)
+            
+            if is_usable_mcp_result(result):
+                logger.info(f"✅ DeepWiki MCP async call successful, content length: {len(result.data)}, elapsed time: {result.execution_time:.2f}s")
+                return True, result.data
+            else:
+                logger.warning(f"⚠️ DeepWiki MCP failed, switching to Fetch MCP: {result.error_message}")
+        except Exception as e:
+            logger.error(f"❌ DeepWiki MCP call exception, switching to Fetch MCP: {str(e)}")
+            result = None
+        if not fetch_up:
+            return False, f"MCP service call failed: {(result and result.error_message) or 'Unknown error'}; Fetch MCP circuit open"
+    
+    # Use generic async Fetch MCP service
+    try:
+        logger.info(f"🌐 Using async Fetch MCP to retrieve content: {url}")
+        result = await call_fetch_mcp(url, max_length=8000)  # Increased length limit
+        
+        if is_usable_mcp_result(result):
+            logger.info(f"✅ Fetch MCP async call successful, content length: {len(result.data)}, elapsed time: {result.execution_time:.2f}s")
+            return True, result.data
+        else:
+            logger.warning(f"⚠️ Fetch MCP call failed: {result.error_message}")
+            return False, f"MCP service call failed: {result.error_message or 'Unknown error'}"
+    except Exception as e:
+        logger.error(f"❌ Fetch MCP call exception: {str(e)}")
+        return False, f"MCP service call exception: {str(e)}"
+
+MCP_STATUS_LABELS = {
+    "healthy": ("✅", "Online"),
+    "degraded": ("⚠️", "Unstable"),
+    "recovering": ("🔄", "Recovering"),
+    "down": ("❌", "Offline"),
+    "unknown": ("⏳", "Not checked yet"),
+}
+
+MCP_SERVICE_ROLES = {"fetch": "General web scraping", "deepwiki": "deepwiki.org only"}
+
+def get_mcp_status_display() -> str:
+    """Get MCP service status display from the health monitor's cached state (no network calls)"""
+    from enhanced_mcp_client import async_mcp_client
+    
+    now = datetime.now().timestamp()
+    discovered_tools = async_mcp_client.get_tool_stats()
+    status_lines = ["## 🚀 Async MCP Service Status"]
+    for service in mcp_health.get_stats():
+        icon, label = MCP_STATUS_LABELS.get(service["status"], ("❔", service["status"]))
+        role = MCP_SERVICE_ROLES.get(service["service"])
+        status_lines.append(f"- {icon} **{service['name']}**: {label}{f' ({role})' if role else ''}")
+        if service["status"] == "down":
+            status_lines.append(f"  🚫 Circuit open, retry in {service['open_for']:.0f}s")
+        if service["last_ok"] and service["last_latency"] is not None:
+            status_lines.append(f"  ⏱️ Response time: {service['last_latency']:.2f}s")
+        if service["last_error"]:
+            status_lines.append(f"  ⚠️ Last error: {service['last_error'][:100]}")
+        if service["last_checked"] is not None:
+            status_lines.append(f"  🕒 Checked {now - service['last_checked']:.0f}s ago")
+        if discovered_tools.get(service["service"]):
+            status_lines.append(f"  🧰 Tools: {', '.join(discovered_tools[service['service']])}")
+    
+    status_lines.extend([
+        "",
+        "🧠 **Intelligent Async Routing:**",
+        *[f"- `{domain}` → {strategy} ({'DeepWiki + Fetch in parallel, first result wins' if strategy == 'race' else 'DeepWiki, then Fetch' if strategy == 'sequential' else 'Fetch MCP'})"
+          for domain, strategy in config.mcp_routing.domain_strategies.items()],
+        f"- Other websites → {config.mcp_routing.default_strategy} (async processing)",
+        "- HTTP 202 → SSE listening → Result retrieval",
+        "- Auto fallback + circuit breaker per service"
+    ])
+    
+    return "\n".join(status_lines)
+
+def call_mcp_service(url: str, payload: Dict[str, Any], service_name: str, timeout: int = 120) -> Tuple[bool, str]:
+    """Unified MCP service call function
+    
+    Args:
+        url: MCP service URL
+        payload: Request payload
+        service_name: Service name (for logging)
+        timeout: Timeout duration
+        
+    Returns:
+        (success, data): Success flag and returned data
+    """
+    try:
+        logger.info(f"🔥 DEBUG: Calling {service_name} MCP service at {url}")
+        logger.info(f"🔥 DEBUG: Payload: {json.dumps(payload, ensure_ascii=False, indent=2)}")
+        
+        response = http_transport.post(
+            url,
+            headers={"Content-Type": "application/json"},
+            json=payload,
+            timeout=timeout
+        )
+        
+        logger.info(f"🔥 DEBUG: Response status: {response.status_code}")
+        logger.info(f"🔥 DEBUG: Response headers: {dict(response.headers)}")
+        
+        try:
+            response_data = response.json()
+            logger.info(f"🔥 DEBUG: Response JSON: {json.dumps(response_data, ensure_ascii=False, indent=2)}")
+        except:
+            response_text = response.text[:1000]  # Only print first 1000 characters
+            logger.info(f"🔥 DEBUG: Response text: {response_text}")
+        
+        if response.status_code == 200:
+            data = response.json()
+            
+            # Check multiple possible response formats
+            content = None
+            if "data" in data and data["data"]:
+                content = data["data"]
+            elif "result" in data and data["result"]:
+                content = data["result"]
+            elif "content" in data and data["content"]:
+                content = data["content"]
+            elif "message" in data and data["message"]:
+                content = data["message"]
+            else:
+                # If none of the above, try using the entire response directly
+                content = str(data)
+            
+            if content and len(str(content).strip()) > 10:
+                logger.info(f"✅ {service_name} MCP service returned {len(str(content))} characters")
+                return True, str(content)
+            else:
+                logger.warning(f"⚠️ {service_name} MCP service returned empty or invalid data: {data}")
+                return False, f"❌ {service_name} MCP returned empty data or format error"
+        else:
+            logger.error(f"❌ {service_name} MCP service failed with status {response.status_code}")
+            logger.error(f"❌ Response content: {response.text[:500]}")
+            return False, f"❌ {service_name} MCP call failed: HTTP {response.status_code}"
+            
+    except requests.exceptions.Timeout:
+        logger.error(f"⏰ {service_name} MCP service timeout after {timeout}s")
+        return False, f"❌ {service_name} MCP call timeout"
+    except requests.exceptions.ConnectionError as e:
+        logger.error(f"🔌 {service_name} MCP service connection failed: {str(e)}")
+        return False, f"❌ {service_name} MCP connection failed"
+    except Exception as e:
+        logger.error(f"💥 {service_name} MCP service error: {str(e)}")
+        return False, f"❌ {service_name} MCP call error: {str(e)}"
+
+def fetch_external_knowledge(reference_url: str) -> str:
+    """Synchronous facade for fetch_external_knowledge_async"""
+    return background_loop.run(fetch_external_knowledge_async(reference_url))
+
+async def fetch_external_knowledge_async(reference_url: str) -> str:
+    """Fetch external knowledge base content - Using modular MCP manager to prevent fake link generation"""
+    if not reference_url or not reference_url.strip():
+        return ""
+    
+    # Verify if URL is accessible
+    url = reference_url.strip()
+    logger.info(f"🔍 Starting to process external reference link: {url}")
+    
+    try:
+        # Simple HEAD request to check if URL exists
+        logger.info(f"🌐 Verify link accessibility: {url}")
+        response = await http_transport.async_request("HEAD", url, timeout=10, follow_redirects=True)
+        logger.info(f"📡 Link verification result: HTTP {response.status_code}")
+        
+        if response.status_code >= 400:
+            logger.warning(f"⚠️ Provided URL is not accessible: {url} (HTTP {response.status_code})")
+            return f"""
+## ⚠️ Reference Link Status Alert
+
+**🔗 Provided link**: {url}
+
+**❌ Link status**: Unable to access (HTTP {response.status_code})
+
+**💡 suggestions**: 
+- Please check if the link is correct
+- Or remove the reference link and use pure AI generation mode
+- AI will generate a professional development plan based on the idea description
+
+---
+"""
+        else:
+            logger.info(f"✅ Link accessible, status code: {response.status_code}")
+            
+    except httpx.TimeoutException:
+        logger.warning(f"⏰ URL verification timeout: {url}")
+        return f"""
+## 🔗 参考linkProcess说明
+
+**📍 Provided link**: {url}
+
+**⏰ Processstatus**: linkValidatetimeout
+
+**🤖 AIProcess**: 将基于创意content进行Intelligent Analysis，not依赖外部link
+
+**💡 说明**: 为确保Generate质量，AI会根据Idea DescriptionGenerateComplete Solution，避免引用not确定的外部content
+
+---
+"""
+    except Exception as e:
+        logger.warning(f"⚠️ URLValidatefailed: {url} - {str(e)}")
+        return f"""
+## 🔗 参考linkProcess说明
+
+**📍 Provided link**: {url}
+
+**🔍 Processstatus**: 暂时unable toValidatelinkavailable性 ({str(e)[:100]})
+
+**🤖 AIProcess**: 将基于创意content进行Intelligent Analysis，not依赖外部link
+
+**💡 说明**: 为确保Generate质量，AI会根据Idea DescriptionGenerateComplete Solution，避免引用not确定的外部content
+
+---
+"""
+    
+    # attemptCallMCPservice
+    logger.info(f"🔄 attemptCallMCPserviceGet知识...")
+    mcp_start_time = datetime.now()
+    success, knowledge = await fetch_knowledge_from_url_via_mcp_async(url)
+    mcp_duration = (datetime.now() - mcp_start_time).total_seconds()
+    
+    logger.info(f"📊 MCPserviceCallresult: successful={success}, contentlength={len(knowledge) if knowledge else 0}, 耗时={mcp_duration:.2f}s")
+    
+    if success and knowledge and len(knowledge.strip()) > 50:
+        # MCPservicesuccessful返回有效content
+        logger.info(f"✅ MCPservicesuccessfulGet知识，contentlength: {len(knowledge)} 字符")
+        
+        # Validate返回的content是否包含实际知识而not是errorinformation
+        if not any(keyword in knowledge.lower() for keyword in ['error', 'failed', 'error', 'failed', 'notavailable']):
+            return f"""
+## 📚 外部知识库参考
+
+**🔗 来源link**: {url}
+
+**✅ Getstatus**: MCPservicesuccessfulGet
+
+**📊 content概览**: 已Get {len(knowledge)} 字符的参考资料
+
+---
+
+{knowledge}
+
+---
+"""
+        else:
+            logger.warning(f"⚠️ MCP返回content包含errorinformation: {knowledge[:200]}")
+    else:
+        # MCPservicefailed或返回无效content，提供明确说明
+        logger.warning(f"⚠️ MCPserviceCallfailed或返回无效content")
+        
+        # 详细诊断MCPservicestatus
+        mcp_status = get_mcp_status_display()
+        logger.info(f"🔍 MCPservicestatusdetails: {mcp_status}")
+        
+        return f"""
+## 🔗 外部知识Process说明
+
+**📍 参考link**: {url}
+
+**🎯 Process方式**: Intelligent Analysismode
+
+**� MCPservicestatus**: 
+{mcp_status}
+
+**�💭 Process策略**: current外部知识service暂时notavailable，AI将基于以下方式Generate方案：
+- ✅ 基于Idea Description进行深度分析
+- ✅ 结合行业最佳实践
+- ✅ 提供完整的Technical Solution
+- ✅ Generate实用的Coding Prompts
+
+**🎉 优势**: 确保Generatecontent的准确性和可靠性，避免引用not确定的外部information
+
+**🔧 技术细节**: 
+- MCPCall耗时: {mcp_duration:.2f}s
+- 返回contentlength: {len(knowledge) if knowledge else 0} 字符
+- servicestatus: {'successful' if success else 'failed'}
+
+---
+"""
+
+KNOWLEDGE_MODE_LABELS = {
+    "no_reference": "无参考link",
+    "completed": "在deadline内completed",
+    "deadline_skipped": "超过deadline，not带知识Generate",
+    "hedge_won": "知识在首token之前到达，改用带知识Generate",
+    "hedge_late": "首token先到达，丢弃迟到的知识",
+    "hedge_unusable": "知识到达但notavailable，继续not带知识Generate",
+}
+
+# 按策略放弃了参考link知识的情况：在方案开头告知user，而not是悄悄Generate一份not带知识的方案
+KNOWLEDGE_DROPPED_MODES = ("deadline_skipped", "hedge_late")
+
+def knowledge_dropped_notice(reference_url: str, mode: str) -> str:
+    """Notice prepended to the plan when the knowledge strategy dropped the reference link's content"""
+    if mode not in KNOWLEDGE_DROPPED_MODES:
+        return ""
+    return (f"> ⚠️ 参考link的content未能及时Get（{KNOWLEDGE_MODE_LABELS[mode]}），本方案未参考 {reference_url}。"
+            f"如需参考该link，请稍后重新Generate，或将 KNOWLEDGE_STRATEGY 设为 wait。\n\n")
+
+def is_usable_knowledge(knowledge: str) -> bool:
+    """Whether retrieved knowledge is real content rather than a status/fallback notice"""
+    return bool(knowledge) and not any(keyword in knowledge for keyword in ["❌", "⚠️", "Process说明", "暂时notavailable"])
+
+def knowledge_result(task: "asyncio.Task") -> str:
+    """Result of a finished knowledge task; failures degrade to no knowledge"""
+    try:
+        return task.result() or ""
+    except Exception as e:
+        logger.warning(f"⚠️ Knowledge retrieval failed: {e}")
+        return ""
+
+async def wait_for_knowledge(knowledge_task: Optional["asyncio.Task"]) -> Tuple[str, str, Optional["asyncio.Task"]]:
+    """Wait for knowledge retrieval up to the configured deadline.
+    
+    Returns (knowledge, mode, pending_task); pending_task is only set when the
+    hedge strategy lets generation start while retrieval keeps running.
+    """
+    if knowledge_task is None:
+        return "", "no_reference", None
+    
+    strategy = config.pipeline.knowledge_strategy
+    deadline = None if strategy == "wait" else config.pipeline.knowledge_deadline
+    done, _ = await asyncio.wait({knowledge_task}, timeout=deadline)
+    if done:
+        return knowledge_result(knowledge_task), "completed", None
+    
+    if strategy == "hedge":
+        logger.info(f"⏱️ Knowledge retrieval exceeded {deadline:.1f}s, starting generation without it (hedge)")
+        return "", "hedging", knowledge_task
+    
+    logger.info(f"⏱️ Knowledge retrieval exceeded {deadline:.1f}s, generating without it")
+    knowledge_task.cancel()
+    return "", "deadline_skipped", None
+
+def record_knowledge_step(reference_url: str, knowledge: str, mode: str, knowledge_start: datetime,
+                          trace: ExplanationManager):
+    """Record the knowledge retrieval step with the cached MCP health status"""
+    mcp_status = get_mcp_status_display() if reference_url else "未使用"
+    
+    used = is_usable_knowledge(knowledge)
+    trace.add_processing_step(
+        stage=ProcessingStage.KNOWLEDGE_RETRIEVAL,
+        title="外部知识Get",
+        description="从MCPserviceGet外部参考知识",
+        success=used,
+        details={
+            "参考link": reference_url or "无",
+            "MCPservicestatus": mcp_status,
+            "知识contentlength": len(knowledge) if knowledge else 0,
+            "Get策略": config.pipeline.knowledge_strategy,
+            "deadline": f"{config.pipeline.knowledge_deadline:.1f}s",
+            "result": KNOWLEDGE_MODE_LABELS.get(mode, mode)
+        },
+        duration=(datetime.now() - knowledge_start).total_seconds(),
+        quality_score=80 if used else 50,
+        evidence=f"Get的知识content: '{knowledge[:100]}...' (length: {len(knowledge) if knowledge else 0}字符)"
+    )
+
+def generate_enhanced_reference_info(url: str, source_type: str, error_msg: str = None) -> str:
+    """Generate增强的参考information，当MCPservicenotavailable时提供有用的上下文"""
+    from urllib.parse import urlparse
+    
+    parsed_url = urlparse(url)
+    domain = parsed_url.netloc
+    path = parsed_url.path
+    
+    # Infer content type based on URL structure - use proper domain parsing
+    from urllib.parse import urlparse
+    content_hints = []
+    
+    # Parse domain properly to avoid substring attacks
+    try:
+        parsed = urlparse(url if url.startswith(('http://', 'https://')) else f'https://{url}')
+        domain = parsed.netloc.lower()
+    except:
+        domain = ""
+    
+    # Detect common technical sites - check domain endings for security
+    if domain.endswith("github.com") or domain == "github.com":
+        content_hints.append("💻 Open source code repository")
+    elif domain.endswith("stackoverflow.com") or domain == "stackoverflow.com":
+        content_hints.append("❓ Technical Q&A")
+    elif domain.endswith("medium.com") or domain == "medium.com":
+        content_hints.append("📝 Technical blog")
+    elif domain.endswith("dev.to") or domain == "dev.to":
+        content_hints.append("👨‍💻 Developer community")
+    elif domain.endswith("csdn.net") or domain == "csdn.net":
+        content_hints.append("🇨🇳 CSDN technical blog")
+    elif domain.endswith("juejin.cn") or domain == "juejin.cn":
+        content_hints.append("💎 Juejin technical article")
+    elif domain.endswith("zhihu.com") or domain == "zhihu.com":
+        content_hints.append("🧠 Zhihu technical discussion")
+    elif "blog" in domain:
+        content_hints.append("📖 Technical blog")
+    elif "docs" in domain:
+        content_hints.append("📚 技术文档")
+    elif "wiki" in domain:
+        content_hints.append("📖 知识库")
+    else:
+        content_hints.append("🔗 参考资料")
+    
+    # 根据path推断content
+    if "/article/" in path or "/post/" in path:
+        content_hints.append("📄 文章content")
+    elif "/tutorial/" in path:
+        content_hints.append("📚 教程指南")
+    elif "/docs/" in path:
+        content_hints.append("📖 技术文档")
+    elif "/guide/" in path:
+        content_hints.append("📋 使用指南")
+    
+    hint_text = " | ".join(content_hints) if content_hints else "📄 网页content"
+    
+    reference_info = f"""
+## 🔗 {source_type}参考
+
+**📍 来源link：** [{domain}]({url})
+
+**🏷️ contenttype：** {hint_text}
+
+**🤖 AI增强分析：** 
+> 虽然MCPservice暂时notavailable，但AI将基于linkinformation和上下文进行Intelligent Analysis，
+> 并在Generate的Development Plan中融入该参考资料的相关性suggestions。
+
+**📋 参考价值：**
+- ✅ 提供技术选型参考
+- ✅ 补充实施细节
+- ✅ 增强方案可行性
+- ✅ 丰富最佳实践
+
+---
+"""
+    
+    if error_msg and not error_msg.startswith("❌"):
+        reference_info += f"\n**⚠️ servicestatus：** {error_msg}\n"
+    
+    return reference_info
+
+def validate_and_fix_content(content: str) -> str:
+    """Validate和FixGenerate的content，包括Mermaid语法、linkValidate等"""
+    if not content:
+        return content
+    
+    logger.info("🔍 startcontentValidate和Fix...")
+    
+    # 记录Fix项目
+    fixes_applied = []
+    
+    # 计算初始quality score
+    initial_quality_score = calculate_quality_score(content)
+    logger.info(f"📊 初始contentquality score: {initial_quality_score}/100")
+    
+    # 1. FixMermaid图table语法error
+    original_content = content
+    content = fix_mermaid_syntax(content)
+    if content != original_content:
+        fixes_applied.append("FixMermaid图table语法")
+    
+    # 2. Validate和清理虚假link
+    original_content = content
+    content = validate_and_clean_links(content)
+    if content != original_content:
+        fixes_applied.append("清理虚假link")
+    
+    # 3. Fix日期一致性
+    original_content = content
+    content = fix_date_consistency(content)
+    if content != original_content:
+        fixes_applied.append("Update过期日期")
+    
+    # 4. Fixformatproblem
+    original_content = content
+    content = fix_formatting_issues(content)
+    if content != original_content:
+        fixes_applied.append("Fixformatproblem")
+    
+    # 重新计算quality score
+    final_quality_score = calculate_quality_score(content)
+    
+    # 移除质量报告Show，只记录log
+    if final_quality_score > initial_quality_score + 5:
+        improvement = final_quality_score - initial_quality_score
+        logger.info(f"📈 contentQuality improvement: {initial_quality_score}/100 → {final_quality_score}/100 (improvement{improvement}分)")
+        if fixes_applied:
+            logger.info(f"🔧 ApplyFix: {', '.join(fixes_applied)}")
+    
+    logger.info(f"✅ contentValidate和Fixcompleted，最终quality score: {final_quality_score}/100")
+    if fixes_applied:
+        logger.info(f"🔧 Apply了以下Fix: {', '.join(fixes_applied)}")
+    
+    return content
+
+def calculate_quality_score(content: str) -> int:
+    """计算contentquality score（0-100）"""
+    if not content:
+        return 0
+    
+    score = 0
+    max_score = 100
+    
+    # 1. 基础contentcompleteness (30分)
+    if len(content) > 500:
+        score += 15
+    if len(content) > 2000:
+        score += 15
+    
+    # 2. 结构completeness (25分)
+    structure_checks = [
+        '# 🚀 AIGenerate的Development Plan',  # title
+        '## 🤖 AI编程助手tip词',   # AItip词部分
+        '```mermaid',              # Mermaid图table
+        '项目开发甘特图',           # 甘特图
+    ]
+    
+    for check in structure_checks:
+        if check in content:
+            score += 6
+    
+    # 3. 日期准确性 (20分)
+    import re
+    current_year = datetime.now().year
+    
+    # Check是否有currenty份或以后的日期
+    recent_dates = re.findall(r'202[5-9]-\d{2}-\d{2}', content)
+    if recent_dates:
+        score += 10
+    
+    # Check是否没有过期日期
+    old_dates = re.findall(r'202[0-3]-\d{2}-\d{2}', content)
+    if not old_dates:
+        score += 10
+    
+    # 4. link质量 (15分)
+    fake_link_patterns = [
+        r'blog\.csdn\.net/username',
+        r'github\.com/username', 
+        r'example\.com',
+        r'xxx\.com'
+    ]
+    
+    has_fake_links = any(re.search(pattern, content, re.IGNORECASE) for pattern in fake_link_patterns)
+    if not has_fake_links:
+        score += 15
+    
+    # 5. Mermaid语法质量 (10分)
+    mermaid_issues = [
+        r'## 🎯 [A-Z]',  # error的title在图table中
+        r'```mermaid\n## 🎯',  # formaterror
+    ]
+    
+    has_mermaid_issues = any(re.search(pattern, content, re.MULTILINE) for pattern in mermaid_issues)
+    if not has_mermaid_issues:
+        score += 10
+    
+    return min(score, max_score)
+
+def fix_mermaid_syntax(content: str) -> str:
+    """FixMermaid图table中的语法error并Optimize渲染"""
+    import re
+    
+    # Fix常见的Mermaid语法error
+    fixes = [
+        # 移除图table代码中的额外符号和标记
+        (r'## 🎯 ([A-Z]\s*-->)', r'\1'),
+        (r'## 🎯 (section [^)]+)', r'\1'),
+        (r'(\n|\r\n)## 🎯 ([A-Z]\s*-->)', r'\n    \2'),
+        (r'(\n|\r\n)## 🎯 (section [^\n]+)', r'\n    \2'),
+        
+        # Fix节点定义中的多余符号
+        (r'## 🎯 ([A-Z]\[[^\]]+\])', r'\1'),
+        
+        # 确保Mermaid代码块format正确
+        (r'```mermaid\n## 🎯', r'```mermaid'),
+        
+        # 移除title级别error
+        (r'\n##+ 🎯 ([A-Z])', r'\n    \1'),
+        
+        # Fix中文节点名称的problem - 彻底清理引号format
+        (r'([A-Z]+)\["([^"]+)"\]', r'\1["\2"]'),  # standardformat：A["文本"]
+        (r'([A-Z]+)\[""([^"]+)""\]', r'\1["\2"]'),  # 双引号error：A[""文本""]
+        (r'([A-Z]+)\["⚡"([^"]+)""\]', r'\1["\2"]'),  # 带emojierror
+        (r'([A-Z]+)\[([^\]]*[^\x00-\x7F][^\]]*)\]', r'\1["\2"]'),  # 中文无引号
+        
+        # 确保flowchart语法正确
+        (r'graph TB\n\s*graph', r'graph TB'),
+        (r'flowchart TD\n\s*flowchart', r'flowchart TD'),
+        
+        # Fix箭头语法
+        (r'-->', r' --> '),
+        (r'-->([A-Z])', r'--> \1'),
+        (r'([A-Z])-->', r'\1 -->'),
+    ]
+    
+    for pattern, replacement in fixes:
+        content = re.sub(pattern, replacement, content, flags=re.MULTILINE)
+    
+    # addMermaid渲染增强标记
+    content = enhance_mermaid_blocks(content)
+    
+    return content
+
+def enhance_mermaid_blocks(content: str) -> str:
+    """简化Mermaid代码块Process，避免渲染冲突"""
+    import re
+    
+    # 查找所有Mermaid代码块并直接返回，notadd额外包装器
+    # 因为包装器可能导致渲染problem
+    mermaid_pattern = r'```mermaid\n(.*?)\n```'
+    
+    def clean_mermaid_block(match):
+        mermaid_content = match.group(1)
+        # 直接返回清理过的Mermaid块
+        return f'```mermaid\n{mermaid_content}\n```'
+    
+    content = re.sub(mermaid_pattern, clean_mermaid_block, content, flags=re.DOTALL)
+    
+    return content
+
+def validate_and_clean_links(content: str) -> str:
+    """Validate和清理虚假link，增强link质量"""
+    import re
+    
+    # 检测并移除虚假linkmode
+    fake_link_patterns = [
+        # Markdownlinkformat
+        r'\[([^\]]+)\]\(https?://blog\.csdn\.net/username/article/details/\d+\)',
+        r'\[([^\]]+)\]\(https?://github\.com/username/[^\)]+\)',
+        r'\[([^\]]+)\]\(https?://[^/]*example\.com[^\)]*\)',
+        r'\[([^\]]+)\]\(https?://[^/]*xxx\.com[^\)]*\)',
+        r'\[([^\]]+)\]\(https?://[^/]*test\.com[^\)]*\)',
+        r'\[([^\]]+)\]\(https?://localhost[^\)]*\)',
+        
+        # 新增：更多虚假linkmode
+        r'\[([^\]]+)\]\(https?://medium\.com/@[^/]+/[^\)]*\d{9,}[^\)]*\)',  # Medium虚假文章
+        r'\[([^\]]+)\]\(https?://github\.com/[^/]+/[^/\)]*education[^\)]*\)',  # GitHub虚假教育项目
+        r'\[([^\]]+)\]\(https?://www\.kdnuggets\.com/\d{4}/\d{2}/[^\)]*\)',  # KDNuggets虚假文章
+        r'\[([^\]]+)\]\(https0://[^\)]+\)',  # error的协议
+        
+        # 纯URLformat
+        r'https?://blog\.csdn\.net/username/article/details/\d+',
+        r'https?://github\.com/username/[^\s\)]+',
+        r'https?://[^/]*example\.com[^\s\)]*',
+        r'https?://[^/]*xxx\.com[^\s\)]*',
+        r'https?://[^/]*test\.com[^\s\)]*',
+        r'https?://localhost[^\s\)]*',
+        r'https0://[^\s\)]+',  # error的协议
+        r'https?://medium\.com/@[^/]+/[^\s]*\d{9,}[^\s]*',
+        r'https?://github\.com/[^/]+/[^/\s]*education[^\s]*',
+        r'https?://www\.kdnuggets\.com/\d{4}/\d{2}/[^\s]*',
+    ]
+    
+    for pattern in fake_link_patterns:
+        # 将虚假link替换为普通文本description
+        def replace_fake_link(match):
+            if match.groups():
+                return f"**{match.group(1)}** (基于行业standard)"
+            else:
+                return "（基于行业最佳实践）"
+        
+        content = re.sub(pattern, replace_fake_link, content, flags=re.IGNORECASE)
+    
+    # Validate并增强真实link
+    content = enhance_real_links(content)
+    
+    return content
+
+def enhance_real_links(content: str) -> str:
+    """Validate并增强真实link的available性"""
+    import re
+    
+    # 查找所有markdownlink
+    link_pattern = r'\[([^\]]+)\]\(([^)]+)\)'
+    
+    def validate_link(match):
+        link_text = match.group(1)
+        link_url = match.group(2)
+        
+        # Check是否是有效的URLformat
+        if not validate_url(link_url):
+            return f"**{link_text}** (参考资源)"
+        
+        # Check是否是常见的技术文档网站
+        trusted_domains = [
+            'docs.python.org', 'nodejs.org', 'reactjs.org', 'vuejs.org',
+            'angular.io', 'flask.palletsprojects.com', 'fastapi.tiangolo.com',
+            'docker.com', 'kubernetes.io', 'github.com', 'gitlab.com',
+            'stackoverflow.com', 'developer.mozilla.org', 'w3schools.com',
+            'jwt.io', 'redis.io', 'mongodb.com', 'postgresql.org',
+            'mysql.com', 'nginx.org', 'apache.org'
+        ]
+        
+        # 如果是受信任的域名，保留link
+        for domain in trusted_domains:
+            if domain in link_url.lower():
+                return f"[{link_text}]({link_url})"
+        
+        # 对于其他link，Convert为安全的文本引用
+        return f"**{link_text}** (技术参考)"
+    
+    content = re.sub(link_pattern, validate_link, content)
+    
+    return content
+
+def fix_date_consistency(content: str) -> str:
+    """Fix日期一致性problem"""
+    import re
+    from datetime import datetime
+    
+    current_year = datetime.now().year
+    
+    # 替换2024y以前的日期为currenty份
+    old_year_patterns = [
+        r'202[0-3]-\d{2}-\d{2}',  # 2020-2023的日期
+        r'202[0-3]y',            # 2020-2023y
+    ]
+    
+    for pattern in old_year_patterns:
+        def replace_old_date(match):
+            old_date = match.group(0)
+            if '-' in old_date:
+                # 日期format：YYYY-MM-DD
+                parts = old_date.split('-')
+                return f"{current_year}-{parts[1]}-{parts[2]}"
+            else:
+                # y份format：YYYYy
+                return f"{current_year}y"
+        
+        content = re.sub(pattern, replace_old_date, content)
+    
+    return content
+
+def fix_formatting_issues(content: str) -> str:
+    """Fixformatproblem"""
+    import re
+    
+    # Fix常见的formatproblem
+    fixes = [
+        # Fix空的或formaterror的title
+        (r'#### 🚀 \*\*$', r'#### 🚀 **开发阶段**'),
+        (r'#### 🚀 第阶段：\*\*', r'#### 🚀 **第1阶段**：'),
+        (r'### 📋 (\d+)\. \*\*第\d+阶段', r'### 📋 \1. **第\1阶段'),
+        
+        # Fixtable格formatproblem
+        (r'\n## 🎯 \| ([^|]+) \| ([^|]+) \| ([^|]+) \|', r'\n| \1 | \2 | \3 |'),
+        (r'\n### 📋 (\d+)\. \*\*([^*]+)\*\*：', r'\n**\1. \2**：'),
+        (r'\n### 📋 (\d+)\. \*\*([^*]+)\*\*$', r'\n**\1. \2**'),
+        
+        # Fix多余的空行
+        (r'\n{4,}', r'\n\n\n'),
+        
+        # Fixnot完整的段落end
+        (r'##\n\n---', r'## 总结\n\n以上是完整的Development Plan和Technical Solution。\n\n---'),
+    ]
+    
+    for pattern, replacement in fixes:
+        content = re.sub(pattern, replacement, content, flags=re.MULTILINE)
+    
+    return content
+
+def build_generation_prompts(user_idea: str, retrieved_knowledge: str) -> AssembledPrompt:
+    """Build the system and user prompts for development plan generation within the token budget"""
+    # Getcurrent日期并计算项目start日期
+    current_date = datetime.now()
+    # 项目start日期：下w一start（给user准备time）
+    days_until_monday = (7 - current_date.weekday()) % 7
+    if days_until_monday == 0:  # 如果今d是w一，则下w一start
+        days_until_monday = 7
+    project_start_date = current_date + timedelta(days=days_until_monday)
+
+    # 静态说明在前、日期上下文在后，保证同一模板version下系统tip词前缀逐字节一致
+    system_prompt = GENERATION_SYSTEM.render(
+        today=current_date.strftime("%Yy%mm%d日"),
+        year=current_date.year,
+        project_start=project_start_date.strftime("%Y-%m-%d")
+    )
+
+    # Idea Description和外部知识由prompt_assembler按token预算填入
+    parts = {"idea": user_idea}
+    template = GENERATION_USER
+    # 如果successfulGet到外部知识，则注入到tip词中
+    if is_usable_knowledge(retrieved_knowledge):
+        parts["knowledge"] = retrieved_knowledge
+        template = GENERATION_USER_WITH_KNOWLEDGE
+
+    prompt = prompt_assembler.assemble(system_prompt, template.format_template, parts, GENERATION_MAX_TOKENS)
+    template.record_render(len(prompt.user_prompt))
+    return prompt
+
+# Traces of in-flight coalesced generations, so followers can show the leader's processing steps
+_flight_traces: Dict[str, ExplanationManager] = {}
+
+async def generate_development_plan_async(user_idea: str, reference_url: str = "",
+                                          trace: Optional[ExplanationManager] = None) -> AsyncIterator[Tuple[str, str, str]]:
+    """
+    Generate a development plan, coalescing concurrent requests with identical inputs.
+    
+    Duplicates (the same example clicked by several users, client retries) attach to the
+    in-flight generation keyed on the plan cache key and share its streaming progress.
+    Processing steps are recorded on `trace`; a coalesced duplicate's trace follows the
+    leader's steps. Failures raise GenerationError (shared by all coalesced callers).
+    """
+    trace = trace if trace is not None else ExplanationManager()
+    if not config.pipeline.coalesce_generations:
+        async for result in run_generation_pipeline(user_idea, reference_url, trace):
+            yield result
+        return
+    
+    cache_key = plan_cache.make_key(user_idea, reference_url, GENERATION_MODEL,
+                                    PROMPT_TEMPLATE_VERSION, GENERATION_TEMPERATURE)
+    
+    async def lead() -> AsyncIterator[Tuple[str, str, str]]:
+        _flight_traces[cache_key] = trace
+        try:
+            async for result in run_generation_pipeline(user_idea, reference_url, trace):
+                yield result
+        finally:
+            if _flight_traces.get(cache_key) is trace:
+                del _flight_traces[cache_key]
+    
+    followed = False
+    async for result in generation_flights.stream(cache_key, lead):
+        if not followed:
+            followed = True
+            leader_trace = _flight_traces.get(cache_key)
+            if leader_trace is not None and leader_trace is not trace:
+                trace.follow(leader_trace)
+        yield result
+
+async def run_generation_pipeline(user_idea: str, reference_url: str = "",
+                                  trace: Optional[ExplanationManager] = None) -> AsyncIterator[Tuple[str, str, str]]:
+    """
+    基于user创意Generate完整的产品Development Plan和对应的AI编程助手tip词（异步流水线）。
+    
+    EnterValidate、知识Get、AI APICall和后Process都在事件循环上完成，
+    waiting上游时not占用worker线程。
+    streammode下（config.ai_model.stream）会在token到达时持续yield部分markdown，
+    最后一次yield为完整result。
+    
+    Args:
+        user_idea (str): user的Product Idea Description
+        reference_url (str): 可选的参考link
+        trace (ExplanationManager): 本次request的Process链条追踪，未提供时新建
+        
+    Yields:
+        Tuple[str, str, str]: Development Plan、AI Coding Prompts、临时filepath
+    
+    Raises:
+        GenerationError: Enter无效、request被限流或Generatefailed，message为展示给user的说明
+    """
+    # startProcess链条追踪（每个request独立，并发request互not干扰）
+    trace = trace if trace is not None else ExplanationManager()
+    trace.start_processing()
+    start_time = datetime.now()
+    
+    # 步骤1: ValidateEnter
+    validation_start = datetime.now()
+    is_valid, error_msg = validate_input(user_idea)
+    validation_duration = (datetime.now() - validation_start).total_seconds()
+    
+    trace.add_processing_step(
+        stage=ProcessingStage.INPUT_VALIDATION,
+        title="EnterValidate",
+        description="ValidateuserEnter的Idea Description是否符合requirements",
+        success=is_valid,
+        details={
+            "Enterlength": len(user_idea.strip()) if user_idea else 0,
+            "包含参考link": bool(reference_url),
+            "Validateresult": "through" if is_valid else error_msg
+        },
+        duration=validation_duration,
+        quality_score=100 if is_valid else 0,
+        evidence=f"userEnter: '{user_idea[:50]}...' (length: {len(user_idea.strip()) if user_idea else 0}字符)"
+    )
+    
+    if not is_valid:
+        raise GenerationError(error_msg)
+    
+    # 方案缓存：相同Enter直接返回已Generate的方案
+    cache_key = plan_cache.make_key(user_idea, reference_url, GENERATION_MODEL,
+                                    PROMPT_TEMPLATE_VERSION, GENERATION_TEMPERATURE)
+    cache_start = datetime.now()
+    cached_plan = await asyncio.to_thread(plan_cache.get, cache_key)
+    
+    # 相似创意：只有空白、标点或少量用词不同的Enter复用或tip已有方案
+    similar_idea = None
+    if not cached_plan:
+        similar_idea = check_similar_idea(user_idea, reference_url)
+        if similar_idea and config.idea_similarity.mode == "serve":
+            cached_plan = await asyncio.to_thread(plan_cache.get, similar_idea.cache_key)
+            if not cached_plan:
+                idea_index.discard(similar_idea.cache_key)
+                similar_idea = None
+    
+    if cached_plan:
+        temp_file = cached_plan.file_path
+        if not temp_file or not os.path.exists(temp_file):
+            temp_file = await asyncio.to_thread(create_temp_markdown_file, cached_plan.plan_text) or None
+        cache_duration = (datetime.now() - cache_start).total_seconds()
+        
+        trace.add_processing_step(
+            stage=ProcessingStage.RESULT_VALIDATION,
+            title="命中方案缓存",
+            description="相同或相似Enter的Development Plan已Generate过，直接返回缓存result",
+            success=True,
+            details={
+                "缓存层级": cached_plan.source,
+                "匹配方式": f"相似创意 (相似度 {similar_idea.similarity:.1%})" if similar_idea else "完全匹配",
+                "缓存time": datetime.fromtimestamp(cached_plan.created_at).strftime("%Y-%m-%d %H:%M:%S"),
+                "contentlength": f"{len(cached_plan.plan_text)} 字符",
+                "查询耗时": f"{cache_duration * 1000:.1f}ms"
+            },
+            duration=cache_duration,
+            quality_score=90,
+            evidence=f"缓存key: {cached_plan.key[:16]}..."
+        )
+        logger.info(f"⚡ Plan cache hit ({cached_plan.source}) in {cache_duration * 1000:.1f}ms")
+        
+        plan_text = cached_plan.plan_text
+        if similar_idea:
+            plan_text = (
+                f"> 💡 已为相似创意Generate过方案：“{similar_idea.idea_preview}”"
+                f"（相似度 {similar_idea.similarity:.0%}），直接复用该方案。如需重新Generate，请调整Idea Description。\n\n"
+                + plan_text
+            )
+        yield plan_text, cached_plan.prompts, temp_file
+        return
+    
+    if similar_idea:
+        trace.add_processing_step(
+            stage=ProcessingStage.RESULT_VALIDATION,
+            title="发现相似方案",
+            description="已有相似创意的Development Plan，本次仍Generate新方案",
+            success=True,
+            details={
+                "相似创意": similar_idea.idea_preview,
+                "相似度": f"{similar_idea.similarity:.1%}",
+                "汉明距离": similar_idea.distance
+            },
+            quality_score=80,
+            evidence=f"相似方案缓存key: {similar_idea.cache_key[:16]}..."
+        )
+        yield f"💡 已有相似方案（“{similar_idea.idea_preview}”），正在为您Generate新方案...", "", None
+    
+    # 步骤2: API密钥Check
+    api_check_start = datetime.now()
+    if not model_router.has_configured_endpoint():
+        api_check_duration = (datetime.now() - api_check_start).total_seconds()
+        trace.add_processing_step(
+            stage=ProcessingStage.AI_GENERATION,
+            title="API密钥Check",
+            description="CheckAI模型API密钥configuration",
+            success=False,
+            details={"error": "API密钥未configuration"},
+            duration=api_check_duration,
+            quality_score=0,
+            evidence="系统环境变量中not foundSILICONFLOW_API_KEY"
+        )
+        
+        logger.error("API key not configured")
+        error_msg = """
+## ❌ configurationerror：未SetAPI密钥
+
+### 🔧 解决方法：
+
+1. **GetAPI密钥**：
+   - visit [Silicon Flow](https://siliconflow.cn) 
+   - 注册账户并GetAPI密钥
+
+2. **configuration环境变量**：
+   ```bash
+   export SILICONFLOW_API_KEY=your_api_key_here
+   ```
+
+3. **魔塔平台configuration**：
+   - 在创空间Set中add环境变量
+   - 变量名：`SILICONFLOW_API_KEY`
+   - 变量值：你的实际API密钥
+
+### 📋 configurationcompleted后重启Apply即可使用完整feature！
+
+---
+
+**💡 tip**：API密钥是必填项，没有它就unable toCallAIserviceGenerateDevelopment Plan。
+"""
+        raise GenerationError(error_msg)
+    
+    # 步骤3: Fetch external knowledge base content（与AIGenerate重叠执行，not让慢MCP拖住整条流水线）
+    knowledge_start = datetime.now()
+    knowledge_task = None
+    if reference_url and reference_url.strip():
+        knowledge_task = asyncio.create_task(fetch_external_knowledge_async(reference_url))
+    
+    completion = None
+    first_chunk = None
+    try:
+        retrieved_knowledge, knowledge_mode, pending_knowledge = await wait_for_knowledge(knowledge_task)
+        if knowledge_mode != "hedging":
+            record_knowledge_step(reference_url, retrieved_knowledge, knowledge_mode, knowledge_start, trace)
+        
+        logger.info("🚀 startCallAI APIGenerateDevelopment Plan...")
+        sectioned = config.pipeline.sectioned_generation
+        
+        while True:
+            prompt = build_generation_prompts(user_idea, retrieved_knowledge)
+            system_prompt, user_prompt = prompt.system_prompt, prompt.user_prompt
+            
+            # 步骤3: AIGenerate准备
+            ai_prep_start = datetime.now()
+            
+            # buildrequestdata
+            request_data = {
+                "model": GENERATION_MODEL,
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                "max_tokens": GENERATION_MAX_TOKENS,
+                "temperature": GENERATION_TEMPERATURE,
+                "stream": config.ai_model.stream
+            }
+            
+            ai_prep_duration = (datetime.now() - ai_prep_start).total_seconds()
+            
+            # 记录requestinformation（not包含完整tip词以避免logtoo long）
+            logger.info(f"📊 APIrequest模型: {request_data['model']}")
+            logger.info(f"📏 系统tip词length: {len(system_prompt)} 字符")
+            logger.info(f"📏 usertip词length: {len(user_prompt)} 字符")
+            
+            # 步骤4: AI APICall
+            api_call_start = datetime.now()
+            logger.info(f"🌐 CurrentlyCallAPI via model router: {', '.join(e['name'] for e in model_router.get_stats())}")
+            
+            stats = CompletionStats(stage="generation")
+            if sectioned:
+                completion = stream_sectioned_completion(request_data, stats=stats)
+            else:
+                completion = stream_completion_with_continuation(request_data, stats=stats)
+            first_chunk = asyncio.ensure_future(completion.__anext__())
+            
+            if pending_knowledge is None:
+                break
+            
+            # hedge：not带知识的Call已经发出，知识若在首token之前到达则改用带知识的Call
+            await asyncio.wait({first_chunk, pending_knowledge}, return_when=asyncio.FIRST_COMPLETED)
+            if first_chunk.done():
+                pending_knowledge.cancel()
+                pending_knowledge = None
+                knowledge_mode = "hedge_late"
+                record_knowledge_step(reference_url, "", knowledge_mode, knowledge_start, trace)
+                break
+            
+            late_knowledge = knowledge_result(pending_knowledge)
+            pending_knowledge = None
+            if not is_usable_knowledge(late_knowledge):
+                knowledge_mode = "hedge_unusable"
+                record_knowledge_step(reference_url, late_knowledge, knowledge_mode, knowledge_start, trace)
+                break
+            
+            first_chunk.cancel()
+            with contextlib.suppress(asyncio.CancelledError, StopAsyncIteration):
+                await first_chunk
+            await completion.aclose()
+            completion = None
+            retrieved_knowledge = late_knowledge
+            knowledge_mode = "hedge_won"
+            record_knowledge_step(reference_url, retrieved_knowledge, knowledge_mode, knowledge_start, trace)
+        
+        # 只记录最终发出的request（hedge改用带知识的Call时not重复记录）
+        trace.add_processing_step(
+            stage=ProcessingStage.AI_GENERATION,
+            title="AIrequest准备",
+            description="buildAI模型requestparameter和tip词",
+            success=True,
+            details={
+                "AI模型": request_data['model'],
+                "tip词模板": PROMPT_TEMPLATE_VERSION,
+                "系统tip词length": f"{len(system_prompt)} 字符（静态前缀 {len(GENERATION_SYSTEM.static_text)}）",
+                "usertip词length": f"{len(user_prompt)} 字符",
+                "最大Token数": request_data['max_tokens'],
+                "温度parameter": request_data['temperature'],
+                "streammode": "开启" if request_data['stream'] else "关闭",
+                "Generatemode": f"分段并行（{len(PLAN_SECTIONS)} 段）" if sectioned else "单次Call",
+                "外部知识": "已注入" if is_usable_knowledge(retrieved_knowledge) else "未注入",
+                "EnterToken估算": f"{prompt.input_tokens} / {prompt.budget}",
+                "各部分Token": prompt.part_tokens,
+                "预算压缩": prompt.trimmed or "无"
+            },
+            duration=ai_prep_duration,
+            quality_score=95,
+            evidence=f"准备Call {request_data['model']} 模型，tip词总length: {len(system_prompt + user_prompt)} 字符"
+        )
+        
+        content = ""
+        section_parts: Dict[str, str] = {}
+        try:
+            chunk = await first_chunk
+        except StopAsyncIteration:
+            chunk = None
+        while chunk is not None:
+            if not content and request_data['stream'] and stats.first_token_time is not None:
+                first_token_duration = stats.first_token_time
+                logger.info(f"⚡ 首Token到达耗时: {first_token_duration:.2f}s")
+                trace.add_processing_step(
+                    stage=ProcessingStage.AI_GENERATION,
+                    title="首Token响应",
+                    description="AI模型stream返回第一个token",
+                    success=True,
+                    details={
+                        "AI模型": request_data['model'],
+                        "首Token耗时": f"{first_token_duration:.2f}s"
+                    },
+                    duration=first_token_duration,
+                    quality_score=90 if first_token_duration < 10 else 70,
+                    evidence=f"{first_token_duration:.2f}s 后收到首个token，user开始看到Generatecontent"
+                )
+            if sectioned:
+                # 各段落并发到达，按固定顺序重新拼接
+                section_parts[chunk.section] = section_parts.get(chunk.section, "") + chunk.delta
+                content = merge_sections(section_parts)
+            else:
+                content += chunk.delta
+            if request_data['stream']:
+                yield content, "", None
+            try:
+                chunk = await completion.__anext__()
+            except StopAsyncIteration:
+                chunk = None
+        
+        api_call_duration = (datetime.now() - api_call_start).total_seconds()
+        logger.info(f"⏱️ APICall耗时: {api_call_duration:.2f}s")
+        logger.info(f"📈 API响应status码: {stats.status_code}")
+        
+        content_length = len(content) if content else 0
+        logger.info(f"📝 Generatecontentlength: {content_length} 字符")
+        logger.info(f"🧮 Token用量: Enter {stats.prompt_tokens} / output {stats.completion_tokens}"
+                    f"{'（估算）' if stats.usage_estimated else ''}，{stats.tokens_per_second:.1f} tokens/s，"
+                    f"估算成本 {stats.cost:.4f} {config.usage.currency}")
+        
+        trace.add_processing_step(
+            stage=ProcessingStage.AI_GENERATION,
+            title="AIcontentGenerate",
+            description="AI模型successfulGenerateDevelopment Plancontent",
+            success=bool(content),
+            details={
+                "响应status": f"HTTP {stats.status_code}",
+                "模型endpoint": f"{stats.endpoint} ({stats.model})",
+                "Generatecontentlength": f"{content_length} 字符",
+                "APICall耗时": f"{api_call_duration:.2f}s",
+                "排队waiting": f"{stats.queue_wait:.2f}s",
+                "平均Generate速度": f"{content_length / api_call_duration:.1f} 字符/s" if api_call_duration > 0 else "N/A",
+                "Token用量": f"Enter {stats.prompt_tokens} / output {stats.completion_tokens}" + ("（估算）" if stats.usage_estimated else ""),
+                "TokenGenerate速度": f"{stats.tokens_per_second:.1f} tokens/s",
+                "估算成本": f"{stats.cost:.4f} {config.usage.currency}",
+                "自动续写": f"{stats.continuations} 次",
+                "retry次数": f"{stats.retries} 次" + ("（含对冲request）" if stats.hedged else ""),
+                "结束原因": "达到token预算，content可能not完整" if stats.finish_reason == "length" else "正常结束",
+                **({"分段耗时": {key: f"{s.duration:.2f}s" for key, s in stats.sections.items()},
+                    "分段Token": {key: f"{s.prompt_tokens} / {s.completion_tokens}" for key, s in stats.sections.items()}}
+                   if sectioned else {})
+            },
+            duration=api_call_duration,
+            quality_score=90 if content_length > 1000 else 70,
+            evidence=f"successfulGenerate {content_length} 字符的Development Plancontent，包含Technical Solution和Coding Prompts"
+        )
+        
+        if content:
+            # 步骤5: content后Process
+            postprocess_start = datetime.now()
+            
+            # 后Process：确保content结构化
+            final_plan_text = format_response(content)
+            
+            # ApplycontentValidate和Fix
+            final_plan_text = validate_and_fix_content(final_plan_text)
+            final_plan_text = knowledge_dropped_notice(reference_url, knowledge_mode) + final_plan_text
+            
+            postprocess_duration = (datetime.now() - postprocess_start).total_seconds()
+            
+            trace.add_processing_step(
+                stage=ProcessingStage.CONTENT_FORMATTING,
+                title="content后Process",
+                description="format化和ValidateGenerate的content",
+                success=True,
+                details={
+                    "format化Process": "Markdown结构Optimize",
+                    "contentValidate": "Mermaid语法Fix, linkCheck",
+                    "最终contentlength": f"{len(final_plan_text)} 字符",
+                    "Process耗时": f"{postprocess_duration:.2f}s"
+                },
+                duration=postprocess_duration,
+                quality_score=85,
+                evidence=f"completedcontent后Process，最终output {len(final_plan_text)} 字符的Complete Development Plan"
+            )
+            
+            # Create临时file
+            temp_file = await asyncio.to_thread(create_temp_markdown_file, final_plan_text)
+            
+            # 如果临时fileCreatefailed，使用None避免Gradio权限error
+            if not temp_file:
+                temp_file = None
+            
+            prompts_section = extract_prompts_section(final_plan_text)
+            
+            # 参考link知识未能用上时not缓存，避免把降级result保存下来
+            if not reference_url or is_usable_knowledge(retrieved_knowledge):
+                context = similarity_context(reference_url)
+                await asyncio.to_thread(plan_cache.put, cache_key, final_plan_text, prompts_section, temp_file,
+                                        simhash(user_idea), context, idea_preview(user_idea))
+                idea_index.add(user_idea, context, cache_key)
+            
+            # 总Processtime
+            total_duration = (datetime.now() - start_time).total_seconds()
+            logger.info(f"🎉 Development PlanGeneratecompleted，Total time: {total_duration:.2f}s")
+            
+            yield final_plan_text, prompts_section, temp_file
+            return
+        else:
+            trace.add_processing_step(
+                stage=ProcessingStage.AI_GENERATION,
+                title="AIGeneratefailed",
+                description="AI模型返回空content",
+                success=False,
+                details={
+                    "响应status": f"HTTP {stats.status_code}",
+                    "error原因": "AI返回空content"
+                },
+                duration=api_call_duration,
+                quality_score=0,
+                evidence="AI APICallsuccessful但返回空的content"
+            )
+            
+            logger.error("API returned empty content")
+            raise GenerationError("❌ AI返回空content，请稍后重试")
+            
+    except LLMError as e:
+        # 记录详细的errorinformation
+        logger.error(f"API request failed with status {e.status_code}")
+        logger.error(f"API响应content: {e.body[:500]}")
+        api_call_duration = (datetime.now() - api_call_start).total_seconds()
+        if e.error_code or e.body.lstrip().startswith("{"):
+            trace.add_processing_step(
+                stage=ProcessingStage.AI_GENERATION,
+                title="AI APICallfailed",
+                description="AI模型APIrequestfailed",
+                success=False,
+                details={
+                    "HTTPstatus码": e.status_code,
+                    "error代码": e.error_code,
+                    "error消息": e.message
+                },
+                duration=api_call_duration,
+                quality_score=0,
+                evidence=f"API返回error: HTTP {e.status_code} - {e.message}"
+            )
+            raise GenerationError(f"❌ APIrequestfailed: HTTP {e.status_code} (error代码: {e.error_code}) - {e.message}") from e
+        else:
+            trace.add_processing_step(
+                stage=ProcessingStage.AI_GENERATION,
+                title="AI APICallfailed",
+                description="AI模型APIrequestfailed，unable toParseerrorinformation",
+                success=False,
+                details={
+                    "HTTPstatus码": e.status_code,
+                    "响应content": e.body[:200]
+                },
+                duration=api_call_duration,
+                quality_score=0,
+                evidence=f"APIrequestfailed，status码: {e.status_code}"
+            )
+            raise GenerationError(f"❌ APIrequestfailed: HTTP {e.status_code} - {e.body[:200]}") from e
+    except AdmissionRejected as e:
+        trace.add_processing_step(
+            stage=ProcessingStage.AI_GENERATION,
+            title="AIrequest被限流",
+            description="LLMadmission控制拒绝了本次request",
+            success=False,
+            details={
+                "拒绝原因": e.reason,
+                "admission指标": llm_admission.get_metrics()
+            },
+            quality_score=0,
+            evidence=e.message
+        )
+        logger.warning(f"🚦 LLM admission rejected: {e.reason}")
+        raise GenerationError(f"⏳ {e.message}") from e
+    except httpx.TimeoutException as e:
+        logger.error("API request timeout")
+        raise GenerationError("❌ APIrequesttimeout，请稍后重试") from e
+    except httpx.TransportError as e:
+        logger.error("API connection failed")
+        raise GenerationError("❌ 网络connectionfailed，请Check网络Set") from e
+    except GenerationError:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        raise GenerationError(f"❌ Processerror: {str(e)}") from e
+    finally:
+        # user离开（关闭页面、Gradio取消事件、REST断开）或出错时，not留下后台知识Get、
+        # MCP监听connection和半开的LLM stream；LLM的admission名额随stream关闭释放
+        if knowledge_task is not None and not knowledge_task.done():
+            knowledge_task.cancel()
+        if first_chunk is not None and not first_chunk.done():
+            first_chunk.cancel()
+            with contextlib.suppress(BaseException):
+                await first_chunk
+        if completion is not None:
+            await completion.aclose()
+
+def generate_development_plan(user_idea: str, reference_url: str = "") -> Iterator[Tuple[str, str, str]]:
+    """
+    generate_development_plan_async 的同步facade，供同步调用方使用。
+    
+    Yields:
+        Tuple[str, str, str]: Development Plan、AI Coding Prompts、临时filepath
+    """
+    yield from background_loop.iterate(generate_development_plan_async(user_idea, reference_url))
+
+def create_temp_markdown_file(content: str) -> str:
+    """Create临时markdownfile"""
+    try:
+        import tempfile
+        import os
+        
+        # Create临时file，使用更安全的方法
+        with tempfile.NamedTemporaryFile(
+            mode='w', 
+            suffix='.md', 
+            delete=False, 
+            encoding='utf-8'
+        ) as temp_file:
+            temp_file.write(content)
+            temp_file_path = temp_file.name
+        
+        # Validatefile是否Createsuccessful
+        if os.path.exists(temp_file_path):
+            logger.info(f"✅ successfulCreate临时file: {temp_file_path}")
+            return temp_file_path
+        else:
+            logger.warning("⚠️ 临时fileCreate后does not exist")
+            return ""
+            
+    except PermissionError as e:
+        logger.error(f"❌ 权限error，unable toCreate临时file: {e}")
+        return ""
+    except Exception as e:
+        logger.error(f"❌ Create临时filefailed: {e}")
+        return ""
+
+def fix_links_for_new_window(content: str) -> str:
+    """Fix所有link为新窗口Open，解决魔塔平台linkproblem"""
+    import re
+    
+    # 匹配所有markdownlinkformat [text](url)
+    def replace_markdown_link(match):
+        text = match.group(1)
+        url = match.group(2)
+        return f'<a href="{url}" target="_blank" rel="noopener noreferrer">{text}</a>'
+    
+    # 替换markdownlink
+    content = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', replace_markdown_link, content)
+    
+    # 匹配所有HTMLlink并addtarget="_blank"
+    def add_target_blank(match):
+        full_tag = match.group(0)
+        if 'target=' not in full_tag:
+            # 在>前addtarget="_blank"
+            return full_tag.replace('>', ' target="_blank" rel="noopener noreferrer">')
+        return full_tag
+    
+    # 替换HTMLlink
+    content = re.sub(r'<a [^>]*href=[^>]*>', add_target_blank, content)
+    
+    return content
+
+def format_response(content: str) -> str:
+    """format化AI回复，美化Show并保持原始AIGenerate的tip词"""
+    
+    # Fix所有link为新窗口Open
+    content = fix_links_for_new_window(content)
+    
+    # addtime戳和format化title
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    # 分割Development Plan和AI Coding Prompts
+    parts = content.split('# AI编程助手tip词')
+    
+    if len(parts) >= 2:
+        # 有明确的AI Coding Prompts部分
+        plan_content = parts[0].strip()
+        prompts_content = '# AI编程助手tip词' + parts[1]
+        
+        # 美化AI Coding Prompts部分
+        enhanced_prompts = enhance_prompts_display(prompts_content)
+        
+        formatted_content = f"""
+<div class="plan-header">
+
+# 🚀 AIGenerate的Development Plan
+
+<div class="meta-info">
+
+**⏰ Generation Time：** {timestamp}  
+**🤖 AI模型：** Qwen2.5-72B-Instruct  
+**💡 基于user创意Intelligent AnalysisGenerate**  
+**🔗 AgentApplyMCP Service Enhancement**
+
+</div>
+
+</div>
+
+---
+
+{enhance_markdown_structure(plan_content)}
+
+---
+
+{enhanced_prompts}
+"""
+    else:
+        # 没有明确分割，使用原始content
+        formatted_content = f"""
+<div class="plan-header">
+
+# 🚀 AIGenerate的Development Plan
+
+<div class="meta-info">
+
+**⏰ Generation Time：** {timestamp}  
+**🤖 AI模型：** Qwen2.5-72B-Instruct  
+**💡 基于user创意Intelligent AnalysisGenerate**  
+**🔗 AgentApplyMCP Service Enhancement**
+
+</div>
+
+</div>
+
+---
+
+{enhance_markdown_structure(content)}
+"""
+    
+    return formatted_content
+
+def enhance_prompts_display(prompts_content: str) -> str:
+    """简化AI Coding PromptsShow"""
+    lines = prompts_content.split('\n')
+    enhanced_lines = []
+    in_code_block = False
+    
+    for line in lines:
+        stripped = line.strip()
+        
+        # Processtitle
+        if stripped.startswith('# AI编程助手tip词'):
+            enhanced_lines.append('')
+            enhanced_lines.append('<div class="prompts-highlight">')
+            enhanced_lines.append('')
+            enhanced_lines.append('# 🤖 AI编程助手tip词')
+            enhanced_lines.append('')
+            enhanced_lines.append('> 💡 **使用说明**：以下tip词基于您的项目需求定制Generate，可直接Copy到 GitHub Copilot、ChatGPT、Claude 等AI编程工具中使用')
+            enhanced_lines.append('')
+            continue
+            
+        # Process二级title（featuremodule）
+        if stripped.startswith('## ') and not in_code_block:
+            title = stripped[3:].strip()
+            enhanced_lines.append('')
+            enhanced_lines.append(f'### 🎯 {title}')
+            enhanced_lines.append('')
+            continue
+            
+        # Process代码块start
+        if stripped.startswith('```') and not in_code_block:
+            in_code_block = True
+            enhanced_lines.append('')
+            enhanced_lines.append('```')
+            continue
+            
+        # Process代码块end
+        if stripped.startswith('```') and in_code_block:
+            in_code_block = False
+            enhanced_lines.append('```')
+            enhanced_lines.append('')
+            continue
+            
+        # 其他content直接add
+        enhanced_lines.append(line)
+    
+    # end高亮区域
+    enhanced_lines.append('')
+    enhanced_lines.append('</div>')
+    
+    return '\n'.join(enhanced_lines)
+
+def extract_prompts_section(content: str) -> str:
+    """从完整content中提取AI Coding Prompts部分"""
+    # 分割content，查找AI Coding Prompts部分
+    parts = content.split('# AI编程助手tip词')
+    
+    if len(parts) >= 2:
+        prompts_content = '# AI编程助手tip词' + parts[1]
+        # 清理和format化tip词content，移除HTML标签以便Copy
+        clean_prompts = clean_prompts_for_copy(prompts_content)
+        return clean_prompts
+    else:
+        # 如果没有找到明确的tip词部分，attempt其他关键词
+        lines = content.split('\n')
+        prompts_section = []
+        in_prompts_section = False
+        
+        for line in lines:
+            if any(keyword in line for keyword in ['Coding Prompts', '编程助手', 'Prompt', 'AI助手']):
+                in_prompts_section = True
+            if in_prompts_section:
+                prompts_section.append(line)
+        
+        return '\n'.join(prompts_section) if prompts_section else "not foundCoding Prompts部分"
+
+def clean_prompts_for_copy(prompts_content: str) -> str:
+    """清理tip词content，移除HTML标签，OptimizeCopyexperience"""
+    import re
+    
+    # 移除HTML标签
+    clean_content = re.sub(r'<[^>]+>', '', prompts_content)
+    
+    # 清理多余的空行
+    lines = clean_content.split('\n')
+    cleaned_lines = []
+    
+    for line in lines:
+        stripped = line.strip()
+        if stripped:
+            cleaned_lines.append(line)
+        elif cleaned_lines and cleaned_lines[-1].strip():  # 避免连续空行
+            cleaned_lines.append('')
+    
+    return '\n'.join(cleaned_lines)
+
+# Delete多余的旧代码，这里应该是enhance_markdown_structure函数
+def enhance_markdown_structure(content: str) -> str:
+    """增强Markdown结构，add视觉亮点和层级"""
+    lines = content.split('\n')
+    enhanced_lines = []
+    
+    for line in lines:
+        stripped = line.strip()
+        
+        # 增强一级title
+        if stripped and not stripped.startswith('#') and len(stripped) < 50 and '：' not in stripped and '.' not in stripped[:5]:
+            if any(keyword in stripped for keyword in ['产品概述', 'Technical Solution', 'Development Plan', '部署方案', '推广策略', 'AI', '编程助手', 'tip词']):
+                enhanced_lines.append(f"\n## 🎯 {stripped}\n")
+                continue
+        
+        # 增强二级title
+        if stripped and '.' in stripped[:5] and len(stripped) < 100:
+            if stripped[0].isdigit():
+                enhanced_lines.append(f"\n### 📋 {stripped}\n")
+                continue
+                
+        # 增强feature列table
+        if stripped.startswith('主tofeature') or stripped.startswith('目标user'):
+            enhanced_lines.append(f"\n#### 🔹 {stripped}\n")
+            continue
+            
+        # 增强技术栈部分
+        if stripped in ['前端', '后端', 'AI 模型', '工具和库']:
+            enhanced_lines.append(f"\n#### 🛠️ {stripped}\n")
+            continue
+            
+        # 增强阶段title
+        if '阶段' in stripped and '：' in stripped:
+            if '第' in stripped and '阶段' in stripped:
+                try:
+                    # 更健壮的阶段号提取逻辑
+                    parts = stripped.split('第')
+                    if len(parts) > 1:
+                        phase_part = parts[1].split('阶段')[0].strip()
+                        phase_name = stripped.split('：')[1].strip() if '：' in stripped else ''
+                        enhanced_lines.append(f"\n#### 🚀 第{phase_part}阶段：{phase_name}\n")
+                    else:
+                        enhanced_lines.append(f"\n#### 🚀 {stripped}\n")
+                except:
+                    enhanced_lines.append(f"\n#### 🚀 {stripped}\n")
+            else:
+                enhanced_lines.append(f"\n#### 🚀 {stripped}\n")
+            continue
+            
+        # 增强任务列table
+        if stripped.startswith('任务：'):
+            enhanced_lines.append(f"\n**📝 {stripped}**\n")
+            continue
+            
+        # 保持原有缩进的其他content
+        enhanced_lines.append(line)
+    
+    return '\n'.join(enhanced_lines)
@@ -0,0 +1,183 @@
+"""
+共享HTTP传输层
+所有上游Call（AI模型、MCPservice、link预检）复用同一个按host划分的connection池，
+保持keep-alive，避免每次request都重新进行TCP/TLS握手。
+同步Call使用requests.Session，异步Call使用按事件循环缓存的httpx.AsyncClient
+"""
+
+import asyncio
+import threading
+import logging
+import weakref
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import config, HTTPTransportConfig
+
+logger = logging.getLogger(__name__)
+# httpx默认按INFO记录每个request，高并发下会刷屏
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+class HTTPTransport:
+    """带connection池和retry adapter的共享HTTP客户端"""
+
+    def __init__(self, transport_config: HTTPTransportConfig):
+        self.config = transport_config
+        self.session = requests.Session()
+        self.adapter = self._build_adapter()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+        self._lock = threading.Lock()
+        self._host_stats: Dict[str, Dict[str, int]] = {}
+        # httpx.AsyncClient绑定事件循环，每个循环一个实例
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+        logger.info(
+            f"🔌 HTTPTransport 初始化completed: pool_connections={transport_config.pool_connections}, "
+            f"pool_maxsize={transport_config.pool_maxsize}, max_retries={transport_config.max_retries}"
+        )
+
+    def _build_adapter(self) -> HTTPAdapter:
+        """buildconnection池adapter，只对幂等request自动retry"""
+        retry = Retry(
+            total=self.config.max_retries,
+            connect=self.config.max_retries,
+            read=self.config.max_retries,
+            backoff_factor=self.config.backoff_factor,
+            status_forcelist=self.config.retry_statuses,
+            allowed_methods=frozenset(["HEAD", "GET", "OPTIONS"]),
+            raise_on_status=False
+        )
+        return HTTPAdapter(
+            pool_connections=self.config.pool_connections,
+            pool_maxsize=self.config.pool_maxsize,
+            pool_block=self.config.pool_block,
+            max_retries=retry
+        )
+
+    def _begin(self, url: str) -> Dict[str, int]:
+        host = urlparse(url).netloc
+        with self._lock:
+            stats = self._host_stats.setdefault(host, {
+                "requests": 0,
+                "errors": 0,
+                "in_flight": 0,
+                "max_in_flight": 0
+            })
+            stats["requests"] += 1
+            stats["in_flight"] += 1
+            stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        return stats
+
+    def _end(self, stats: Dict[str, int], error: bool = False):
+        with self._lock:
+            stats["in_flight"] -= 1
+            if error:
+                stats["errors"] += 1
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """throughconnection池发送request，并记录按host的使用statistics"""
+        stats = self._begin(url)
+        error = False
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            error = True
+            raise
+        finally:
+            # streamresponse在header到达后即视为完成，body读取期间connection仍由池管理
+            self._end(stats, error)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request("HEAD", url, **kwargs)
+
+    def get_async_client(self) -> httpx.AsyncClient:
+        """Getcurrent事件循环的共享httpx.AsyncClient"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.config.pool_connections * self.config.pool_maxsize,
+                    max_keepalive_connections=self.config.pool_maxsize
+                ),
+                transport=httpx.AsyncHTTPTransport(retries=self.config.max_retries),
+                follow_redirects=False
+            )
+            self._async_clients[loop] = client
+        return client
+
+    async def async_request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """异步发送request（body已完整读取）"""
+        stats = self._begin(url)
+        error = False
+        try:
+            return await self.get_async_client().request(method, url, **kwargs)
+        except httpx.HTTPError:
+            error = True
+            raise
+        finally:
+            self._end(stats, error)
+
+    @asynccontextmanager
+    async def async_stream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """异步streamrequest，离开上下文时关闭response并归还connection"""
+        stats = self._begin(url)
+        error = False
+        try:
+            async with self.get_async_client().stream(method, url, **kwargs) as response:
+                yield response
+        except httpx.HTTPError:
+            error = True
+            raise
+        finally:
+            self._end(stats, error)
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Getconnection池使用statistics（按host）"""
+        pools = {}
+        pool_manager = self.adapter.poolmanager
+        for key in pool_manager.pools.keys():
+            pool = pool_manager.pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.host}:{pool.port}" if pool.port else pool.host
+            pools[host] = {
+                "scheme": pool.scheme,
+                "connections_created": pool.num_connections,
+                "requests_served": pool.num_requests,
+                # 池队列预填充None占位，只统计真实的keep-aliveconnection
+                "idle_connections": sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0,
+                "maxsize": self.config.pool_maxsize
+            }
+
+        with self._lock:
+            hosts = {host: dict(stats) for host, stats in self._host_stats.items()}
+
+        return {
+            "pool_connections": self.config.pool_connections,
+            "pool_maxsize": self.config.pool_maxsize,
+            "hosts": hosts,
+            "pools": pools,
+            "async_clients": sum(1 for client in list(self._async_clients.values()) if not client.is_closed)
+        }
+
+    def close(self):
+        """关闭所有connection"""
+        self.session.close()
+
+# 全局共享传输实例
+http_transport = HTTPTransport(config.http)
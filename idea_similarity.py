@@ -0,0 +1,169 @@
+"""
+相似创意index
+对userEnter的Idea Description计算64位SimHash指纹，按band分桶建立index，
+只有空白、标点或少量用词不同的Enter可以快速找到已Generate过的方案。
+index只在内存中，指纹随方案一起存入方案缓存，重启时由load()恢复
+"""
+
+import re
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config import config, IdeaSimilarityConfig
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_BITS = 64
+
+# 统一去掉中英文标点和空白，只保留文字本身
+_PUNCT_RE = re.compile(r"[\s\W_]+", re.UNICODE)
+_WORD_RE = re.compile(r"[㐀-鿿]|[^\W_㐀-鿿]+", re.UNICODE)
+
+@dataclass
+class SimilarIdea:
+    """相似创意匹配result"""
+    cache_key: str
+    idea_preview: str
+    distance: int
+    similarity: float
+
+def _features(user_idea: str) -> List[str]:
+    """提取SimHash特征：英文按单词、中文按单字，再加相邻bigram"""
+    text = (user_idea or "").lower()
+    tokens = _WORD_RE.findall(_PUNCT_RE.sub(" ", text))
+    if not tokens:
+        return []
+    bigrams = [tokens[i] + " " + tokens[i + 1] for i in range(len(tokens) - 1)]
+    return tokens + bigrams
+
+def _hash64(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+def idea_preview(user_idea: str) -> str:
+    """匹配tip中展示的创意摘要"""
+    return (user_idea or "").strip()[:80]
+
+def simhash(user_idea: str) -> int:
+    """计算64位SimHash指纹"""
+    weights = [0] * FINGERPRINT_BITS
+    for feature in _features(user_idea):
+        h = _hash64(feature)
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+class IdeaSimilarityIndex:
+    """SimHash band index
+
+    汉明距离 <= k 的两个指纹切成 k+1 段后至少有一段完全相同（鸽巢原理），
+    因此查询只需检查同桶候选，百万级条目也只需比较少量指纹。
+    """
+
+    def __init__(self, similarity_config: IdeaSimilarityConfig):
+        self.config = similarity_config
+        self.max_distance = similarity_config.max_distance
+        self.bands = self.max_distance + 1
+        self.band_bits = FINGERPRINT_BITS // self.bands
+        self._band_mask = (1 << self.band_bits) - 1
+
+        self._lock = threading.Lock()
+        # entry_id -> (fingerprint, context, cache_key, idea_preview)
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._buckets: List[Dict[int, Set[int]]] = [dict() for _ in range(self.bands)]
+        self._by_key: Dict[str, int] = {}
+        self._next_id = 0
+
+    def _band_values(self, fingerprint: int) -> List[int]:
+        return [(fingerprint >> (band * self.band_bits)) & self._band_mask for band in range(self.bands)]
+
+    def add(self, user_idea: str, context: str, cache_key: str):
+        """把已Generate方案的创意加入index"""
+        self.add_fingerprint(simhash(user_idea), context, cache_key, idea_preview(user_idea))
+
+    def add_fingerprint(self, fingerprint: int, context: str, cache_key: str, preview: str):
+        """按已计算的指纹加入index"""
+        if not self.config.enabled:
+            return
+        with self._lock:
+            if cache_key in self._by_key:
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (fingerprint, context, cache_key, preview)
+            self._by_key[cache_key] = entry_id
+            for band, value in enumerate(self._band_values(fingerprint)):
+                self._buckets[band].setdefault(value, set()).add(entry_id)
+
+            while len(self._entries) > self.config.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def load(self, entries: Iterable[Tuple[str, int, str, str]]) -> int:
+        """从持久化的(cache_key, fingerprint, context, preview)恢复index，按最久未visit到最近的顺序传入"""
+        if not self.config.enabled:
+            return 0
+        before = len(self)
+        for cache_key, fingerprint, context, preview in entries:
+            self.add_fingerprint(fingerprint, context, cache_key, preview)
+        restored = len(self) - before
+        if restored:
+            logger.info(f"🔁 相似创意index已从方案缓存恢复 {restored} 条")
+        return restored
+
+    def _remove(self, entry_id: int):
+        """删除条目（调用方持有self._lock）"""
+        fingerprint, _, cache_key, _ = self._entries.pop(entry_id)
+        self._by_key.pop(cache_key, None)
+        for band, value in enumerate(self._band_values(fingerprint)):
+            bucket = self._buckets[band].get(value)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[band][value]
+
+    def find_similar(self, user_idea: str, context: str) -> Optional[SimilarIdea]:
+        """查找同一上下文（参考link、模型等）下最相似的已Generate创意"""
+        if not self.config.enabled:
+            return None
+        fingerprint = simhash(user_idea)
+        best = None
+        with self._lock:
+            seen: Set[int] = set()
+            for band, value in enumerate(self._band_values(fingerprint)):
+                for entry_id in self._buckets[band].get(value, ()):
+                    if entry_id in seen:
+                        continue
+                    seen.add(entry_id)
+                    other, entry_context, cache_key, preview = self._entries[entry_id]
+                    if entry_context != context:
+                        continue
+                    distance = (fingerprint ^ other).bit_count()
+                    if distance <= self.max_distance and (best is None or distance < best.distance):
+                        best = SimilarIdea(
+                            cache_key=cache_key,
+                            idea_preview=preview,
+                            distance=distance,
+                            similarity=round(1 - distance / FINGERPRINT_BITS, 3)
+                        )
+        return best
+
+    def discard(self, cache_key: str):
+        """缓存条目失效时同步移除"""
+        with self._lock:
+            entry_id = self._by_key.get(cache_key)
+            if entry_id is not None:
+                self._remove(entry_id)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# 全局相似创意index
+idea_index = IdeaSimilarityIndex(config.idea_similarity)
@@ -0,0 +1,395 @@
+"""
+后台Generate任务队列
+提交后立即返回任务ID，由工作线程从SQLite持久化队列中取任务执行Generate流水线；
+客户端轮询或订阅进度，completed后GetDevelopment Plan、Coding Prompts和file。
+运行中的任务记录所属进程并定期心跳，多个进程共用同一个数据库时互不抢占；
+所属进程退出（心跳超过租约）后，未completed的任务会重新入队
+"""
+
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import threading
+import concurrent.futures
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import config, JobQueueConfig
+from async_runtime import background_loop
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TERMINAL_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+# 与generate_development_plan_async相同的签名：(创意, 参考link) -> (方案, tip词, file)的异步生成器，
+# failed时抛出异常（str(e)作为任务的error说明）
+JobRunner = Callable[[str, str], AsyncIterator[Tuple[str, str, Optional[str]]]]
+
+_COLUMNS = ("job_id, status, user_idea, reference_url, plan_text, prompts, file_path, error, "
+            "attempts, created_at, started_at, finished_at, updated_at")
+
+@dataclass
+class Job:
+    """一个Generate任务的status快照；运行中plan_text为已Generate的部分content"""
+    job_id: str
+    status: str
+    user_idea: str
+    reference_url: str
+    plan_text: str = ""
+    prompts: str = ""
+    file_path: Optional[str] = None
+    error: str = ""
+    attempts: int = 0
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    updated_at: float = 0.0
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def to_dict(self, include_content: bool = True) -> Dict[str, Any]:
+        """APIoutput；include_content=False时只返回status和进度"""
+        data = asdict(self)
+        data["progress_chars"] = len(self.plan_text)
+        if not include_content:
+            for key in ("plan_text", "prompts", "file_path"):
+                data.pop(key)
+        return data
+
+class JobQueue:
+    """SQLite持久化的任务队列 + 工作线程池"""
+
+    def __init__(self, queue_config: JobQueueConfig):
+        self.config = queue_config
+        self._db_lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self._heartbeat: Optional[threading.Thread] = None
+        self._runner: Optional[JobRunner] = None
+        self._stopping = False
+        self._stop_event = threading.Event()
+        self._db_ready = False
+        # 本进程运行中的任务：job_id -> 后台事件循环中的asyncio任务
+        self._running: Dict[str, asyncio.Task] = {}
+        self._running_lock = threading.Lock()
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        if self.config.enabled:
+            self._init_db()
+
+    @contextmanager
+    def _db(self) -> Iterator[sqlite3.Connection]:
+        """串行化的SQLiteconnection，退出时提交并关闭"""
+        with self._db_lock:
+            conn = sqlite3.connect(self.config.db_path, timeout=10)
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+
+    def _init_db(self):
+        try:
+            os.makedirs(os.path.dirname(self.config.db_path), exist_ok=True)
+            with self._db() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        job_id TEXT PRIMARY KEY,
+                        status TEXT NOT NULL,
+                        user_idea TEXT NOT NULL,
+                        reference_url TEXT NOT NULL,
+                        plan_text TEXT NOT NULL DEFAULT '',
+                        prompts TEXT NOT NULL DEFAULT '',
+                        file_path TEXT,
+                        error TEXT NOT NULL DEFAULT '',
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        created_at REAL NOT NULL,
+                        started_at REAL,
+                        finished_at REAL,
+                        updated_at REAL NOT NULL,
+                        owner TEXT,
+                        heartbeat_at REAL,
+                        cancel_requested INTEGER NOT NULL DEFAULT 0
+                    )
+                """)
+                # 旧version创建的表补上所属进程、心跳和取消标记
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+                for name, ddl in (("owner", "TEXT"), ("heartbeat_at", "REAL"),
+                                  ("cancel_requested", "INTEGER NOT NULL DEFAULT 0")):
+                    if name not in columns:
+                        conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {ddl}")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+            self._db_ready = True
+            logger.info(f"🗂️ 后台任务队列已启用: {self.config.db_path}")
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 后台任务队列初始化failed，任务modenot可用: {e}")
+
+    @property
+    def available(self) -> bool:
+        return self.config.enabled and self._db_ready
+
+    def start(self, runner: JobRunner):
+        """Set任务执行函数并启动工作线程和心跳线程；所属进程已退出的运行中任务重新入队"""
+        if not self.available or self._workers:
+            return
+        self._runner = runner
+        self._stopping = False
+        self._stop_event.clear()
+        self._recover()
+        for index in range(max(1, self.config.workers)):
+            worker = threading.Thread(target=self._work, name=f"vibedoc-job-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="vibedoc-job-heartbeat", daemon=True)
+        self._heartbeat.start()
+        logger.info(f"👷 后台任务工作线程已启动: {len(self._workers)} 个（{self.owner_id}）")
+
+    def stop(self, timeout: float = 5.0):
+        """通知工作线程退出；进行中的任务立即停止并重新入队"""
+        self._stopping = True
+        self._stop_event.set()
+        with self._running_lock:
+            running = list(self._running)
+        for job_id in running:
+            self._cancel_local(job_id)
+        self._notify()
+        for thread in [*self._workers, self._heartbeat]:
+            if thread is not None:
+                thread.join(timeout)
+        self._workers, self._heartbeat = [], None
+
+    def _recover(self):
+        """心跳超过租约的运行中任务（所属进程已退出）重新入队；存活进程的任务不受影响"""
+        now = time.time()
+        expired = "status = ? AND COALESCE(heartbeat_at, updated_at) < ?"
+        with self._db() as conn:
+            cancelled = conn.execute(
+                f"UPDATE jobs SET status = ?, finished_at = ?, updated_at = ? WHERE {expired} AND cancel_requested = 1",
+                (CANCELLED, now, now, RUNNING, now - self.config.lease_seconds)
+            ).rowcount
+            requeued = conn.execute(
+                f"UPDATE jobs SET status = ?, owner = NULL, updated_at = ? WHERE {expired} AND attempts < ?",
+                (QUEUED, now, RUNNING, now - self.config.lease_seconds, self.config.max_attempts)
+            ).rowcount
+            abandoned = conn.execute(
+                f"UPDATE jobs SET status = ?, error = ?, finished_at = ?, updated_at = ? WHERE {expired}",
+                (FAILED, "任务多次中断，已放弃", now, now, RUNNING, now - self.config.lease_seconds)
+            ).rowcount
+        if requeued or abandoned or cancelled:
+            logger.info(f"♻️ 恢复中断的任务: 重新入队 {requeued} 个，放弃 {abandoned} 个，取消 {cancelled} 个")
+            self._notify()
+
+    def _heartbeat_loop(self):
+        """定期续约本进程运行中的任务，停止已被取消或已被其他进程接管的任务，并回收过期任务"""
+        interval = max(1.0, self.config.lease_seconds / 3)
+        while not self._stop_event.wait(interval):
+            try:
+                self._heartbeat_once()
+                self._recover()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ 任务心跳failed: {e}")
+
+    def _heartbeat_once(self):
+        with self._running_lock:
+            running = list(self._running)
+        if not running:
+            return
+        placeholders = ", ".join("?" * len(running))
+        with self._db() as conn:
+            conn.execute(
+                f"UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = ? AND job_id IN ({placeholders})",
+                (time.time(), self.owner_id, RUNNING, *running)
+            )
+            stale = [row[0] for row in conn.execute(
+                f"SELECT job_id FROM jobs WHERE job_id IN ({placeholders}) "
+                "AND (owner IS NOT ? OR status != ? OR cancel_requested = 1)",
+                (*running, self.owner_id, RUNNING)
+            )]
+        for job_id in stale:
+            self._cancel_local(job_id)
+
+    def _cancel_local(self, job_id: str):
+        """取消本进程中运行的任务（直接取消其asyncio任务，不必等下一个进度点）"""
+        with self._running_lock:
+            task = self._running.get(job_id)
+        if task is not None:
+            background_loop.loop.call_soon_threadsafe(task.cancel)
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def submit(self, user_idea: str, reference_url: str = "") -> Job:
+        """提交Generate任务，立即返回"""
+        if not self.available:
+            raise RuntimeError("后台任务队列未启用")
+        now = time.time()
+        job = Job(job_id=uuid.uuid4().hex, status=QUEUED, user_idea=user_idea or "",
+                  reference_url=reference_url or "", created_at=now, updated_at=now)
+        with self._db() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, user_idea, reference_url, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job.job_id, job.status, job.user_idea, job.reference_url, now, now)
+            )
+            self._purge(conn)
+        logger.info(f"📥 Generate任务已提交: {job.job_id}")
+        self._notify()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        if not self.available:
+            return None
+        with self._db() as conn:
+            row = conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return Job(*row) if row else None
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """取消任务：排队中的直接取消；运行中的在本进程立即停止，在其他进程中于下一次心跳时停止"""
+        now = time.time()
+        with self._db() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                (CANCELLED, now, now, job_id, QUEUED)
+            )
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE job_id = ? AND status = ?",
+                (now, job_id, RUNNING)
+            )
+        self._cancel_local(job_id)
+        self._notify()
+        return self.get(job_id)
+
+    def watch(self, job_id: str, poll_interval: float = 1.0,
+              timeout: Optional[float] = None) -> Iterator[Job]:
+        """订阅任务进度：status或content变化时yield快照，任务结束后停止"""
+        deadline = time.monotonic() + timeout if timeout else None
+        last_update = None
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                return
+            if job.updated_at != last_update:
+                last_update = job.updated_at
+                yield job
+            if job.done or (deadline and time.monotonic() >= deadline):
+                return
+            with self._changed:
+                self._changed.wait(poll_interval)
+
+    def _claim(self) -> Optional[Job]:
+        """取出最早排队的任务并标记为本进程运行中；在SELECT和UPDATE之间被取消或被其他进程
+        取走的任务跳过"""
+        while True:
+            now = time.time()
+            with self._db() as conn:
+                row = conn.execute(
+                    f"SELECT {_COLUMNS} FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if not row:
+                    return None
+                job = Job(*row)
+                claimed = conn.execute(
+                    "UPDATE jobs SET status = ?, owner = ?, heartbeat_at = ?, cancel_requested = 0, "
+                    "attempts = attempts + 1, started_at = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                    (RUNNING, self.owner_id, now, now, now, job.job_id, QUEUED)
+                ).rowcount
+            if claimed:
+                job.status, job.attempts, job.started_at = RUNNING, job.attempts + 1, now
+                return job
+
+    def _update(self, job_id: str, **fields: Any) -> bool:
+        """更新本进程持有的运行中任务；租约过期被其他进程接管后不再写入，返回是否更新"""
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._db() as conn:
+            updated = conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE job_id = ? AND owner = ? AND status = ?",
+                (*fields.values(), job_id, self.owner_id, RUNNING)
+            ).rowcount
+        self._notify()
+        return bool(updated)
+
+    def _work(self):
+        while not self._stopping:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ 读取任务队列failed: {e}")
+                job = None
+            if job is None:
+                with self._changed:
+                    self._changed.wait(1.0)
+                continue
+            self._run(job)
+
+    def _run(self, job: Job):
+        logger.info(f"🏃 start执行Generate任务: {job.job_id}（第 {job.attempts} 次）")
+        try:
+            plan_text, prompts, file_path = background_loop.submit(self._execute(job)).result()
+        except concurrent.futures.CancelledError:
+            # 只有流水线确实被中断时才走到这里；已completed的任务即使随后收到取消也按completed记录
+            if self._stopping:
+                self._update(job.job_id, status=QUEUED, owner=None, attempts=job.attempts - 1)
+            elif self._update(job.job_id, status=CANCELLED, finished_at=time.time()):
+                logger.info(f"🛑 Generate任务已取消: {job.job_id}")
+            return
+        except Exception as e:
+            logger.warning(f"⚠️ Generate任务failed: {job.job_id}: {e}")
+            self._update(job.job_id, status=FAILED, error=str(e) or type(e).__name__, finished_at=time.time())
+            return
+
+        if self._update(job.job_id, status=SUCCEEDED, plan_text=plan_text, prompts=prompts,
+                        file_path=file_path, finished_at=time.time()):
+            logger.info(f"✅ Generate任务completed: {job.job_id}")
+
+    async def _execute(self, job: Job) -> Tuple[str, str, Optional[str]]:
+        """在后台事件循环中运行流水线并定期写入进度；cancel()直接取消本任务"""
+        with self._running_lock:
+            self._running[job.job_id] = asyncio.current_task()
+        result: Tuple[str, str, Optional[str]] = ("", "", None)
+        last_flush = 0.0
+        results = self._runner(job.user_idea, job.reference_url)
+        try:
+            async for result in results:
+                if time.monotonic() - last_flush >= self.config.progress_interval:
+                    last_flush = time.monotonic()
+                    await asyncio.to_thread(self._update, job.job_id, plan_text=result[0], heartbeat_at=time.time())
+            return result
+        finally:
+            with self._running_lock:
+                self._running.pop(job.job_id, None)
+            # 取消或停止时关闭流水线，释放LLMconnection和admission名额
+            await results.aclose()
+
+    def _purge(self, conn: sqlite3.Connection):
+        """清理超过保留time的已结束任务"""
+        purged = conn.execute(
+            f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(TERMINAL_STATUSES))}) AND finished_at < ?",
+            (*TERMINAL_STATUSES, time.time() - self.config.retention_seconds)
+        ).rowcount
+        if purged:
+            logger.info(f"🧹 清理 {purged} 个过期任务")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各status的任务数"""
+        stats: Dict[str, Any] = {"enabled": self.available, "workers": len(self._workers), "owner": self.owner_id}
+        if self.available:
+            with self._db() as conn:
+                stats.update(dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()))
+        return stats
+
+# 全局后台任务队列
+job_queue = JobQueue(config.job_queue)
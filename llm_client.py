@@ -0,0 +1,378 @@
+"""
+LLMCall层
+封装OpenAI兼容接口的admission控制、stream/non-streamrequest和errorParse，
+方案Generate流水线的各个阶段都through这里发起AI APICall
+"""
+
+import json
+import time
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from config import config, ModelEndpointConfig
+from http_transport import http_transport
+from resilience import llm_resilience, AttemptOutcome
+from model_router import model_router
+from prompt_assembler import estimate_tokens
+from admission_control import llm_admission
+from usage_tracker import usage_tracker
+
+logger = logging.getLogger(__name__)
+
+OVERLAP_WINDOW = 200  # 续写开头用于去重的缓冲字符数
+OVERLAP_MAX = 500  # 可识别的最长重叠；缓冲仍是上文末尾的一部分时继续缓冲，直到此长度
+MIN_CONTINUATION_TOKENS = 256  # 剩余预算低于此值时not再续写
+
+class LLMError(Exception):
+    """AI API返回非200响应"""
+
+    def __init__(self, status_code: int, message: str, error_code: str = "", body: str = "",
+                 retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+        self.error_code = error_code
+        self.body = body
+        self.retry_after = retry_after
+
+    @classmethod
+    def from_response(cls, response: httpx.Response) -> "LLMError":
+        """从已读取body的响应Parseerrorinformation"""
+        body = response.text
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        try:
+            detail = response.json()
+            if isinstance(detail, dict):
+                return cls(response.status_code, str(detail.get("message", "未知error")),
+                           str(detail.get("code", "")), body, retry_after)
+        except (json.JSONDecodeError, ValueError):
+            pass
+        return cls(response.status_code, body[:200], "", body, retry_after)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """ParseRetry-After头：秒数或HTTP日期"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+@dataclass
+class CompletionChunk:
+    """一次stream增量；non-streammode下整个回复作为一个chunk"""
+    delta: str
+    finish_reason: Optional[str] = None
+    section: str = ""  # 分段Generate时所属的段落key
+
+@dataclass
+class CompletionStats:
+    """单次LLMCall的statistics，由stream_chat_completion在Call过程中填充
+
+    stage由调用方设置（如"generation"、"optimization"），用于按阶段累计用量；
+    cost包含对冲/retry中被放弃的attempt已消耗的部分。
+    """
+    stage: str = ""
+    model: str = ""
+    endpoint: str = ""
+    status_code: int = 0
+    queue_wait: float = 0.0
+    first_token_time: Optional[float] = None
+    duration: float = 0.0
+    finish_reason: Optional[str] = None
+    content_length: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    usage_estimated: bool = False  # API未返回usage，token数由文本估算
+    cost: float = 0.0
+    attempts: int = 0
+    retries: int = 0
+    hedged: bool = False
+    continuations: int = 0
+    sections: Dict[str, "CompletionStats"] = field(default_factory=dict)
+
+    @property
+    def tokens_per_second(self) -> float:
+        """outputtoken速度（按Call总耗时计算）"""
+        return self.completion_tokens / self.duration if self.duration > 0 else 0.0
+
+def parse_stream_line(line: str) -> Optional[dict]:
+    """ParseSSE行，返回chunk字典；[DONE]返回空字典，其他无关行返回None"""
+    if not line or not line.startswith("data:"):
+        return None
+    data_str = line[5:].strip()
+    if data_str == "[DONE]":
+        return {}
+    try:
+        return json.loads(data_str)
+    except json.JSONDecodeError:
+        logger.debug(f"⚠️ Skipping non-JSON stream chunk: {data_str[:100]}")
+        return None
+
+async def stream_chat_completion(
+    request_data: dict,
+    api_url: Optional[str] = None,
+    api_key: Optional[str] = None,
+    stats: Optional[CompletionStats] = None,
+    timeout: Optional[float] = None
+) -> AsyncIterator[CompletionChunk]:
+    """发起一次chat completionCall，逐个yield content增量
+
+    经llm_resilience执行：可retry的failed按退避策略重发，必要时发出对冲request；
+    最终failed时抛出LLMError或httpxerror。timeout为单个attempt的上限，总时长受deadline约束。
+    not传api_url时经model_router在configuration的多个endpoint间路由。
+    """
+    stats = stats if stats is not None else CompletionStats()
+    outcome = AttemptOutcome()
+    attempts = []
+
+    def start_attempt(remaining: float) -> AsyncIterator[CompletionChunk]:
+        attempt_stats = CompletionStats(stage=stats.stage)
+        attempt = _stream_once(request_data, api_url, api_key, attempt_stats,
+                               min(timeout, remaining) if timeout else remaining)
+        attempts.append((attempt, attempt_stats))
+        return attempt
+
+    def sync_stats():
+        for attempt, attempt_stats in attempts:
+            if attempt is outcome.winner:
+                stats.__dict__.update(attempt_stats.__dict__)
+        stats.cost = sum(attempt_stats.cost for _, attempt_stats in attempts)
+        stats.attempts = outcome.attempts
+        stats.retries = outcome.retries
+        stats.hedged = outcome.hedged
+
+    try:
+        async for chunk in llm_resilience.stream(start_attempt, outcome):
+            if stats.first_token_time is None:
+                sync_stats()
+            yield chunk
+    finally:
+        sync_stats()
+
+async def _stream_once(
+    request_data: dict,
+    api_url: Optional[str],
+    api_key: Optional[str],
+    stats: CompletionStats,
+    timeout: float
+) -> AsyncIterator[CompletionChunk]:
+    """单个attempt：取得LLMadmissionslot后发起request
+
+    未指定api_url时由model_router选择endpoint，并以该endpoint的模型名替换request中的model。
+    收到200响应的attempt无论completed、failed还是被取消都会记入用量statistics。
+    """
+    start = time.monotonic()
+    endpoint: Optional[ModelEndpointConfig] = None
+    deltas: List[str] = []
+    try:
+        async with llm_admission.async_slot() as admission:
+            stats.queue_wait = admission.wait_time
+            if api_url:
+                async for chunk in _post_completion(request_data, api_url, api_key or "", stats, timeout, start):
+                    deltas.append(chunk.delta)
+                    yield chunk
+                return
+
+            with model_router.route() as ticket:
+                endpoint = ticket.endpoint
+                stats.endpoint = endpoint.name
+                routed_request = {**request_data, "model": endpoint.model_name}
+                try:
+                    async for chunk in _post_completion(routed_request, endpoint.api_url,
+                                                        endpoint.api_key, stats, timeout, start):
+                        ticket.first_token()
+                        deltas.append(chunk.delta)
+                        yield chunk
+                except LLMError as e:
+                    ticket.failed(e.status_code)
+                    raise
+                except httpx.HTTPError:
+                    ticket.failed()
+                    raise
+                ticket.succeeded()
+    finally:
+        if stats.status_code == 200:
+            _account_usage(request_data, stats, endpoint, "".join(deltas), start)
+
+def _account_usage(request_data: dict, stats: CompletionStats, endpoint: Optional[ModelEndpointConfig],
+                   content: str, start: float):
+    """补齐usage（API未返回时按文本估算）、计算成本并记入usage_tracker"""
+    if not stats.duration:
+        stats.duration = time.monotonic() - start
+    if not stats.prompt_tokens:
+        stats.prompt_tokens = sum(estimate_tokens(str(message.get("content") or ""))
+                                  for message in request_data.get("messages", []))
+        stats.usage_estimated = True
+    if not stats.completion_tokens and content:
+        stats.completion_tokens = estimate_tokens(content)
+        stats.usage_estimated = True
+    stats.cost = usage_tracker.estimate_cost(stats.prompt_tokens, stats.completion_tokens, endpoint)
+    usage_tracker.record(stats.stage, stats.model, stats.endpoint, stats.prompt_tokens,
+                         stats.completion_tokens, stats.duration, stats.cost, stats.usage_estimated)
+
+async def _post_completion(
+    request_data: dict,
+    api_url: str,
+    api_key: str,
+    stats: CompletionStats,
+    timeout: float,
+    start: float
+) -> AsyncIterator[CompletionChunk]:
+    """发起HTTPrequest并Parse响应；非200响应抛出LLMError"""
+    stats.model = request_data.get("model", "")
+    if request_data.get("stream") and config.usage.stream_usage:
+        # OpenAI兼容接口默认not在stream响应中返回usage
+        request_data = {**request_data, "stream_options": {"include_usage": True}}
+    async with http_transport.async_stream(
+        "POST",
+        api_url,
+        headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+        json=request_data,
+        timeout=timeout
+    ) as response:
+        stats.status_code = response.status_code
+
+        if response.status_code != 200:
+            await response.aread()
+            stats.duration = time.monotonic() - start
+            raise LLMError.from_response(response)
+
+        if request_data.get("stream"):
+            async for line in response.aiter_lines():
+                chunk = parse_stream_line(line)
+                if chunk is None:
+                    continue
+                if not chunk:
+                    break
+                if chunk.get("usage"):
+                    _apply_usage(stats, chunk["usage"])
+                choice = (chunk.get("choices") or [{}])[0]
+                delta = (choice.get("delta") or {}).get("content") or ""
+                finish_reason = choice.get("finish_reason")
+                if finish_reason:
+                    stats.finish_reason = finish_reason
+                if delta:
+                    if stats.first_token_time is None:
+                        stats.first_token_time = time.monotonic() - start
+                    stats.content_length += len(delta)
+                    yield CompletionChunk(delta=delta, finish_reason=finish_reason)
+        else:
+            await response.aread()
+            result = response.json()
+            _apply_usage(stats, result.get("usage") or {})
+            choice = (result.get("choices") or [{}])[0]
+            content = (choice.get("message") or {}).get("content") or ""
+            stats.finish_reason = choice.get("finish_reason")
+            stats.first_token_time = time.monotonic() - start
+            stats.content_length = len(content)
+            yield CompletionChunk(delta=content, finish_reason=stats.finish_reason)
+
+    stats.duration = time.monotonic() - start
+
+def _apply_usage(stats: CompletionStats, usage: dict):
+    stats.prompt_tokens = usage.get("prompt_tokens", 0) or 0
+    stats.completion_tokens = usage.get("completion_tokens", 0) or 0
+
+CONTINUATION_PROMPT = "output因长度限制被截断。请紧接着上文最后一个字继续output，not要重复已有content，not要加任何说明或开场白。"
+
+def strip_overlap(previous: str, continuation: str, min_overlap: int = 8, max_overlap: int = OVERLAP_MAX) -> str:
+    """去掉续写开头与已有content末尾重复的部分"""
+    longest = min(len(previous), len(continuation), max_overlap)
+    for size in range(longest, min_overlap - 1, -1):
+        if previous.endswith(continuation[:size]):
+            return continuation[size:]
+    return continuation
+
+async def stream_completion_with_continuation(
+    request_data: dict,
+    api_url: Optional[str] = None,
+    api_key: Optional[str] = None,
+    stats: Optional[CompletionStats] = None,
+    timeout: Optional[float] = None,
+    token_budget: Optional[int] = None,
+    max_continuations: Optional[int] = None
+) -> AsyncIterator[CompletionChunk]:
+    """stream_chat_completion + 自动续写
+
+    finish_reason为length时，把已output的content作为assistant消息发起续写request，
+    续写开头与上文重叠的部分会被去掉；总output受token_budget限制。
+    """
+    stats = stats if stats is not None else CompletionStats()
+    token_budget = token_budget if token_budget is not None else config.pipeline.token_budget
+    max_continuations = max_continuations if max_continuations is not None else config.pipeline.max_continuations
+    start = time.monotonic()
+
+    content = ""
+    used_tokens = 0
+    current_request = request_data
+    while True:
+        round_stats = CompletionStats(stage=stats.stage)
+        round_text = ""
+        # 续写开头先缓冲，凑够窗口后去掉与上文重叠的部分再输出
+        head = "" if content else None
+        async for chunk in stream_chat_completion(current_request, api_url, api_key, round_stats, timeout):
+            if stats.first_token_time is None:
+                stats.first_token_time = time.monotonic() - start
+            round_text += chunk.delta
+            delta = chunk.delta
+            if head is not None:
+                head += delta
+                if len(head) < OVERLAP_WINDOW:
+                    continue
+                # 重复部分比窗口长时，缓冲仍完整出现在上文末尾，继续缓冲到重复结束
+                if len(head) <= OVERLAP_MAX and head in content[-OVERLAP_MAX:]:
+                    continue
+                delta, head = strip_overlap(content, head), None
+            if delta:
+                content += delta
+                yield CompletionChunk(delta=delta, finish_reason=chunk.finish_reason)
+        if head:
+            delta = strip_overlap(content, head)
+            if delta:
+                content += delta
+                yield CompletionChunk(delta=delta, finish_reason=round_stats.finish_reason)
+
+        stats.model = round_stats.model
+        stats.endpoint = round_stats.endpoint
+        stats.status_code = round_stats.status_code
+        stats.queue_wait += round_stats.queue_wait
+        stats.attempts += round_stats.attempts
+        stats.retries += round_stats.retries
+        stats.hedged = stats.hedged or round_stats.hedged
+        stats.finish_reason = round_stats.finish_reason
+        used_tokens += round_stats.completion_tokens or estimate_tokens(round_text)
+        stats.completion_tokens = used_tokens
+        stats.prompt_tokens += round_stats.prompt_tokens
+        stats.usage_estimated = stats.usage_estimated or round_stats.usage_estimated
+        stats.cost += round_stats.cost
+        stats.content_length = len(content)
+
+        remaining = token_budget - used_tokens
+        if round_stats.finish_reason != "length" or not content:
+            break
+        if stats.continuations >= max_continuations or remaining < MIN_CONTINUATION_TOKENS:
+            logger.warning(f"✂️ output仍被截断，续写预算已用完（{used_tokens}/{token_budget} tokens，续写 {stats.continuations} 次）")
+            break
+
+        stats.continuations += 1
+        logger.info(f"🔁 output达到max_tokens，发起第 {stats.continuations} 次续写（已用 {used_tokens}/{token_budget} tokens）")
+        current_request = {
+            **request_data,
+            "messages": list(request_data["messages"]) + [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": CONTINUATION_PROMPT}
+            ],
+            "max_tokens": min(request_data.get("max_tokens", remaining), remaining)
+        }
+
+    stats.duration = time.monotonic() - start
@@ -0,0 +1,245 @@
+"""
+MCP工具Callresult缓存
+内存LRU + 可选SQLite持久化，按service、工具名和规范化后的parameter作为key。
+TTL按service配置；过期但仍在stale窗口内的result照常返回，由调用方在后台刷新
+"""
+
+import os
+import json
+import asyncio
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config import config, MCPCacheConfig
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+@dataclass
+class CachedMCPResult:
+    """缓存的工具Callresult"""
+    key: str
+    service_key: str
+    data: str
+    created_at: float
+    source: str = "memory"  # "memory" | "disk"
+    stale: bool = False
+
+def canonicalize_url(value: str) -> str:
+    """规范化URL：scheme/host小写、去默认端口和fragment、query参数排序"""
+    try:
+        parts = urlsplit(value.strip())
+        if parts.scheme.lower() not in _DEFAULT_PORTS or not parts.netloc:
+            return value
+        host = (parts.hostname or "").lower()
+        if parts.port and parts.port != _DEFAULT_PORTS[parts.scheme.lower()]:
+            host = f"{host}:{parts.port}"
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        return urlunsplit((parts.scheme.lower(), host, parts.path or "/", query, ""))
+    except ValueError:
+        return value
+
+def canonicalize_args(value: Any) -> Any:
+    """递归规范化工具parameter中的URL字符串"""
+    if isinstance(value, dict):
+        return {key: canonicalize_args(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [canonicalize_args(item) for item in value]
+    if isinstance(value, str) and value.lstrip().lower().startswith(("http://", "https://")):
+        return canonicalize_url(value)
+    return value
+
+class MCPResultCache:
+    """两级MCPresult缓存"""
+
+    def __init__(self, cache_config: MCPCacheConfig):
+        self.config = cache_config
+        self._memory: "OrderedDict[str, CachedMCPResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "stale_hits": 0, "misses": 0,
+                       "stores": 0, "evictions": 0}
+        self._db_ready = False
+
+        if self.config.enabled and self.config.persist:
+            self._init_db()
+
+    @staticmethod
+    def make_key(service_key: str, tool_name: str, tool_args: Dict[str, Any]) -> str:
+        """Generate缓存key"""
+        raw = json.dumps({
+            "service": service_key,
+            "tool": tool_name,
+            "args": canonicalize_args(tool_args)
+        }, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @contextmanager
+    def _db(self) -> Iterator[sqlite3.Connection]:
+        """串行化的SQLiteconnection，退出时提交并关闭"""
+        with self._db_lock:
+            conn = sqlite3.connect(self.config.db_path, timeout=10)
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+
+    def _init_db(self):
+        try:
+            os.makedirs(os.path.dirname(self.config.db_path), exist_ok=True)
+            with self._db() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS mcp_results (
+                        key TEXT PRIMARY KEY,
+                        service_key TEXT NOT NULL,
+                        data TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_access REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_mcp_results_last_access ON mcp_results(last_access)")
+            self._db_ready = True
+            logger.info(f"💾 MCPresult缓存已启用: {self.config.db_path}")
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ MCPresult磁盘缓存初始化failed，仅使用内存缓存: {e}")
+
+    def _age_state(self, service_key: str, created_at: float) -> Optional[bool]:
+        """返回是否已过TTL（stale）；超出stale窗口时返回None"""
+        age = time.time() - created_at
+        ttl = self.config.ttl_for(service_key)
+        if age <= ttl:
+            return False
+        if age <= ttl + self.config.stale_seconds:
+            return True
+        return None
+
+    def get(self, key: str) -> Optional[CachedMCPResult]:
+        """查询缓存，先内存后磁盘；stale=True表示已过TTL，调用方应在后台刷新"""
+        if not self.config.enabled:
+            return None
+        return self._get_from_memory(key) or self._get_and_remember_from_disk(key)
+
+    async def get_async(self, key: str) -> Optional[CachedMCPResult]:
+        """get的异步version：内存命中直接返回，磁盘查询放到线程池，not阻塞事件循环"""
+        if not self.config.enabled:
+            return None
+        return self._get_from_memory(key) or await asyncio.to_thread(self._get_and_remember_from_disk, key)
+
+    def _get_from_memory(self, key: str) -> Optional[CachedMCPResult]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry:
+                stale = self._age_state(entry.service_key, entry.created_at)
+                if stale is not None:
+                    self._memory.move_to_end(key)
+                    self._stats["stale_hits" if stale else "memory_hits"] += 1
+                    return CachedMCPResult(**{**entry.__dict__, "source": "memory", "stale": stale})
+                del self._memory[key]
+        return None
+
+    def _get_and_remember_from_disk(self, key: str) -> Optional[CachedMCPResult]:
+        entry = self._get_from_disk(key)
+        with self._lock:
+            if entry:
+                self._stats["stale_hits" if entry.stale else "disk_hits"] += 1
+                self._remember(entry)
+            else:
+                self._stats["misses"] += 1
+        return entry
+
+    def _get_from_disk(self, key: str) -> Optional[CachedMCPResult]:
+        if not self._db_ready:
+            return None
+        try:
+            with self._db() as conn:
+                row = conn.execute(
+                    "SELECT service_key, data, created_at FROM mcp_results WHERE key = ?", (key,)
+                ).fetchone()
+                if not row:
+                    return None
+                stale = self._age_state(row[0], row[2])
+                if stale is None:
+                    conn.execute("DELETE FROM mcp_results WHERE key = ?", (key,))
+                    return None
+                conn.execute("UPDATE mcp_results SET last_access = ? WHERE key = ?", (time.time(), key))
+            return CachedMCPResult(key=key, service_key=row[0], data=row[1], created_at=row[2],
+                                   source="disk", stale=stale)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ MCPresult磁盘缓存读取failed: {e}")
+            return None
+
+    def _remember(self, entry: CachedMCPResult):
+        """写入内存LRU（调用方持有self._lock）"""
+        self._memory[entry.key] = entry
+        self._memory.move_to_end(entry.key)
+        while len(self._memory) > self.config.memory_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def put(self, key: str, service_key: str, data: str):
+        """Save成功的工具result"""
+        if not self.config.enabled or not data:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._remember(CachedMCPResult(key=key, service_key=service_key, data=data, created_at=now))
+            self._stats["stores"] += 1
+
+        if not self._db_ready:
+            return
+        try:
+            with self._db() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO mcp_results (key, service_key, data, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, service_key, data, now, now)
+                )
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ MCPresult磁盘缓存写入failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection):
+        """磁盘淘汰：先删超出stale窗口的，再按最近visit淘汰至条数上限以内"""
+        max_ttl = max([self.config.default_ttl, *self.config.service_ttls.values()])
+        evicted = conn.execute(
+            "DELETE FROM mcp_results WHERE created_at < ?", (time.time() - max_ttl - self.config.stale_seconds,)
+        ).rowcount
+        count = conn.execute("SELECT COUNT(*) FROM mcp_results").fetchone()[0]
+        if count > self.config.max_disk_entries:
+            evicted += conn.execute(
+                "DELETE FROM mcp_results WHERE key IN (SELECT key FROM mcp_results ORDER BY last_access ASC LIMIT ?)",
+                (count - self.config.max_disk_entries,)
+            ).rowcount
+
+        if evicted:
+            with self._lock:
+                self._stats["evictions"] += evicted
+            logger.info(f"🧹 MCPresult缓存淘汰 {evicted} 条记录")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """缓存命中statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        stats["enabled"] = self.config.enabled
+        if self._db_ready:
+            try:
+                with self._db() as conn:
+                    stats["disk_entries"] = conn.execute("SELECT COUNT(*) FROM mcp_results").fetchone()[0]
+            except sqlite3.Error:
+                pass
+        return stats
+
+# 全局MCPresult缓存实例
+mcp_result_cache = MCPResultCache(config.mcp_cache)
@@ -0,0 +1,209 @@
+"""
+MCPservice健康检查与熔断
+后台定期探测每个MCPservice并缓存status；真实Call的result同样计入。
+连续failed达到阈值后熔断：熔断期间直接跳过该service，到期后放行一个试探Call，
+successful则恢复，failed则加倍熔断时长
+"""
+
+import asyncio
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import config, MCPHealthConfig
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# 探测函数：service key -> (是否存活, error说明)
+MCPProbe = Callable[[str], Awaitable[Tuple[bool, str]]]
+
+@dataclass(frozen=True)
+class CallPermit:
+    """allow()放行的一次Call；trial非0表示持有半开状态的试探名额（第几次试探）"""
+    service_key: str
+    trial: int = 0
+
+class ServiceHealth:
+    """单个service的健康status（由MCPHealthMonitor._lock保护）"""
+
+    def __init__(self, service_key: str, name: str):
+        self.service_key = service_key
+        self.name = name
+        self.breaker = CLOSED
+        self.open_until = 0.0
+        self.trips = 0  # 连续熔断次数，决定下一次熔断时长
+        self.trial_in_flight = False
+        self.trial_seq = 0  # 已发放的试探名额序号，只有持有当前序号的Call能结束试探
+        self.consecutive_failures = 0
+        self.last_ok: Optional[bool] = None
+        self.last_latency: Optional[float] = None
+        self.last_error = ""
+        self.last_checked: Optional[float] = None  # time.time()
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        return {
+            "service": self.service_key,
+            "name": self.name,
+            "status": self.status(now),
+            "breaker": self.breaker,
+            "open_for": round(max(0.0, self.open_until - now), 1) if self.breaker == OPEN else 0.0,
+            "consecutive_failures": self.consecutive_failures,
+            "last_ok": self.last_ok,
+            "last_latency": round(self.last_latency, 3) if self.last_latency is not None else None,
+            "last_error": self.last_error,
+            "last_checked": self.last_checked,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected": self.rejected
+        }
+
+    def status(self, now: float) -> str:
+        if self.breaker == OPEN and now < self.open_until:
+            return "down"
+        if self.breaker != CLOSED:
+            return "recovering"
+        if self.last_ok is None:
+            return "unknown"
+        return "healthy" if self.last_ok else "degraded"
+
+class MCPHealthMonitor:
+    """按service的熔断器 + 后台探测"""
+
+    def __init__(self, health_config: MCPHealthConfig):
+        self.config = health_config
+        self._lock = threading.Lock()
+        self._services: Dict[str, ServiceHealth] = {}
+        self._probe: Optional[MCPProbe] = None
+        self._prober: Optional[Any] = None  # concurrent.futures.Future
+
+    def register(self, service_key: str, name: str):
+        with self._lock:
+            self._services.setdefault(service_key, ServiceHealth(service_key, name))
+
+    def _state(self, service_key: str) -> ServiceHealth:
+        """（调用方持有self._lock）"""
+        state = self._services.get(service_key)
+        if state is None:
+            state = self._services[service_key] = ServiceHealth(service_key, service_key)
+        return state
+
+    def is_available(self, service_key: str) -> bool:
+        """只读检查：熔断中（且未到试探time）返回False"""
+        with self._lock:
+            state = self._state(service_key)
+            return not (state.breaker == OPEN and time.monotonic() < state.open_until) \
+                and not (state.breaker == HALF_OPEN and state.trial_in_flight)
+
+    def allow(self, service_key: str) -> Optional[CallPermit]:
+        """Call前检查；熔断到期后只放行一个试探Call。被拒绝时返回None
+
+        Call结束时把返回的permit交给record_success/record_failure/release，
+        只有持有试探名额的Call才能结束试探
+        """
+        with self._lock:
+            state = self._state(service_key)
+            if state.breaker == CLOSED:
+                return CallPermit(service_key)
+            if state.breaker == OPEN and time.monotonic() >= state.open_until:
+                state.breaker = HALF_OPEN
+            if state.breaker == HALF_OPEN and not state.trial_in_flight:
+                state.trial_in_flight = True
+                state.trial_seq += 1
+                return CallPermit(service_key, trial=state.trial_seq)
+            state.rejected += 1
+            return None
+
+    @staticmethod
+    def _holds_trial(state: ServiceHealth, permit: Optional[CallPermit]) -> bool:
+        """（调用方持有self._lock）"""
+        return permit is not None and permit.trial != 0 and permit.trial == state.trial_seq and state.trial_in_flight
+
+    def record_success(self, service_key: str, latency: float, permit: Optional[CallPermit] = None):
+        with self._lock:
+            state = self._state(service_key)
+            recovered = state.breaker != CLOSED
+            state.breaker, state.trial_in_flight = CLOSED, False
+            state.trips = 0
+            state.consecutive_failures = 0
+            state.last_ok, state.last_latency, state.last_error = True, latency, ""
+            state.last_checked = time.time()
+            state.calls += 1
+        if recovered:
+            logger.info(f"✅ {state.name} 已恢复，关闭熔断")
+
+    def record_failure(self, service_key: str, error: str, permit: Optional[CallPermit] = None):
+        """permit为None时（后台探测）视为最新status；熔断前就放行的普通Call在半开期间failed
+        not代表试探result，只计数"""
+        with self._lock:
+            state = self._state(service_key)
+            state.consecutive_failures += 1
+            state.last_ok, state.last_error = False, error
+            state.last_checked = time.time()
+            state.calls += 1
+            state.failures += 1
+            trial = self._holds_trial(state, permit)
+            trip = (state.breaker == HALF_OPEN and (trial or permit is None)) or (
+                state.breaker == CLOSED and state.consecutive_failures >= self.config.failure_threshold
+            )
+            if trial:
+                state.trial_in_flight = False
+            if trip:
+                state.trial_in_flight = False  # 进行中的试探（如有）已过时
+                state.trips += 1
+                duration = min(self.config.max_open_seconds, self.config.open_seconds * (2 ** (state.trips - 1)))
+                state.breaker, state.open_until = OPEN, time.monotonic() + duration
+        if trip:
+            logger.warning(f"🚫 {state.name} 连续failed {state.consecutive_failures} 次，熔断 {duration:.0f}s: {error}")
+
+    def release(self, service_key: str, permit: Optional[CallPermit]):
+        """Call被取消或未发出、没有得出result时结束；持有试探名额的归还名额"""
+        with self._lock:
+            state = self._state(service_key)
+            if self._holds_trial(state, permit):
+                state.trial_in_flight = False
+
+    def start(self, probe: MCPProbe):
+        """启动后台探测（在后台事件循环中运行）"""
+        if not self.config.enabled or self._prober is not None:
+            return
+        from async_runtime import background_loop
+        self._probe = probe
+        self._prober = background_loop.submit(self._probe_loop())
+        logger.info(f"🩺 MCP健康检查已启动: 每 {self.config.probe_interval:.0f}s 探测一次")
+
+    async def _probe_loop(self):
+        while True:
+            with self._lock:
+                service_keys = list(self._services)
+            await asyncio.gather(*(self._probe_once(key) for key in service_keys))
+            await asyncio.sleep(self.config.probe_interval)
+
+    async def _probe_once(self, service_key: str):
+        start = time.monotonic()
+        try:
+            ok, error = await asyncio.wait_for(self._probe(service_key), self.config.probe_timeout)
+        except asyncio.TimeoutError:
+            ok, error = False, "探测timeout"
+        except Exception as e:
+            ok, error = False, f"探测异常: {str(e)}"
+        if ok:
+            self.record_success(service_key, time.monotonic() - start)
+        else:
+            self.record_failure(service_key, error)
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [state.snapshot(now) for state in self._services.values()]
+
+# 全局MCP健康监控
+mcp_health = MCPHealthMonitor(config.mcp_health)
@@ -0,0 +1,175 @@
+"""
+模型endpoint路由
+在多个OpenAI兼容endpoint（not同服务商密钥、自建副本）之间分配request：
+按权重、当前负载、EWMA延迟和error率选择最快最健康的endpoint，
+error率过高或连续failed的endpoint会被暂时摘除
+"""
+
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import config, ModelEndpointConfig, ModelRouterConfig
+
+logger = logging.getLogger(__name__)
+
+# 这些status码说明request本身有问题，not计入endpoint健康度
+CLIENT_ERROR_STATUSES = (400, 413, 422)
+
+class NoEndpointAvailable(Exception):
+    """所有endpoint都已满载"""
+    status_code = 503  # 视同上游503，交给retry策略退避后重试
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = None
+
+class EndpointState:
+    """单个endpoint的运行时status（由ModelRouter._lock保护）"""
+
+    def __init__(self, endpoint: ModelEndpointConfig):
+        self.endpoint = endpoint
+        self.in_flight = 0
+        self.ewma_latency: Optional[float] = None
+        self.ewma_error = 0.0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.requests = 0
+        self.failures = 0
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        return {
+            "name": self.endpoint.name,
+            "model": self.endpoint.model_name,
+            "weight": self.endpoint.weight,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.endpoint.max_concurrency,
+            "ewma_latency": round(self.ewma_latency, 3) if self.ewma_latency is not None else None,
+            "ewma_error_rate": round(self.ewma_error, 3),
+            "consecutive_failures": self.consecutive_failures,
+            "ejected": self.is_ejected(now),
+            "ejected_for": round(max(0.0, self.ejected_until - now), 1),
+            "requests": self.requests,
+            "failures": self.failures
+        }
+
+class RouteTicket:
+    """一次路由result；调用方通过它回报首token延迟和最终result"""
+
+    def __init__(self, router: "ModelRouter", state: EndpointState):
+        self._router = router
+        self._state = state
+        self._started = time.monotonic()
+        self._latency: Optional[float] = None
+        self.endpoint = state.endpoint
+
+    def first_token(self):
+        """记录首个响应到达的延迟"""
+        if self._latency is None:
+            self._latency = time.monotonic() - self._started
+
+    def succeeded(self):
+        self._router._record(self._state, self._latency or (time.monotonic() - self._started), failed=False)
+
+    def failed(self, status_code: Optional[int] = None):
+        if status_code in CLIENT_ERROR_STATUSES:
+            self._router._record(self._state, None, failed=False)
+        else:
+            self._router._record(self._state, None, failed=True)
+
+class ModelRouter:
+    """延迟感知的加权endpoint选择 + 自动摘除"""
+
+    def __init__(self, endpoints: List[ModelEndpointConfig], router_config: ModelRouterConfig):
+        self.config = router_config
+        self._lock = threading.Lock()
+        self._states = [EndpointState(endpoint) for endpoint in endpoints]
+        logger.info(f"🧭 ModelRouter 初始化completed: {', '.join(e.name for e in endpoints)}")
+
+    def has_configured_endpoint(self) -> bool:
+        """至少有一个endpointconfiguration了API密钥"""
+        return any(state.endpoint.api_key for state in self._states)
+
+    def _score(self, state: EndpointState, default_latency: float) -> float:
+        """越小越好：延迟 × error惩罚 × 负载 / 权重；连续failed的endpoint让retry优先换到别处"""
+        latency = state.ewma_latency if state.ewma_latency is not None else default_latency
+        error_penalty = (1 + 10 * state.ewma_error) * (2 ** state.consecutive_failures)
+        return latency * error_penalty * (1 + state.in_flight) / max(state.endpoint.weight, 0.01)
+
+    def _select(self) -> EndpointState:
+        """选择endpoint（调用方持有self._lock）"""
+        now = time.monotonic()
+        configured = [s for s in self._states if s.endpoint.api_key] or self._states
+        available = [s for s in configured if s.in_flight < s.endpoint.max_concurrency]
+        if not available:
+            raise NoEndpointAvailable("所有模型endpoint均已满载，请稍后重试")
+
+        healthy = [s for s in available if not s.is_ejected(now)]
+        if not healthy:
+            # 全部被摘除时fail-open：选最早恢复的，总比直接拒绝好
+            return min(available, key=lambda s: s.ejected_until)
+
+        # 尚无延迟样本的endpoint按当前最快者估计，保证新endpoint能分到流量
+        measured = [s.ewma_latency for s in healthy if s.ewma_latency is not None]
+        default_latency = min(measured) if measured else 1.0
+        return min(healthy, key=lambda s: self._score(s, default_latency))
+
+    @contextmanager
+    def route(self) -> Iterator[RouteTicket]:
+        """占用一个endpoint并发名额；调用方须在退出前回报succeeded/failed，否则按取消Process"""
+        with self._lock:
+            state = self._select()
+            state.in_flight += 1
+        try:
+            yield RouteTicket(self, state)
+        finally:
+            with self._lock:
+                state.in_flight -= 1
+
+    def _record(self, state: EndpointState, latency: Optional[float], failed: bool):
+        alpha = self.config.ewma_alpha
+        now = time.monotonic()
+        with self._lock:
+            state.requests += 1
+            state.ewma_error = alpha * (1.0 if failed else 0.0) + (1 - alpha) * state.ewma_error
+            if failed:
+                state.failures += 1
+                state.consecutive_failures += 1
+            else:
+                state.consecutive_failures = 0
+                state.ejections = 0
+                if latency is not None:
+                    state.ewma_latency = latency if state.ewma_latency is None else \
+                        alpha * latency + (1 - alpha) * state.ewma_latency
+                return
+
+            degraded = state.consecutive_failures >= self.config.eject_consecutive_failures or (
+                state.requests >= self.config.eject_min_requests and state.ewma_error >= self.config.eject_error_rate
+            )
+            if degraded and not state.is_ejected(now):
+                state.ejections += 1
+                duration = min(self.config.max_ejection_seconds,
+                               self.config.ejection_seconds * (2 ** (state.ejections - 1)))
+                state.ejected_until = now + duration
+                logger.warning(
+                    f"🚫 模型endpoint {state.endpoint.name} 已摘除 {duration:.0f}s "
+                    f"(error率 {state.ewma_error:.2f}, 连续failed {state.consecutive_failures})"
+                )
+                # 恢复后从半健康状态重新开始，一次failed即再次摘除
+                state.consecutive_failures = self.config.eject_consecutive_failures - 1
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """各endpoint的负载、延迟和健康status"""
+        now = time.monotonic()
+        with self._lock:
+            return [state.snapshot(now) for state in self._states]
+
+# 全局模型路由器
+model_router = ModelRouter(config.model_endpoints, config.model_router)
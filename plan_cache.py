@@ -0,0 +1,248 @@
+"""
+Development Plan result缓存
+内存LRU + SQLite磁盘两级缓存，按规范化的Idea Description、参考link、模型、
+tip词模板version和温度parameter作为key，命中时直接返回已Generate的方案；
+磁盘行同时保存创意的SimHash指纹，供重启后恢复相似创意index
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import config, PlanCacheConfig
+
+logger = logging.getLogger(__name__)
+
+# 相似创意index所需的列，旧版本建的表启动时补齐
+_IDEA_COLUMNS = {"idea_fingerprint": "TEXT", "idea_context": "TEXT", "idea_preview": "TEXT"}
+
+@dataclass
+class CachedPlan:
+    """缓存的方案result"""
+    key: str
+    plan_text: str
+    prompts: str
+    file_path: Optional[str]
+    created_at: float
+    source: str = "memory"  # "memory" | "disk"
+
+def normalize_idea(user_idea: str) -> str:
+    """规范化Idea Description：去首尾空白、合并空白、统一小写"""
+    return re.sub(r"\s+", " ", (user_idea or "").strip()).lower()
+
+class PlanCache:
+    """两级方案缓存"""
+
+    def __init__(self, cache_config: PlanCacheConfig):
+        self.config = cache_config
+        self._memory: "OrderedDict[str, CachedPlan]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._db_ready = False
+
+        if self.config.enabled:
+            self._init_db()
+
+    @staticmethod
+    def make_key(user_idea: str, reference_url: str, model_name: str,
+                 template_version: str, temperature: float) -> str:
+        """Generate缓存key"""
+        raw = json.dumps({
+            "idea": normalize_idea(user_idea),
+            "url": (reference_url or "").strip(),
+            "model": model_name,
+            "template": template_version,
+            "temperature": round(float(temperature), 3)
+        }, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @contextmanager
+    def _db(self) -> Iterator[sqlite3.Connection]:
+        """串行化的SQLiteconnection，退出时提交并关闭"""
+        with self._db_lock:
+            conn = sqlite3.connect(self.config.db_path, timeout=10)
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+
+    def _init_db(self):
+        try:
+            os.makedirs(os.path.dirname(self.config.db_path), exist_ok=True)
+            with self._db() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS plans (
+                        key TEXT PRIMARY KEY,
+                        plan_text TEXT NOT NULL,
+                        prompts TEXT NOT NULL,
+                        file_path TEXT,
+                        size_bytes INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_access REAL NOT NULL,
+                        idea_fingerprint TEXT,
+                        idea_context TEXT,
+                        idea_preview TEXT
+                    )
+                """)
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(plans)")}
+                for column, column_type in _IDEA_COLUMNS.items():
+                    if column not in columns:
+                        conn.execute(f"ALTER TABLE plans ADD COLUMN {column} {column_type}")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_plans_last_access ON plans(last_access)")
+            self._db_ready = True
+            logger.info(f"💾 方案缓存已启用: {self.config.db_path}")
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 方案磁盘缓存初始化failed，仅使用内存缓存: {e}")
+
+    def _expired(self, created_at: float) -> bool:
+        return time.time() - created_at > self.config.ttl_seconds
+
+    def get(self, key: str) -> Optional[CachedPlan]:
+        """查询缓存，先内存后磁盘；磁盘命中会提升到内存"""
+        if not self.config.enabled:
+            return None
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and not self._expired(entry.created_at):
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return CachedPlan(**{**entry.__dict__, "source": "memory"})
+            if entry:
+                del self._memory[key]
+
+        entry = self._get_from_disk(key)
+        with self._lock:
+            if entry:
+                self._stats["disk_hits"] += 1
+                self._remember(entry)
+            else:
+                self._stats["misses"] += 1
+        return entry
+
+    def _get_from_disk(self, key: str) -> Optional[CachedPlan]:
+        if not self._db_ready:
+            return None
+        try:
+            with self._db() as conn:
+                row = conn.execute(
+                    "SELECT plan_text, prompts, file_path, created_at FROM plans WHERE key = ?", (key,)
+                ).fetchone()
+                if not row:
+                    return None
+                if self._expired(row[3]):
+                    conn.execute("DELETE FROM plans WHERE key = ?", (key,))
+                    return None
+                conn.execute("UPDATE plans SET last_access = ? WHERE key = ?", (time.time(), key))
+            return CachedPlan(key=key, plan_text=row[0], prompts=row[1], file_path=row[2],
+                              created_at=row[3], source="disk")
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 方案磁盘缓存读取failed: {e}")
+            return None
+
+    def _remember(self, entry: CachedPlan):
+        """写入内存LRU（调用方持有self._lock）"""
+        self._memory[entry.key] = entry
+        self._memory.move_to_end(entry.key)
+        while len(self._memory) > self.config.memory_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, key: str, plan_text: str, prompts: str, file_path: Optional[str],
+            idea_fingerprint: Optional[int] = None, idea_context: str = "", idea_preview: str = ""):
+        """Save方案到两级缓存；idea_*为相似创意index条目，随磁盘行一起保存"""
+        if not self.config.enabled or not plan_text:
+            return
+
+        now = time.time()
+        entry = CachedPlan(key=key, plan_text=plan_text, prompts=prompts,
+                           file_path=file_path, created_at=now)
+        with self._lock:
+            self._remember(entry)
+            self._stats["stores"] += 1
+
+        if not self._db_ready:
+            return
+        size_bytes = len(plan_text.encode("utf-8")) + len(prompts.encode("utf-8"))
+        # 64位无符号指纹超出SQLite INTEGER范围，按十六进制文本保存
+        fingerprint = f"{idea_fingerprint:016x}" if idea_fingerprint is not None else None
+        try:
+            with self._db() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO plans (key, plan_text, prompts, file_path, size_bytes, created_at, last_access, "
+                    "idea_fingerprint, idea_context, idea_preview) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, plan_text, prompts, file_path, size_bytes, now, now,
+                     fingerprint, idea_context if fingerprint else None, idea_preview if fingerprint else None)
+                )
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 方案磁盘缓存写入failed: {e}")
+
+    def idea_fingerprints(self) -> List[Tuple[str, int, str, str]]:
+        """未过期磁盘行的(key, 指纹, 上下文, 创意摘要)，按最久未visit到最近排序"""
+        if not self._db_ready:
+            return []
+        try:
+            with self._db() as conn:
+                rows = conn.execute(
+                    "SELECT key, idea_fingerprint, idea_context, idea_preview FROM plans "
+                    "WHERE idea_fingerprint IS NOT NULL AND created_at >= ? ORDER BY last_access ASC",
+                    (time.time() - self.config.ttl_seconds,)
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 方案磁盘缓存读取指纹failed: {e}")
+            return []
+        return [(key, int(fingerprint, 16), context or "", preview or "") for key, fingerprint, context, preview in rows]
+
+    def _evict(self, conn: sqlite3.Connection):
+        """磁盘淘汰：先删过期，再按最近visit淘汰至条数和容量上限以内"""
+        evicted = conn.execute(
+            "DELETE FROM plans WHERE created_at < ?", (time.time() - self.config.ttl_seconds,)
+        ).rowcount
+
+        count, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM plans").fetchone()
+        max_bytes = self.config.max_disk_mb * 1024 * 1024
+        if count > self.config.max_disk_entries or total_bytes > max_bytes:
+            for key, size_bytes in conn.execute("SELECT key, size_bytes FROM plans ORDER BY last_access ASC").fetchall():
+                if count <= self.config.max_disk_entries and total_bytes <= max_bytes:
+                    break
+                conn.execute("DELETE FROM plans WHERE key = ?", (key,))
+                count -= 1
+                total_bytes -= size_bytes
+                evicted += 1
+
+        if evicted:
+            with self._lock:
+                self._stats["evictions"] += evicted
+            logger.info(f"🧹 方案缓存淘汰 {evicted} 条记录")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """缓存命中statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        stats["enabled"] = self.config.enabled
+        if self._db_ready:
+            try:
+                with self._db() as conn:
+                    count, total_bytes = conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM plans"
+                    ).fetchone()
+                stats["disk_entries"] = count
+                stats["disk_bytes"] = total_bytes
+            except sqlite3.Error:
+                pass
+        return stats
+
+# 全局方案缓存实例
+plan_cache = PlanCache(config.plan_cache)
@@ -0,0 +1,148 @@
+"""
+tip词组装器
+估算各部分的token数并执行上下文预算：超出预算时先压缩外部知识
+（去冗余空白 → 抽取title和段落首句 → 按行截断），最后才截断Idea Description
+"""
+
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from config import config, PipelineConfig
+
+logger = logging.getLogger(__name__)
+
+_CJK_RE = re.compile(r"[　-〿㐀-鿿＀-￯]")
+_SENTENCE_END_RE = re.compile(r"(?<=[。！？.!?])\s*")
+
+TRUNCATION_NOTICE = "\n…（以上content已按token预算压缩）"
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中文约每字1个token，其他字符约每4个1个token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """按行截断到token上限以内；单行过长时按字符截断"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    kept: List[str] = []
+    used = estimate_tokens(TRUNCATION_NOTICE)
+    for line in text.split("\n"):
+        line_tokens = estimate_tokens(line) + 1
+        if used + line_tokens > max_tokens:
+            if not kept:
+                # 第一行就超出：按比例截字符
+                ratio = max(0.0, (max_tokens - used) / max(line_tokens, 1))
+                kept.append(line[:int(len(line) * ratio)])
+            break
+        kept.append(line)
+        used += line_tokens
+    return "\n".join(kept).rstrip() + TRUNCATION_NOTICE
+
+def condense_knowledge(knowledge: str, max_tokens: int) -> str:
+    """把外部知识压缩到token上限以内，尽量保留结构和要点"""
+    if estimate_tokens(knowledge) <= max_tokens:
+        return knowledge
+
+    # 1. 合并多余空白
+    text = re.sub(r"[ \t]+", " ", knowledge)
+    text = re.sub(r"\n\s*\n+", "\n\n", text).strip()
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    # 2. 抽取式摘要：保留title、列table项和每段首句
+    summary: List[str] = []
+    for block in text.split("\n\n"):
+        for index, line in enumerate(block.split("\n")):
+            stripped = line.strip()
+            if stripped.startswith(("#", "-", "*", "|")) or re.match(r"^\d+[.)、]", stripped):
+                summary.append(stripped[:200])
+            elif index == 0 and stripped:
+                summary.append(_SENTENCE_END_RE.split(stripped, maxsplit=1)[0][:300])
+    text = "\n".join(summary)
+    if estimate_tokens(text) <= max_tokens:
+        return text + TRUNCATION_NOTICE
+
+    # 3. 按行截断
+    return truncate_to_tokens(text, max_tokens)
+
+@dataclass
+class AssembledPrompt:
+    """组装后的tip词和token账目"""
+    system_prompt: str
+    user_prompt: str
+    input_tokens: int
+    budget: int
+    part_tokens: Dict[str, int] = field(default_factory=dict)
+    trimmed: Dict[str, str] = field(default_factory=dict)  # 部分名 -> "原tokens → 现tokens"
+
+class PromptAssembler:
+    """按预算组装系统tip词、Idea Description和外部知识"""
+
+    def __init__(self, pipeline_config: PipelineConfig):
+        self.config = pipeline_config
+
+    def input_budget(self, max_output_tokens: int) -> int:
+        """Enter可用的token数：上下文窗口减去output上限和安全余量"""
+        return self.config.context_window - max_output_tokens - self.config.context_margin
+
+    def assemble(self, system_prompt: str, user_template: str, parts: Dict[str, str],
+                 max_output_tokens: int, knowledge_key: Optional[str] = "knowledge") -> AssembledPrompt:
+        """把parts填入user_template（str.format占位符），超出预算时依次压缩knowledge和其他部分
+
+        系统tip词和模板本身已超出预算时压缩parts也无济于事，只按知识上限压缩并记录warning
+        """
+        budget = self.input_budget(max_output_tokens)
+        parts = dict(parts)
+        trimmed: Dict[str, str] = {}
+
+        def measure() -> Dict[str, int]:
+            tokens = {"system": estimate_tokens(system_prompt),
+                      "template": estimate_tokens(user_template.format(**{key: "" for key in parts}))}
+            tokens.update({key: estimate_tokens(value) for key, value in parts.items()})
+            return tokens
+
+        tokens = measure()
+        static_fits = tokens["system"] + tokens["template"] < budget
+        # 外部知识先单独受上限约束，再参与总预算
+        if knowledge_key and parts.get(knowledge_key):
+            allowed = self.config.max_knowledge_tokens
+            if static_fits:
+                allowed = min(allowed, budget - (sum(tokens.values()) - tokens[knowledge_key]))
+            if tokens[knowledge_key] > allowed:
+                parts[knowledge_key] = condense_knowledge(parts[knowledge_key], max(allowed, 0))
+                trimmed[knowledge_key] = f"{tokens[knowledge_key]} → {estimate_tokens(parts[knowledge_key])}"
+                tokens = measure()
+
+        # 仍超预算时按从大到小截断其余可变部分
+        for key in sorted(parts, key=lambda k: tokens[k], reverse=True) if static_fits else ():
+            overflow = sum(tokens.values()) - budget
+            if overflow <= 0:
+                break
+            original = tokens[key]
+            parts[key] = truncate_to_tokens(parts[key], max(original - overflow, 0))
+            trimmed[key] = f"{original} → {estimate_tokens(parts[key])}"
+            tokens = measure()
+
+        user_prompt = user_template.format(**parts)
+        input_tokens = tokens["system"] + estimate_tokens(user_prompt)
+        if input_tokens > budget:
+            logger.warning(f"⚠️ tip词仍超出预算: {input_tokens} > {budget} tokens")
+        if trimmed:
+            logger.info(f"✂️ tip词按预算压缩: {trimmed}")
+
+        return AssembledPrompt(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            input_tokens=input_tokens,
+            budget=budget,
+            part_tokens=tokens,
+            trimmed=trimmed
+        )
+
+# 全局tip词组装器
+prompt_assembler = PromptAssembler(config.pipeline)
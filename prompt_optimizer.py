@@ -3,11 +3,14 @@ tip词Optimize器module
 使用AIOptimizeuserEnter的Idea Description，improvementGenerate报告的质量
 """
 
-import requests
 import json
 import logging
 from typing import Tuple, Dict, Any, Optional
 from config import config
+from async_runtime import background_loop
+from llm_client import stream_chat_completion, CompletionStats, LLMError
+from model_router import model_router
+from prompt_templates import IDEA_OPTIMIZATION
 
 logger = logging.getLogger(__name__)
 
@@ -15,11 +18,13 @@ class PromptOptimizer:
     """userEntertip词Optimize器"""
     
     def __init__(self):
-        self.api_key = config.ai_model.api_key
-        self.api_url = config.ai_model.api_url
         self.model_name = config.ai_model.model_name
         
     def optimize_user_input(self, user_idea: str) -> Tuple[bool, str, str]:
+        """optimize_user_input_async 的同步facade"""
+        return background_loop.run(self.optimize_user_input_async(user_idea))
+    
+    async def optimize_user_input_async(self, user_idea: str) -> Tuple[bool, str, str]:
         """
         OptimizeuserEnter的Idea Description
         
@@ -29,7 +34,7 @@ class PromptOptimizer:
         Returns:
             Tuple[bool, str, str]: (successfulstatus, Optimize后的description, Optimizesuggestions)
         """
-        if not self.api_key:
+        if not model_router.has_configured_endpoint():
             return False, user_idea, "API密钥未configuration，unable toOptimizedescription"
         
         if not user_idea or len(user_idea.strip()) < 5:
@@ -40,7 +45,7 @@ class PromptOptimizer:
             optimization_prompt = self._build_optimization_prompt(user_idea)
             
             # CallAIOptimize
-            response = self._call_ai_service(optimization_prompt)
+            response = await self._call_ai_service(optimization_prompt)
             
             if response['success']:
                 result = self._parse_optimization_result(response['data'])
@@ -54,68 +59,34 @@ class PromptOptimizer:
             return False, user_idea, f"OptimizeProcess error: {str(e)}"
     
     def _build_optimization_prompt(self, user_idea: str) -> str:
-        """buildOptimizetip词"""
-        return f"""你是一个专业的产品经理和技术顾问，擅长将user的简单想法扩展为详细的产品description。
-
-user原始Enter：
-{user_idea}
-
-请帮助Optimize这个Idea Description，使其更加详细、具体和专业。Optimize后的description应该包含以下to素：
-
-1. **Core Features**：明确产品的主tofeature和价值
-2. **目标user**：定义产品的目标user群体
-3. **使用场景**：description产品的典型使用场景
-4. **技术特点**：提及可能需to的关键技术特性
-5. **商业价值**：阐述产品的市场价值和竞争优势
-
-请按以下JSONformatoutput：
-{{
-    "optimized_idea": "Optimize后的详细产品description",
-    "key_improvements": [
-        "改进点1",
-        "改进点2",
-        "改进点3"
-    ],
-    "suggestions": "进一步Optimizesuggestions"
-}}
+        """buildOptimizetip词（固定说明在前，user原始Enter在末尾）"""
+        return IDEA_OPTIMIZATION.render(idea=user_idea)
 
-requirements：
-- 保持原始创意的核心思想
-- 使用专业但易懂的语言
-- length控制在200-400字之间
-- 突出产品的创新性和实用性"""
-
-    def _call_ai_service(self, prompt: str) -> Dict[str, Any]:
+    async def _call_ai_service(self, prompt: str) -> Dict[str, Any]:
         """CallAIservice"""
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
             payload = {
                 "model": self.model_name,
                 "messages": [
                     {"role": "user", "content": prompt}
                 ],
                 "max_tokens": 1000,
-                "temperature": 0.7
+                "temperature": 0.7,
+                "stream": False
             }
             
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=payload,
-                timeout=300  # Optimize：Idea DescriptionOptimizeTimeout duration为300s（5min）
-            )
+            # 与方案Generate共享LLMadmission控制和retry策略，AdmissionRejected由下方统一转为errorresult
+            content = ""
+            stats = CompletionStats(stage="optimization")
+            async for chunk in stream_chat_completion(payload, stats=stats):
+                content += chunk.delta
+            logger.info(f"🧮 OptimizeToken用量: Enter {stats.prompt_tokens} / output {stats.completion_tokens}"
+                        f"{'（估算）' if stats.usage_estimated else ''}，{stats.tokens_per_second:.1f} tokens/s，"
+                        f"估算成本 {stats.cost:.4f} {config.usage.currency}")
+            return {"success": True, "data": content}
             
-            if response.status_code == 200:
-                data = response.json()
-                content = data.get('choices', [{}])[0].get('message', {}).get('content', '')
-                return {"success": True, "data": content}
-            else:
-                return {"success": False, "error": f"APICallfailed: {response.status_code}"}
-                
+        except LLMError as e:
+            return {"success": False, "error": f"APICallfailed: {e.status_code}"}
         except Exception as e:
             return {"success": False, "error": str(e)}
     
@@ -0,0 +1,323 @@
+"""
+tip词模板注册table
+模板在启动时编译一次：大段静态说明放在最前，日期、创意等动态上下文放在末尾，
+使相同前缀能被服务端的prefix/KV缓存复用；每个模板带version和content指纹，供结果缓存做key
+"""
+
+import hashlib
+import logging
+import string
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from prompt_assembler import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+SECTION_SEPARATOR = "\n\n"
+
+@dataclass
+class PromptTemplate:
+    """编译后的tip词模板：static_text原样output，dynamic_template用str.format占位符"""
+    name: str
+    version: str
+    static_text: str
+    dynamic_template: str = ""
+    fields: Tuple[str, ...] = ()
+    fingerprint: str = ""
+    static_tokens: int = 0
+    renders: int = 0
+    rendered_chars: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def version_key(self) -> str:
+        """模板名 + version + content指纹，content变化即使忘了改version也会换key"""
+        return f"{self.name}@{self.version}-{self.fingerprint[:8]}"
+
+    @property
+    def format_template(self) -> str:
+        """整个模板的str.format形式（静态部分的花括号已转义），交给prompt_assembler填充"""
+        static = self.static_text.replace("{", "{{").replace("}", "}}")
+        if not self.dynamic_template:
+            return static
+        return static + SECTION_SEPARATOR + self.dynamic_template
+
+    def render(self, **context: Any) -> str:
+        """静态前缀 + 渲染后的动态尾部"""
+        missing = [name for name in self.fields if name not in context]
+        if missing:
+            raise KeyError(f"Prompt template {self.name} missing fields: {missing}")
+        text = self.static_text
+        if self.dynamic_template:
+            text += SECTION_SEPARATOR + self.dynamic_template.format(**context)
+        self.record_render(len(text))
+        return text
+
+    def record_render(self, chars: int):
+        with self._lock:
+            self.renders += 1
+            self.rendered_chars += chars
+
+class PromptTemplateRegistry:
+    """按名称管理已编译的tip词模板"""
+
+    def __init__(self):
+        self._templates: Dict[str, PromptTemplate] = {}
+
+    def register(self, name: str, version: str, static_text: str, dynamic_template: str = "") -> PromptTemplate:
+        """编译并注册模板：解析占位符、计算指纹和静态前缀token数"""
+        fields = tuple(dict.fromkeys(
+            field_name for _, field_name, _, _ in string.Formatter().parse(dynamic_template) if field_name
+        ))
+        fingerprint = hashlib.sha256(
+            f"{version}\x00{static_text}\x00{dynamic_template}".encode("utf-8")
+        ).hexdigest()
+        template = PromptTemplate(
+            name=name,
+            version=version,
+            static_text=static_text,
+            dynamic_template=dynamic_template,
+            fields=fields,
+            fingerprint=fingerprint,
+            static_tokens=estimate_tokens(static_text)
+        )
+        self._templates[name] = template
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        return self._templates[name]
+
+    def render(self, name: str, **context: Any) -> str:
+        return self._templates[name].render(**context)
+
+    def version_key(self, *names: str) -> str:
+        """多个模板组合的versionkey"""
+        return "+".join(self._templates[name].version_key for name in names)
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """各模板的静态前缀大小、动态部分大小和渲染statistics"""
+        stats = []
+        for template in self._templates.values():
+            with template._lock:
+                renders, rendered_chars = template.renders, template.rendered_chars
+            stats.append({
+                "name": template.name,
+                "version": template.version_key,
+                "static_chars": len(template.static_text),
+                "static_bytes": len(template.static_text.encode("utf-8")),
+                "static_tokens": template.static_tokens,
+                "dynamic_chars": len(template.dynamic_template),
+                "fields": list(template.fields),
+                "renders": renders,
+                "avg_rendered_chars": round(rendered_chars / renders) if renders else 0
+            })
+        return stats
+
+# 全局tip词模板注册table
+prompt_templates = PromptTemplateRegistry()
+
+# ---- Development PlanGenerate ----
+
+# 系统tip词 - 防止虚假linkGenerate，强化Coding PromptsGenerate，增强视觉化content，加强日期上下文
+GENERATION_SYSTEM = prompt_templates.register(
+    "generation_system",
+    "2026.10-1",
+    static_text="""你是一个资深技术项目经理，精通产品规划和 AI 编程助手（如 GitHub Copilot、ChatGPT Code）tip词撰写。
+
+🔴 重torequirements：
+1. 当收到外部知识库参考时，你必须在Development Plan中明确引用和融合这些information
+2. 必须在Development Plan的开头部分提及参考来源（如CSDN博客、GitHub项目等）
+3. 必须根据外部参考调整技术选型和实施suggestions
+4. 必须在相关章节中使用"参考XXXsuggestions"等table述
+5. 开发阶段必须有明确编号（第1阶段、第2阶段等）
+
+🚫 严禁行为（严格执行）：
+- **绝对notto编造任何虚假的link或参考资料**
+- **禁止Generate任何does not exist的URL，包括但not限于：**
+  - ❌ https://medium.com/@username/... (user名+数字IDformat)
+  - ❌ https://github.com/username/... (占位符user名)
+  - ❌ https://blog.csdn.net/username/... 
+  - ❌ https://www.kdnuggets.com/y份/m份/... (虚构文章)
+  - ❌ https://example.com, xxx.com, test.com 等test域名
+  - ❌ 任何以https0://开头的error协议link
+- **notto在"参考来源"部分add任何link，除nonuser明确提供**
+- **notto使用"参考文献"、"延伸阅读"等titleadd虚假link**
+
+✅ 正确做法：
+- If no external reference is provided，**完全省略"参考来源"部分**
+- 只引用user实际提供的参考link（如果有的话）
+- 当外部知识notavailable时，明确说明是基于最佳实践Generate
+- 使用 "基于行业standard"、"参考常见架构"、"遵循最佳实践" 等table述
+- **Development Plan应直接start，notto虚构任何外部资源**
+
+📊 视觉化contentrequirements（新增）：
+- 必须在Technical Solution中包含架构图的Mermaid代码
+- 必须在Development Plan中包含甘特图的Mermaid代码
+- 必须在featuremodule中包含flowchart的Mermaid代码
+- 必须包含技术栈对比table格
+- 必须包含项目里程碑timetable
+
+🎯 Mermaid图tableformatrequirements（严格遵循）：
+
+⚠️ **严格禁止errorformat**：
+- ❌ 绝对notto使用 `A[""文本""]` format（双重引号）
+- ❌ 绝对notto使用 `## 🎯` 等title在图tableinternal
+- ❌ 绝对notto在节点名称中使用emoji符号
+
+✅ **正确的Mermaid语法**：
+
+**架构图example**：
+```mermaid
+flowchart TD
+    A["user界面"] --> B["业务逻辑层"]
+    B --> C["datavisit层"]
+    C --> D["data库"]
+    B --> E["外部API"]
+    F["缓存"] --> B
+```
+
+**flowchartexample**：
+```mermaid
+flowchart TD
+    Start([start]) --> Input[userEnter]
+    Input --> Validate{ValidateEnter}
+    Validate -->|有效| Process[Processdata]
+    Validate -->|无效| Error[Showerror]
+    Process --> Save[Saveresult]
+    Save --> Success[successfultip]
+    Error --> Input
+    Success --> End([end])
+```
+
+**甘特图example（必须使用真实的项目start日期）**：
+```mermaid
+gantt
+    title 项目开发甘特图
+    dateFormat YYYY-MM-DD
+    axisFormat %m-%d
+    
+    section 需求分析
+    Requirement Research     :done, req1, <项目start日期>, 3d
+    Requirement Organization     :done, req2, after req1, 4d
+    
+    section 系统Design
+    Architecture Design     :active, design1, after req2, 7d
+    UIDesign       :design2, after design1, 5d
+    
+    section 开发实施
+    Backend Development     :dev1, after design2, 14d
+    Frontend Development     :dev2, after design2, 14d
+    Integration Testing     :test1, after dev1, 7d
+    
+    section 部署上线
+    Deployment Preparation     :deploy1, after test1, 3d
+    Official Launch     :deploy2, after deploy1, 2d
+```
+
+⚠️ **日期Generate规则**：
+- 项目start日期：见tip词末尾的「currenttime上下文」（下w一start）
+- All dates must be based on the current year（见tip词末尾）and later
+- 严禁使用 2024 y以前的日期
+- 里程碑日期必须与甘特图保持一致
+
+🎯 必须严格按照Mermaid语法规范Generate图table，not能有formaterror
+
+🎯 AI Coding Promptsformatrequirements（重to）：
+- 必须在Development Plan后Generate专门的"# AI编程助手tip词"部分
+- 每个featuremodule必须有一个专门的AI Coding Prompts
+- 每个tip词必须使用```代码块format，方便Copy
+- tip词contentto基于具体项目feature，notto使用通用模板
+- tip词to详细、具体、可直接用于AI编程工具
+- 必须包含完整的上下文和具体requirements
+
+🔧 tip词结构requirements：
+每个tip词使用以下format：
+
+## [feature名称]开发tip词
+
+```
+请为[具体项目名称]开发[具体featuredescription]。
+
+项目背景：
+[基于Development Plan的项目背景]
+
+featurerequirements：
+1. [具体requirements1]
+2. [具体requirements2]
+...
+
+技术约束：
+- 使用[具体技术栈]
+- 遵循[具体规范]
+- 实现[具体性能requirements]
+
+outputrequirements：
+- 完整可运行代码
+- 详细注释说明
+- errorProcess机制
+- test用例
+```
+
+请严格按照此formatGenerate个性化的Coding Prompts，确保每个tip词都基于具体项目需求。
+
+formatrequirements：先outputDevelopment Plan，然后outputCoding Prompts部分。""",
+    dynamic_template="""📅 **currenttime上下文**：今d是 {today}，currenty份是 {year} y。所有项目time必须基于currenttime合理规划。
+- 项目start日期：{project_start}（下w一start），甘特图和里程碑中的 <项目start日期> 一律替换为该日期
+- All dates must be based on {year} yand later"""
+)
+
+_GENERATION_REQUIREMENTS = """1. 详细的Development Plan（包含产品概述、Technical Solution、Development Plan、部署方案、推广策略等）
+2. 每个featuremodule对应的AI编程助手tip词
+
+确保tip词具体、可操作，能直接用于AI编程工具。"""
+
+# usertip词：固定要求在前，Idea Description和外部知识在后，由prompt_assembler按token预算填入
+GENERATION_USER = prompt_templates.register(
+    "generation_user",
+    "2026.10-1",
+    static_text="请根据下方的产品创意Generate：\n" + _GENERATION_REQUIREMENTS,
+    dynamic_template="产品创意：{idea}"
+)
+
+GENERATION_USER_WITH_KNOWLEDGE = prompt_templates.register(
+    "generation_user_knowledge",
+    "2026.10-1",
+    static_text="请基于下方的外部知识库参考和产品创意Generate：\n" + _GENERATION_REQUIREMENTS,
+    dynamic_template="产品创意：{idea}\n\n# 外部知识库参考\n{knowledge}"
+)
+
+# ---- Idea DescriptionOptimize ----
+
+IDEA_OPTIMIZATION = prompt_templates.register(
+    "idea_optimization",
+    "2026.10-1",
+    static_text="""你是一个专业的产品经理和技术顾问，擅长将user的简单想法扩展为详细的产品description。
+
+请帮助Optimize文末的user原始Enter，使其更加详细、具体和专业。Optimize后的description应该包含以下to素：
+
+1. **Core Features**：明确产品的主tofeature和价值
+2. **目标user**：定义产品的目标user群体
+3. **使用场景**：description产品的典型使用场景
+4. **技术特点**：提及可能需to的关键技术特性
+5. **商业价值**：阐述产品的市场价值和竞争优势
+
+请按以下JSONformatoutput：
+{
+    "optimized_idea": "Optimize后的详细产品description",
+    "key_improvements": [
+        "改进点1",
+        "改进点2",
+        "改进点3"
+    ],
+    "suggestions": "进一步Optimizesuggestions"
+}
+
+requirements：
+- 保持原始创意的核心思想
+- 使用专业但易懂的语言
+- length控制在200-400字之间
+- 突出产品的创新性和实用性""",
+    dynamic_template="user原始Enter：\n{idea}"
+)
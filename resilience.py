@@ -0,0 +1,215 @@
+"""
+LLMCall弹性层
+对上游AI APICall提供带抖动的指数退避retry（遵循Retry-After）和总deadline，
+以及可选的对冲request：首个响应超过观测到的p95延迟时再发一个request，先返回的获胜
+"""
+
+import asyncio
+import random
+import threading
+import time
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional, Tuple
+
+import httpx
+
+from config import config, LLMResilienceConfig
+from admission_control import llm_admission
+
+logger = logging.getLogger(__name__)
+
+_EMPTY = object()  # attempt未产出任何item就结束
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """超过LLMCall总deadline"""
+
+    def __init__(self, deadline: float):
+        super().__init__(f"LLM call exceeded its {deadline:.0f}s deadline")
+
+@dataclass
+class AttemptOutcome:
+    """一次弹性Call的result，由ResiliencePolicy.stream在Call过程中填充"""
+    winner: Any = None
+    attempts: int = 0
+    retries: int = 0
+    hedged: bool = False
+
+async def _first_item(attempt: AsyncIterator) -> Any:
+    try:
+        return await attempt.__anext__()
+    except StopAsyncIteration:
+        return _EMPTY
+
+async def _discard(task: "asyncio.Future", attempt: AsyncIterator):
+    """取消落败或failed的attempt并关闭其connection"""
+    task.cancel()
+    try:
+        await task
+    except BaseException:
+        pass
+    try:
+        await attempt.aclose()
+    except Exception as e:
+        logger.debug(f"Closing abandoned attempt failed: {e}")
+
+class ResiliencePolicy:
+    """retry + deadline + 对冲
+
+    attempt由调用方提供的工厂函数创建（parameter为剩余deadline秒数），
+    只有在产出第一个item之前的failed才会retry，已经开始output的stream不会重放。
+    """
+
+    def __init__(self, name: str, resilience_config: LLMResilienceConfig):
+        self.name = name
+        self.config = resilience_config
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=resilience_config.latency_window)
+        self._counters = {
+            "calls": 0, "attempts": 0, "retries": 0, "hedges": 0,
+            "hedge_wins": 0, "deadline_exceeded": 0, "failures": 0
+        }
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def is_retryable(self, error: BaseException) -> bool:
+        """429/5xx和connection层error可retry；业务error、admission拒绝和deadline不retry"""
+        if isinstance(error, DeadlineExceeded):
+            return False
+        status_code = getattr(error, "status_code", None)
+        if status_code is not None:
+            return status_code in self.config.retry_statuses
+        return isinstance(error, httpx.TransportError)
+
+    def backoff_delay(self, retry_index: int, error: BaseException) -> float:
+        """服务端给了Retry-After就照办，否则带抖动的指数退避"""
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            return max(0.0, retry_after)
+        cap = min(self.config.backoff_max, self.config.backoff_base * (2 ** retry_index))
+        return random.uniform(cap / 2, cap)
+
+    def hedge_delay(self) -> Optional[float]:
+        """对冲触发延迟：观测到的首item延迟分位数；未启用或样本not足时返回None"""
+        if not self.config.hedge_enabled:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.config.hedge_min_samples:
+                return None
+            samples = sorted(self._latencies)
+        index = min(len(samples) - 1, int(len(samples) * self.config.hedge_percentile))
+        return max(self.config.hedge_min_delay, samples[index])
+
+    async def _race(self, start_attempt: Callable[[float], AsyncIterator], deadline: float,
+                    outcome: AttemptOutcome) -> Tuple[AsyncIterator, Any]:
+        """发起一次Call（必要时追加对冲request），返回(获胜attempt, 首个item)"""
+        started = time.monotonic()
+        primary = start_attempt(deadline - started)
+        outcome.attempts += 1
+        self._count("attempts")
+        racers: Dict["asyncio.Future", Tuple[AsyncIterator, float]] = {
+            asyncio.ensure_future(_first_item(primary)): (primary, started)
+        }
+        try:
+            hedge_delay = self.hedge_delay()
+            if hedge_delay is not None and started + hedge_delay < deadline:
+                done, _ = await asyncio.wait(racers, timeout=hedge_delay)
+                # 服务商已饱和时对冲只会加重排队
+                if not done and llm_admission.has_capacity():
+                    logger.info(f"🪁 [{self.name}] 首个响应超过 {hedge_delay:.2f}s，发出对冲request")
+                    hedge_started = time.monotonic()
+                    hedge = start_attempt(deadline - hedge_started)
+                    outcome.attempts += 1
+                    outcome.hedged = True
+                    self._count("attempts")
+                    self._count("hedges")
+                    racers[asyncio.ensure_future(_first_item(hedge))] = (hedge, hedge_started)
+
+            error: Optional[BaseException] = None
+            while racers:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceeded(self.config.deadline)
+                done, _ = await asyncio.wait(racers, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise DeadlineExceeded(self.config.deadline)
+                for task in done:
+                    attempt, attempt_started = racers.pop(task)
+                    if task.exception() is None:
+                        with self._lock:
+                            self._latencies.append(time.monotonic() - attempt_started)
+                        if attempt is not primary:
+                            self._count("hedge_wins")
+                            logger.info(f"🪁 [{self.name}] 对冲request胜出")
+                        return attempt, task.result()
+                    error = task.exception()
+                    await _discard(task, attempt)
+            raise error
+        finally:
+            for task, (attempt, _) in racers.items():
+                await _discard(task, attempt)
+
+    async def stream(self, start_attempt: Callable[[float], AsyncIterator],
+                     outcome: Optional[AttemptOutcome] = None) -> AsyncIterator[Any]:
+        """以弹性策略执行stream Call，逐个yield获胜attempt的item"""
+        outcome = outcome if outcome is not None else AttemptOutcome()
+        deadline = time.monotonic() + self.config.deadline
+        self._count("calls")
+
+        while True:
+            try:
+                attempt, first = await self._race(start_attempt, deadline, outcome)
+                break
+            except DeadlineExceeded:
+                self._count("deadline_exceeded")
+                logger.error(f"⏰ [{self.name}] 超过 {self.config.deadline:.0f}s deadline")
+                raise
+            except Exception as e:
+                retry_index = outcome.retries
+                if not self.is_retryable(e) or retry_index + 1 >= self.config.max_attempts:
+                    self._count("failures")
+                    raise
+                delay = self.backoff_delay(retry_index, e)
+                if time.monotonic() + delay >= deadline:
+                    self._count("failures")
+                    logger.warning(f"⏰ [{self.name}] 退避 {delay:.1f}s 将超过deadline，放弃retry")
+                    raise
+                outcome.retries += 1
+                self._count("retries")
+                logger.warning(f"🔁 [{self.name}] 第 {outcome.retries} 次retry，{delay:.1f}s 后发起（{type(e).__name__}: {e}）")
+                await asyncio.sleep(delay)
+
+        outcome.winner = attempt
+        try:
+            if first is _EMPTY:
+                return
+            yield first
+            while True:
+                if time.monotonic() > deadline:
+                    self._count("deadline_exceeded")
+                    raise DeadlineExceeded(self.config.deadline)
+                try:
+                    item = await attempt.__anext__()
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            await attempt.aclose()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """retry、对冲和deadline计数，以及首item延迟分位数"""
+        with self._lock:
+            metrics = dict(self._counters)
+            samples = sorted(self._latencies)
+        metrics["name"] = self.name
+        metrics["latency_samples"] = len(samples)
+        metrics["p50_first_item"] = round(samples[len(samples) // 2], 3) if samples else 0.0
+        metrics["p95_first_item"] = round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3) if samples else 0.0
+        metrics["hedge_delay"] = self.hedge_delay()
+        return metrics
+
+# 全局LLMCall弹性策略
+llm_resilience = ResiliencePolicy("llm", config.llm_resilience)
@@ -0,0 +1,230 @@
+"""
+无界面REST API
+供服务间Call的轻量FastAPI路由，与Gradio UI挂载在同一服务上，直接CallGenerate、
+Optimize和Export函数，省去Gradio队列/websocket协议的往返开销
+"""
+
+import asyncio
+import contextlib
+import hmac
+import json
+import re
+import logging
+from urllib.parse import quote
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+import gradio as gr
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Request
+from fastapi.routing import APIRoute
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+
+from config import config, RestAPIConfig
+from prompt_optimizer import prompt_optimizer
+from export_manager import export_manager
+from usage_tracker import usage_tracker
+from generation_pipeline import GenerationError
+
+logger = logging.getLogger(__name__)
+
+# 与generate_development_plan_async相同的签名
+PlanGenerator = Callable[[str, str], AsyncIterator[Tuple[str, str, Optional[str]]]]
+
+# Exportformat -> (Content-Type, 扩展名)
+EXPORT_TYPES = {
+    "markdown": ("text/markdown; charset=utf-8", "md"),
+    "html": ("text/html; charset=utf-8", "html"),
+    "docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", "docx"),
+    "pdf": ("application/pdf", "pdf"),
+    "zip": ("application/zip", "zip"),
+}
+
+# 非streamGenerate期间检查客户端是否断开的间隔（秒）
+DISCONNECT_POLL_INTERVAL = 1.0
+
+class GenerateRequest(BaseModel):
+    idea: str
+    reference_url: str = ""
+    stream: bool = True
+    format: str = "ndjson"  # "ndjson" | "sse"，仅stream时有效
+
+class OptimizeRequest(BaseModel):
+    idea: str
+
+class ExportRequest(BaseModel):
+    content: str
+    format: str = "markdown"  # markdown | html | docx | pdf | zip（全部format打包）
+    title: str = ""
+
+async def plan_events(generate: PlanGenerator, idea: str, reference_url: str) -> AsyncIterator[Dict[str, Any]]:
+    """把流水线每次yield的累计content转成增量事件
+
+    - {"event": "delta", "text": ...}：追加到已收到的content末尾
+    - {"event": "replace", "text": ...}：整体替换（分段Generate按固定顺序重排时）
+    - {"event": "done", "status": ..., "plan": ..., "prompts": ..., "error": ...}：最终result
+    最后一次yield可能是后Process过的方案或error信息，只放在done事件里。
+    """
+    sent = ""
+    previous: Optional[str] = None
+    result: Tuple[str, str, Optional[str]] = ("", "", None)
+    error = ""
+    results = generate(idea, reference_url)
+    try:
+        async for result in results:
+            if previous is not None:
+                if previous.startswith(sent):
+                    if len(previous) > len(sent):
+                        yield {"event": "delta", "text": previous[len(sent):]}
+                else:
+                    yield {"event": "replace", "text": previous}
+                sent = previous
+            previous = result[0]
+    except GenerationError as e:
+        error = e.message
+    finally:
+        # 客户端断开时立即关闭流水线，not等垃圾回收
+        await results.aclose()
+
+    plan_text, prompts, _ = result
+    yield {
+        "event": "done",
+        "status": "failed" if error else "succeeded",
+        "plan": "" if error else plan_text,
+        "prompts": "" if error else prompts,
+        "error": error
+    }
+
+async def _last_event_unless_disconnected(events: AsyncIterator[Dict[str, Any]],
+                                          http_request: Request) -> Optional[Dict[str, Any]]:
+    """非streamrequest：收集最终事件；客户端中途断开时取消Generate，释放上游connection和并发名额"""
+    async def last() -> Dict[str, Any]:
+        event: Dict[str, Any] = {}
+        async for event in events:
+            pass
+        return event
+
+    task = asyncio.ensure_future(last())
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                logger.info("🛑 REST客户端已断开，取消Generate")
+                return None
+    finally:
+        if not task.done():
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        await events.aclose()
+
+def _content_disposition(title: str, extension: str) -> str:
+    """attachment头：ASCII后备filename + RFC 5987的UTF-8 filename*（中文标题等）
+
+    header值按latin-1编码，非ASCII字符只能出现在百分号编码的filename*里
+    """
+    title = title or "vibedoc_plan"
+    fallback = re.sub(r"[^A-Za-z0-9\-.]+", "_", title.encode("ascii", "ignore").decode("ascii")).strip("_.")
+    return (f"attachment; filename=\"{fallback or 'vibedoc_plan'}.{extension}\"; "
+            f"filename*=UTF-8''{quote(f'{title}.{extension}', safe='')}")
+
+def _api_key_checker(api_config: RestAPIConfig):
+    async def check_api_key(authorization: Optional[str] = Header(None),
+                            x_api_key: Optional[str] = Header(None)):
+        if not api_config.api_key:
+            return
+        token = x_api_key or ""
+        if not token and authorization and authorization.lower().startswith("bearer "):
+            token = authorization[7:].strip()
+        if not hmac.compare_digest(token.encode("utf-8"), api_config.api_key.encode("utf-8")):
+            raise HTTPException(status_code=401, detail="Invalid or missing API key")
+    return check_api_key
+
+def create_router(generate: PlanGenerator, api_config: RestAPIConfig) -> APIRouter:
+    """建立REST路由；generate由app注入，避免本module导入app
+
+    未Set api_key时只提供只读的/metrics和/usage：generate/optimize/export会消耗LLM额度或
+    服务器资源，not对匿名客户端开放
+    """
+    router = APIRouter(dependencies=[Depends(_api_key_checker(api_config))])
+    if api_config.api_key:
+        _add_generation_routes(router, generate)
+    else:
+        logger.warning("⚠️ 未Set REST_API_KEY，REST API只提供/metrics和/usage")
+
+    @router.get("/metrics")
+    def metrics():
+        """Prometheus抓取endpoint：LLM token用量和估算成本计数器"""
+        return Response(content=usage_tracker.render_prometheus(),
+                        media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    @router.get("/usage")
+    def usage():
+        return {"usage": usage_tracker.get_stats()}
+
+    return router
+
+def _add_generation_routes(router: APIRouter, generate: PlanGenerator):
+    """generate/optimize/export路由（需要API密钥）"""
+    @router.post("/generate")
+    async def generate_plan(request: GenerateRequest, http_request: Request):
+        events = plan_events(generate, request.idea, request.reference_url)
+        if not request.stream:
+            result = await _last_event_unless_disconnected(events, http_request)
+            if result is None:
+                return Response(status_code=499)
+            result.pop("event", None)
+            return result
+
+        if request.format == "sse":
+            async def sse() -> AsyncIterator[str]:
+                async for event in events:
+                    name = event.pop("event")
+                    yield f"event: {name}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+            return StreamingResponse(sse(), media_type="text/event-stream",
+                                     headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+        async def ndjson() -> AsyncIterator[str]:
+            async for event in events:
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    @router.post("/optimize")
+    async def optimize_idea(request: OptimizeRequest):
+        success, optimized_idea, suggestions = await prompt_optimizer.optimize_user_input_async(request.idea)
+        return {"success": success, "optimized_idea": optimized_idea, "suggestions": suggestions}
+
+    @router.post("/export")
+    def export_plan(request: ExportRequest):
+        # 同步函数：FastAPI放到线程池执行，docx/pdf渲染not阻塞事件循环
+        if request.format not in EXPORT_TYPES:
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {request.format}")
+        if request.format != "zip" and request.format not in export_manager.get_supported_formats():
+            raise HTTPException(status_code=501, detail=f"Export dependencies for {request.format} are not installed")
+
+        metadata = {"title": request.title} if request.title else None
+        try:
+            if request.format == "zip":
+                data = export_manager.create_multi_format_export(request.content, metadata=metadata)
+            else:
+                data = getattr(export_manager, f"export_to_{request.format}")(request.content, metadata)
+        except Exception as e:
+            logger.error(f"❌ REST Exportfailed: {e}")
+            return JSONResponse(status_code=500, content={"detail": f"Export failed: {e}"})
+
+        media_type, extension = EXPORT_TYPES[request.format]
+        return Response(
+            content=data.encode("utf-8") if isinstance(data, str) else data,
+            media_type=media_type,
+            headers={"Content-Disposition": _content_disposition(request.title, extension)}
+        )
+
+def create_server(demo: gr.Blocks, generate: PlanGenerator) -> FastAPI:
+    """REST路由 + 挂载在根path的Gradio UI"""
+    prefix = config.rest_api.prefix.rstrip("/")
+    server = FastAPI(title="VibeDoc API", docs_url=f"{prefix}/docs", openapi_url=f"{prefix}/openapi.json")
+    server.include_router(create_router(generate, config.rest_api), prefix=prefix)
+    paths = [route.path for route in server.routes if isinstance(route, APIRoute) and route.path.startswith(prefix + "/")]
+    logger.info(f"🔌 REST API 已挂载: {', '.join(paths)}")
+    return gr.mount_gradio_app(server, demo, path="", show_error=config.debug)
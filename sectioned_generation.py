@@ -0,0 +1,147 @@
+"""
+分段并行Generate
+把Development Plan拆成若干段落，每段一个独立的LLMCall并发执行，
+按固定顺序拼接，耗时取决于最慢的段落，总output也not再受单次max_tokens限制
+"""
+
+import asyncio
+import time
+import logging
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+
+from llm_client import stream_completion_with_continuation, CompletionChunk, CompletionStats
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_HEADING = "# AI编程助手tip词"
+
+@dataclass
+class PlanSection:
+    """Development Plan的一个段落"""
+    key: str
+    title: str
+    instruction: str
+
+# 拼接顺序即此列table顺序；tip词段落必须在最后，format_response按其title切分
+PLAN_SECTIONS: List[PlanSection] = [
+    PlanSection(
+        key="overview",
+        title="产品概述",
+        instruction="以项目名称作为一级title开头，output产品概述：产品定位、目标user、核心feature、差异化价值；"
+                    "如果有外部知识库参考，在此部分说明参考来源"
+    ),
+    PlanSection(
+        key="technical",
+        title="Technical Solution",
+        instruction="以 `## Technical Solution` 开头，output技术选型对比table格、系统架构图（Mermaid flowchart）、"
+                    "核心featuremodule划分及featureflowchart（Mermaid）、data设计"
+    ),
+    PlanSection(
+        key="schedule",
+        title="Development Plan",
+        instruction="以 `## Development Plan` 开头，output编号的开发阶段（第1阶段、第2阶段等）、"
+                    "项目甘特图（Mermaid gantt）、里程碑timetable，然后是部署方案和推广策略"
+    ),
+    PlanSection(
+        key="prompts",
+        title="AI编程助手tip词",
+        instruction=f"以 `{PROMPTS_HEADING}` 开头，为每个核心featuremoduleoutput一个专门的AI Coding Prompts"
+    ),
+]
+
+def build_section_request(request_data: dict, section: PlanSection) -> dict:
+    """基于完整request构造单个段落的request：系统tip词保持not变，只在usertip词末尾限定output范围"""
+    messages = [dict(message) for message in request_data["messages"]]
+    messages[-1]["content"] += (
+        f"\n\n⚠️ 本次只output「{section.title}」部分：{section.instruction}。"
+        f"其他部分由并行request负责，notto重复output，也notto加开场白或总结。"
+    )
+    return {**request_data, "messages": messages}
+
+def merge_sections(parts: Dict[str, str]) -> str:
+    """按PLAN_SECTIONS固定顺序拼接已Generate的段落"""
+    merged = []
+    for section in PLAN_SECTIONS:
+        text = parts.get(section.key, "").strip()
+        if not text:
+            continue
+        if section.key == "prompts" and PROMPTS_HEADING not in text:
+            text = f"{PROMPTS_HEADING}\n\n{text}"
+        merged.append(text)
+    return "\n\n".join(merged)
+
+class _SectionDone:
+    """段落结束标记"""
+
+    __slots__ = ("key", "error")
+
+    def __init__(self, key: str, error: Optional[BaseException] = None):
+        self.key = key
+        self.error = error
+
+async def stream_sectioned_completion(
+    request_data: dict,
+    api_url: Optional[str] = None,
+    api_key: Optional[str] = None,
+    stats: Optional[CompletionStats] = None,
+    timeout: Optional[float] = None
+) -> AsyncIterator[CompletionChunk]:
+    """并发Generate所有段落，按到达顺序yield带section标记的增量
+
+    任一段落failed时取消其余段落并抛出该error。
+    """
+    stats = stats if stats is not None else CompletionStats()
+    stats.model = request_data.get("model", "")
+    start = time.monotonic()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def run_section(section: PlanSection):
+        section_stats = CompletionStats(stage=stats.stage)
+        stats.sections[section.key] = section_stats
+        try:
+            async for chunk in stream_completion_with_continuation(
+                build_section_request(request_data, section), api_url, api_key, section_stats, timeout
+            ):
+                queue.put_nowait(CompletionChunk(chunk.delta, chunk.finish_reason, section.key))
+        except Exception as e:
+            queue.put_nowait(_SectionDone(section.key, e))
+        else:
+            queue.put_nowait(_SectionDone(section.key))
+
+    tasks = [asyncio.create_task(run_section(section)) for section in PLAN_SECTIONS]
+    logger.info(f"🧩 分段并行Generate: {len(tasks)} 个段落")
+    try:
+        pending = len(tasks)
+        while pending:
+            item = await queue.get()
+            if isinstance(item, _SectionDone):
+                pending -= 1
+                if item.error is not None:
+                    logger.error(f"❌ 段落 {item.key} Generatefailed: {item.error}")
+                    raise item.error
+                continue
+            if stats.first_token_time is None:
+                stats.first_token_time = time.monotonic() - start
+            stats.content_length += len(item.delta)
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        sections = stats.sections.values()
+        stats.status_code = max((s.status_code for s in sections), default=0)
+        stats.queue_wait = max((s.queue_wait for s in sections), default=0.0)
+        stats.prompt_tokens = sum(s.prompt_tokens for s in sections)
+        stats.completion_tokens = sum(s.completion_tokens for s in sections)
+        stats.usage_estimated = any(s.usage_estimated for s in sections)
+        stats.cost = sum(s.cost for s in sections)
+        stats.continuations = sum(s.continuations for s in sections)
+        stats.attempts = sum(s.attempts for s in sections)
+        stats.retries = sum(s.retries for s in sections)
+        stats.hedged = any(s.hedged for s in sections)
+        stats.endpoint = ", ".join(sorted({s.endpoint for s in sections if s.endpoint}))
+        truncated = any(s.finish_reason == "length" for s in sections)
+        stats.finish_reason = "length" if truncated else "stop"
+        stats.duration = time.monotonic() - start
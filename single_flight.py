@@ -0,0 +1,131 @@
+"""
+相同request合并（single-flight）
+同一key的Generate同时只执行一次：第一个调用方触发上游Call，并发的重复request挂到同一个
+进行中的result上，共享stream进度。上游在独立任务中运行，任一调用方离开not影响其他人；
+所有调用方都离开后才取消上游，释放LLMconnection和并发名额。
+调用方可以在not同的事件循环中（Gradio、REST、后台任务线程）
+"""
+
+import asyncio
+import threading
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class _Flight:
+    """一个进行中的上游Call（字段由SingleFlight._lock保护）"""
+
+    def __init__(self, key: str, loop: asyncio.AbstractEventLoop):
+        self.key = key
+        self.loop = loop
+        self.task: Optional[asyncio.Task] = None
+        self.latest: Any = None
+        self.version = 0
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers: Dict[int, Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = {}
+
+class SingleFlight:
+    """按key合并并发的stream Call
+
+    适用于每次yield都是累计快照的stream（如Generate流水线的部分方案）：
+    后加入或消费较慢的调用方只会收到最新快照，最终result一定会收到。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._stats = {"leaders": 0, "coalesced": 0, "abandoned": 0}
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """加入key对应的进行中Call，没有则用factory发起一个"""
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight(key, loop)
+                self._flights[key] = flight
+                self._stats["leaders"] += 1
+            else:
+                self._stats["coalesced"] += 1
+            flight.subscribers[id(wakeup)] = (loop, wakeup)
+        if leader:
+            flight.task = loop.create_task(self._run(flight, factory))
+        else:
+            logger.info(f"🔗 [{self.name}] 合并到进行中的相同request: {key[:16]}...（{len(flight.subscribers)} 个调用方）")
+
+        seen = 0
+        try:
+            while True:
+                with self._lock:
+                    version, latest, done, error = flight.version, flight.latest, flight.done, flight.error
+                if version != seen:
+                    seen = version
+                    yield latest
+                if done:
+                    if error is not None:
+                        raise error
+                    return
+                await wakeup.wait()
+                wakeup.clear()
+        finally:
+            with self._lock:
+                flight.subscribers.pop(id(wakeup), None)
+                abandoned = not flight.subscribers and not flight.done
+                if abandoned:
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+                    self._stats["abandoned"] += 1
+            if abandoned and flight.task is not None:
+                logger.info(f"🛑 [{self.name}] 所有调用方已离开，取消上游Call: {key[:16]}...")
+                self._call_soon(flight.loop, flight.task.cancel)
+
+    async def _run(self, flight: _Flight, factory: Callable[[], AsyncIterator[Any]]):
+        agen = factory()
+        try:
+            async for item in agen:
+                self._publish(flight, item)
+        except Exception as e:
+            with self._lock:
+                flight.error = e
+        finally:
+            try:
+                await agen.aclose()
+            finally:
+                self._publish(flight, None, done=True)
+
+    def _publish(self, flight: _Flight, item: Any, done: bool = False):
+        with self._lock:
+            if done:
+                flight.done = True
+                if self._flights.get(flight.key) is flight:
+                    del self._flights[flight.key]
+            else:
+                flight.latest = item
+                flight.version += 1
+            subscribers = list(flight.subscribers.values())
+        for loop, wakeup in subscribers:
+            self._call_soon(loop, wakeup.set)
+
+    @staticmethod
+    def _call_soon(loop: asyncio.AbstractEventLoop, callback: Callable[[], Any]):
+        try:
+            loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            pass  # 调用方的事件循环已关闭
+
+    def get_stats(self) -> Dict[str, Any]:
+        """合并statistics：leaders为实际发起的上游Call数，coalesced为被合并掉的重复request数"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+            stats["waiting_callers"] = sum(len(f.subscribers) for f in self._flights.values())
+        stats["name"] = self.name
+        return stats
+
+# 全局Generaterequest合并器
+generation_flights = SingleFlight("generation")
@@ -0,0 +1,6 @@
+"""pytest共用设置：测试直接导入仓库根目录下的module（与 python app.py 的导入方式一致）"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,125 @@
+"""AdmissionController：FIFO排队、队列上限、排队timeout，以及排队中被取消时归还slot"""
+
+import asyncio
+
+import pytest
+
+from admission_control import AdmissionController, AdmissionRejected
+
+
+def make_controller(max_in_flight: int = 1, max_queue: int = 10, queue_timeout: float = 5.0) -> AdmissionController:
+    return AdmissionController("test", max_in_flight=max_in_flight, max_queue=max_queue, queue_timeout=queue_timeout)
+
+
+def test_queued_requests_are_admitted_in_fifo_order():
+    async def main():
+        controller = make_controller()
+        order = []
+        gate = asyncio.Event()
+
+        async def holder():
+            async with controller.async_slot():
+                await gate.wait()
+
+        async def waiter(index: int):
+            async with controller.async_slot():
+                order.append(index)
+
+        first = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        waiters = []
+        for index in range(5):
+            waiters.append(asyncio.create_task(waiter(index)))
+            await asyncio.sleep(0)  # 按创建顺序入队
+        assert controller.get_metrics()["queue_depth"] == 5
+
+        gate.set()
+        await asyncio.gather(first, *waiters)
+        return order, controller.get_metrics()
+
+    order, metrics = asyncio.run(main())
+    assert order == [0, 1, 2, 3, 4]
+    assert metrics["in_flight"] == 0
+    assert metrics["admitted"] == 6
+
+
+def test_full_queue_rejects_immediately():
+    async def main():
+        controller = make_controller(max_queue=1)
+        async with controller.async_slot():
+            queued = asyncio.create_task(controller.async_slot().__aenter__())
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with controller.async_slot():
+                    pass
+            queued.cancel()
+            await asyncio.gather(queued, return_exceptions=True)
+        return rejected.value, controller.get_metrics()
+
+    error, metrics = asyncio.run(main())
+    assert error.reason == "queue_full"
+    assert metrics["rejected_queue_full"] == 1
+
+
+def test_queue_timeout_rejects_and_leaves_no_waiter():
+    async def main():
+        controller = make_controller(queue_timeout=0.05)
+        async with controller.async_slot():
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with controller.async_slot():
+                    pass
+        return rejected.value, controller.get_metrics()
+
+    error, metrics = asyncio.run(main())
+    assert error.reason == "timeout"
+    assert metrics["queue_depth"] == 0
+    assert metrics["in_flight"] == 0
+
+
+def test_cancel_while_queued_removes_the_waiter():
+    async def main():
+        controller = make_controller()
+        async with controller.async_slot():
+            queued = asyncio.create_task(controller.async_slot().__aenter__())
+            await asyncio.sleep(0)
+            assert controller.get_metrics()["queue_depth"] == 1
+            queued.cancel()
+            await asyncio.gather(queued, return_exceptions=True)
+            assert controller.get_metrics()["queue_depth"] == 0
+        return controller.get_metrics()
+
+    metrics = asyncio.run(main())
+    assert metrics["in_flight"] == 0
+
+
+def test_cancel_after_slot_was_handed_over_passes_it_on():
+    """release()已把slot移交给排队者、但它还没醒来就被取消：slot必须转给下一个，not能泄漏"""
+    async def main():
+        controller = make_controller()
+        admitted = []
+
+        async def waiter(index: int):
+            async with controller.async_slot():
+                admitted.append(index)
+
+        async with controller.async_slot():
+            cancelled = asyncio.create_task(waiter(0))
+            await asyncio.sleep(0)
+            second = asyncio.create_task(waiter(1))
+            await asyncio.sleep(0)
+        # 退出时slot已移交给waiter(0)；它醒来之前取消
+        cancelled.cancel()
+        await asyncio.gather(cancelled, second, return_exceptions=True)
+        return admitted, controller.get_metrics()
+
+    admitted, metrics = asyncio.run(main())
+    assert admitted == [1]
+    assert metrics["in_flight"] == 0
+    assert metrics["queue_depth"] == 0
+
+
+def test_sync_slot_shares_the_same_limit():
+    controller = make_controller(max_in_flight=2)
+    with controller.slot(), controller.slot():
+        assert not controller.has_capacity()
+    assert controller.has_capacity()
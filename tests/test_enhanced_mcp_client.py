@@ -0,0 +1,250 @@
+"""MCPSession：SSE事件按JSON-RPC id分发给对应的waiting中request，多个request共用一条会话；
+AsyncMCPClient：Call在后台事件循环中执行，调用方取消时request随之取消"""
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Dict, List
+
+import pytest
+
+import enhanced_mcp_client
+from async_runtime import background_loop
+from mcp_health import HALF_OPEN, mcp_health
+from config import MCPServiceConfig
+from enhanced_mcp_client import AsyncMCPClient, MCPSession
+
+ENDPOINT = "http://mcp.test/messages/?session_id=abc123"
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, body: Any = ""):
+        self.status_code = status_code
+        self._body = body
+        self.text = body if isinstance(body, str) else json.dumps(body)
+
+    def json(self):
+        return json.loads(self.text)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """已connection的会话：POST总是返回202，result由测试通过deliver()从"SSE"推送"""
+    session = MCPSession("http://mcp.test/sse", "Test MCP")
+    posted: List[Dict[str, Any]] = []
+
+    async def connect():
+        return ENDPOINT
+
+    async def async_request(method, url, json=None, **kwargs):
+        posted.append(json)
+        return FakeResponse(202)
+
+    monkeypatch.setattr(session, "_connect", connect)
+    monkeypatch.setattr(enhanced_mcp_client.http_transport, "async_request", async_request)
+    session.posted = posted
+    return session
+
+
+def deliver(session: MCPSession, message: Any, event: str = "message"):
+    endpoint = asyncio.get_running_loop().create_future()
+    endpoint.set_result(ENDPOINT)
+    session._dispatch(endpoint, event, message if isinstance(message, str) else json.dumps(message))
+
+
+async def wait_posted(session: MCPSession, count: int):
+    while len(session.posted) < count:
+        await asyncio.sleep(0)
+
+
+def test_endpoint_event_sets_post_url_and_session_id():
+    async def main():
+        session = MCPSession("http://mcp.test/sse", "Test MCP")
+        endpoint = asyncio.get_running_loop().create_future()
+        session._dispatch(endpoint, "endpoint", "/messages/?session_id=abc123")
+        return endpoint.result(), session.session_id
+
+    assert asyncio.run(main()) == (ENDPOINT, "abc123")
+
+
+def test_responses_are_routed_by_id_out_of_order(session):
+    async def main():
+        calls = [asyncio.create_task(session.request("tools/call", {"name": f"tool{i}"}, timeout=5)) for i in range(3)]
+        await wait_posted(session, 3)
+        ids = [body["id"] for body in session.posted]
+        assert len(set(ids)) == 3
+        for request_id in reversed(ids):
+            deliver(session, {"jsonrpc": "2.0", "id": request_id, "result": {"echo": request_id}})
+        results = await asyncio.gather(*calls)
+        return ids, results
+
+    ids, results = asyncio.run(main())
+    assert [data["result"]["echo"] for _, data in results] == ids
+    assert not session._pending
+
+
+def test_error_response_goes_to_its_own_caller(session):
+    async def main():
+        ok = asyncio.create_task(session.request("tools/call", {}, timeout=5))
+        broken = asyncio.create_task(session.request("tools/call", {}, timeout=5))
+        await wait_posted(session, 2)
+        ok_id, broken_id = (body["id"] for body in session.posted)
+        deliver(session, {"jsonrpc": "2.0", "id": broken_id, "error": {"code": -32602, "message": "bad args"}})
+        deliver(session, {"jsonrpc": "2.0", "id": ok_id, "result": {"content": []}})
+        return await ok, await broken
+
+    (ok_type, ok_data), (broken_type, broken_data) = asyncio.run(main())
+    assert ok_type == broken_type == "success"
+    assert "result" in ok_data
+    assert broken_data["error"]["message"] == "bad args"
+
+
+def test_unknown_ids_and_notifications_are_ignored(session):
+    async def main():
+        call = asyncio.create_task(session.request("tools/call", {}, timeout=5))
+        await wait_posted(session, 1)
+        deliver(session, {"jsonrpc": "2.0", "id": 999, "result": {}})
+        deliver(session, {"jsonrpc": "2.0", "method": "notifications/progress", "params": {}})
+        await asyncio.sleep(0)
+        assert not call.done()
+        deliver(session, {"jsonrpc": "2.0", "id": session.posted[0]["id"], "result": {"ok": True}})
+        return await call
+
+    assert asyncio.run(main())[1]["result"] == {"ok": True}
+
+
+def test_plain_text_result_only_matches_a_single_waiter(session):
+    async def main():
+        first = asyncio.create_task(session.request("tools/call", {}, timeout=5))
+        await wait_posted(session, 1)
+        deliver(session, "plain text result without an id")
+        first_result = await first
+
+        calls = [asyncio.create_task(session.request("tools/call", {}, timeout=0.2)) for _ in range(2)]
+        await wait_posted(session, 3)
+        deliver(session, "plain text result without an id")
+        return first_result, await asyncio.gather(*calls)
+
+    first_result, ambiguous = asyncio.run(main())
+    assert first_result == ("success", {"result": {"text": "plain text result without an id"}})
+    assert [result_type for result_type, _ in ambiguous] == ["timeout", "timeout"]
+
+
+def test_lost_connection_fails_every_waiting_request(session):
+    async def main():
+        calls = [asyncio.create_task(session.request("tools/call", {}, timeout=5)) for _ in range(2)]
+        await wait_posted(session, 2)
+        session._detach("SSE connection closed")
+        return await asyncio.gather(*calls)
+
+    assert asyncio.run(main()) == [("error", "SSE connection closed")] * 2
+
+
+def test_cancelled_caller_releases_its_request_id(session):
+    async def main():
+        call = asyncio.create_task(session.request("tools/call", {}, timeout=5))
+        await wait_posted(session, 1)
+        assert len(session._pending) == 1
+        call.cancel()
+        await asyncio.gather(call, return_exceptions=True)
+        return dict(session._pending)
+
+    assert asyncio.run(main()) == {}
+
+
+class FakeSession:
+    """记录request在哪个线程执行；tools/call阻塞到release()或被取消"""
+
+    def __init__(self):
+        self.session_id = "fake"
+        self.threads: List[str] = []
+        self.cancelled = threading.Event()
+        self.release = threading.Event()
+        self.discovery_started = threading.Event()
+        self.block_discovery = False
+
+    async def request(self, method: str, params: Dict[str, Any], timeout: float):
+        self.threads.append(threading.current_thread().name)
+        if method == "tools/list":
+            self.discovery_started.set()
+            while self.block_discovery:
+                await asyncio.sleep(0.01)
+            return "success", {"result": {"tools": [{"name": "fetch", "inputSchema": {}}]}}
+        try:
+            while not self.release.is_set():
+                await asyncio.sleep(0.01)
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        return "success", {"result": {"content": [{"type": "text", "text": "fetched page content"}]}}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = AsyncMCPClient()
+    client.mcp_services = {"test_service": MCPServiceConfig(name="Test MCP", url="http://mcp.test/sse")}
+    fake = FakeSession()
+    monkeypatch.setattr(client, "_session", lambda service_key: fake)
+    client.fake = fake
+    return client
+
+
+def test_call_tool_runs_on_background_loop_from_any_event_loop(client):
+    client.fake.release.set()
+    result = asyncio.run(client.call_tool("test_service", "fetch", {"url": "https://example.com"}, use_cache=False))
+    assert result.success and result.data == "fetched page content"
+    assert set(client.fake.threads) == {background_loop.name}
+
+
+def test_sync_facade_returns_result(client):
+    client.fake.release.set()
+    result = client.call_mcp_service_async("test_service", "fetch", {"url": "https://example.com"}, use_cache=False)
+    assert result.success
+
+
+def test_caller_cancellation_cancels_the_background_request(client):
+    async def main():
+        call = asyncio.create_task(client.call_tool("test_service", "fetch", {"url": "https://example.com"},
+                                                    use_cache=False))
+        await asyncio.sleep(0.1)
+        call.cancel()
+        await asyncio.gather(call, return_exceptions=True)
+
+    asyncio.run(main())
+    assert client.fake.cancelled.wait(1.0)
+
+
+def test_cancel_during_tool_discovery_returns_half_open_trial(client):
+    """试探Call在工具发现期间被取消（如知识获取被对冲取消）：试探名额必须归还"""
+    for _ in range(mcp_health.config.failure_threshold):
+        mcp_health.record_failure("test_service", "connection refused")
+    with mcp_health._lock:
+        mcp_health._services["test_service"].open_until = 0.0  # 熔断到期
+    client.fake.block_discovery = True
+
+    # 已经有一次工具发现在进行中（如启动时的discover_all），试探Call会waiting它
+    discovery = background_loop.submit(client.list_tools("test_service"))
+    assert client.fake.discovery_started.wait(1.0)
+
+    async def main():
+        call = asyncio.create_task(client.call_tool("test_service", "fetch", {"url": "https://example.com"},
+                                                    use_cache=False))
+        await asyncio.sleep(0.1)
+        assert not mcp_health.is_available("test_service")  # 试探进行中
+        assert len(client.fake.threads) == 1  # 还在waiting发现，tools/call未发出
+        call.cancel()
+        await asyncio.gather(call, return_exceptions=True)
+
+    try:
+        asyncio.run(main())
+        deadline = time.monotonic() + 1.0
+        while not mcp_health.is_available("test_service") and time.monotonic() < deadline:
+            time.sleep(0.01)
+        state = next(stats for stats in mcp_health.get_stats() if stats["service"] == "test_service")
+        assert state["breaker"] == HALF_OPEN
+        assert mcp_health.allow("test_service").trial
+    finally:
+        client.fake.block_discovery = False
+        discovery.result(1.0)
+        mcp_health.record_success("test_service", 0.0)
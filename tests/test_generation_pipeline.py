@@ -0,0 +1,211 @@
+"""参考link知识策略：wait/skip/hedge的waiting行为、hedge切换只记录一次request准备、放弃知识时在方案中tip"""
+
+import asyncio
+from typing import List
+
+import pytest
+
+import generation_pipeline
+from config import config, PipelineConfig
+from explanation_manager import ExplanationManager
+from llm_client import CompletionChunk
+
+IDEA = "一个帮助独立开发者管理待办事项的网页Apply"
+URL = "https://example.com/reference"
+KNOWLEDGE = "参考文档：使用看板视图组织任务"
+
+
+class FakeCompletion:
+    """替代stream_completion_with_continuation：记录每次request，首token在first_token被set后才返回"""
+
+    def __init__(self):
+        self.requests: List[dict] = []
+        self.closed = 0
+        self.first_token = asyncio.Event()
+
+    def __call__(self, request_data, stats=None):
+        self.requests.append(request_data)
+        return self._stream()
+
+    async def _stream(self):
+        try:
+            await self.first_token.wait()
+            yield CompletionChunk(delta="# 开发方案\n\n## 技术方案\n\n使用 FastAPI。")
+        finally:
+            self.closed += 1
+
+
+class FakeKnowledge:
+    """替代fetch_external_knowledge_async：arrive被set后返回knowledge"""
+
+    def __init__(self, knowledge: str = KNOWLEDGE):
+        self.knowledge = knowledge
+        self.arrive = asyncio.Event()
+        self.cancelled = False
+
+    async def __call__(self, reference_url: str) -> str:
+        try:
+            await self.arrive.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.knowledge
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """隔离缓存、相似创意索引和临时file，LLM与知识Get由测试控制"""
+    cached = []
+    monkeypatch.setattr(generation_pipeline.model_router, "has_configured_endpoint", lambda: True)
+    monkeypatch.setattr(generation_pipeline.plan_cache, "get", lambda key: None)
+    monkeypatch.setattr(generation_pipeline.plan_cache, "put", lambda *args: cached.append(args))
+    monkeypatch.setattr(generation_pipeline.idea_index, "find_similar", lambda idea, context: None)
+    monkeypatch.setattr(generation_pipeline.idea_index, "add", lambda idea, context, key: None)
+    monkeypatch.setattr(generation_pipeline, "create_temp_markdown_file", lambda text: None)
+    monkeypatch.setattr(config.pipeline, "sectioned_generation", False)
+    monkeypatch.setattr(config.pipeline, "knowledge_deadline", 0.05)
+    monkeypatch.setattr(config.ai_model, "stream", True)
+    completion = FakeCompletion()
+    knowledge = FakeKnowledge()
+    monkeypatch.setattr(generation_pipeline, "stream_completion_with_continuation", completion)
+    monkeypatch.setattr(generation_pipeline, "fetch_external_knowledge_async", knowledge)
+    return completion, knowledge, cached
+
+
+async def run_pipeline(trace: ExplanationManager) -> str:
+    final_plan = ""
+    async for plan, prompts, temp_file in generation_pipeline.run_generation_pipeline(IDEA, URL, trace):
+        final_plan = plan
+    return final_plan
+
+
+def step_titles(trace: ExplanationManager) -> List[str]:
+    return [step.title for step in trace.processing_steps]
+
+
+def knowledge_in(request_data: dict) -> bool:
+    return any(KNOWLEDGE in message["content"] for message in request_data["messages"])
+
+
+def test_default_strategy_waits_for_knowledge():
+    assert PipelineConfig().knowledge_strategy == "wait"
+
+
+def test_wait_strategy_ignores_deadline(monkeypatch):
+    monkeypatch.setattr(config.pipeline, "knowledge_strategy", "wait")
+    monkeypatch.setattr(config.pipeline, "knowledge_deadline", 0.01)
+
+    async def main():
+        async def slow_knowledge():
+            await asyncio.sleep(0.1)
+            return KNOWLEDGE
+
+        return await generation_pipeline.wait_for_knowledge(asyncio.create_task(slow_knowledge()))
+
+    assert asyncio.run(main()) == (KNOWLEDGE, "completed", None)
+
+
+def test_skip_strategy_cancels_late_knowledge(monkeypatch):
+    monkeypatch.setattr(config.pipeline, "knowledge_strategy", "skip")
+    monkeypatch.setattr(config.pipeline, "knowledge_deadline", 0.01)
+
+    async def main():
+        task = asyncio.create_task(asyncio.sleep(1.0, result=KNOWLEDGE))
+        result = await generation_pipeline.wait_for_knowledge(task)
+        await asyncio.sleep(0)
+        return result, task.cancelled()
+
+    assert asyncio.run(main()) == (("", "deadline_skipped", None), True)
+
+
+def test_hedge_strategy_keeps_retrieval_running(monkeypatch):
+    monkeypatch.setattr(config.pipeline, "knowledge_strategy", "hedge")
+    monkeypatch.setattr(config.pipeline, "knowledge_deadline", 0.01)
+
+    async def main():
+        task = asyncio.create_task(asyncio.sleep(0.1, result=KNOWLEDGE))
+        knowledge, mode, pending = await generation_pipeline.wait_for_knowledge(task)
+        assert (knowledge, mode, pending) == ("", "hedging", task)
+        return await pending
+
+    assert asyncio.run(main()) == KNOWLEDGE
+
+
+def test_knowledge_before_deadline_completes_under_every_strategy(monkeypatch):
+    for strategy in ("wait", "skip", "hedge"):
+        monkeypatch.setattr(config.pipeline, "knowledge_strategy", strategy)
+
+        async def main():
+            task = asyncio.create_task(asyncio.sleep(0, result=KNOWLEDGE))
+            return await generation_pipeline.wait_for_knowledge(task)
+
+        assert asyncio.run(main()) == (KNOWLEDGE, "completed", None)
+
+
+def test_hedge_won_switches_to_knowledge_call_and_records_one_prep_step(pipeline, monkeypatch):
+    completion, knowledge, cached = pipeline
+    monkeypatch.setattr(config.pipeline, "knowledge_strategy", "hedge")
+    trace = ExplanationManager()
+
+    async def main():
+        run = asyncio.create_task(run_pipeline(trace))
+        while not completion.requests:
+            await asyncio.sleep(0.01)
+        # 不带知识的Call已发出但还没有首token，此时知识到达
+        knowledge.arrive.set()
+        while len(completion.requests) < 2:
+            await asyncio.sleep(0.01)
+        completion.first_token.set()
+        return await run
+
+    final_plan = asyncio.run(main())
+    assert [knowledge_in(request) for request in completion.requests] == [False, True]
+    assert completion.closed == 2
+    assert step_titles(trace).count("AIrequest准备") == 1
+    assert "未参考" not in final_plan
+    assert len(cached) == 1
+
+
+def test_hedge_late_drops_knowledge_with_visible_notice(pipeline, monkeypatch):
+    completion, knowledge, cached = pipeline
+    monkeypatch.setattr(config.pipeline, "knowledge_strategy", "hedge")
+    completion.first_token.set()
+    trace = ExplanationManager()
+
+    final_plan = asyncio.run(run_pipeline(trace))
+    assert len(completion.requests) == 1 and not knowledge_in(completion.requests[0])
+    assert knowledge.cancelled
+    assert final_plan.startswith("> ⚠️")
+    assert URL in final_plan.splitlines()[0]
+    assert step_titles(trace).count("AIrequest准备") == 1
+    assert cached == []
+
+
+def test_skip_strategy_drops_knowledge_with_visible_notice(pipeline, monkeypatch):
+    completion, knowledge, cached = pipeline
+    monkeypatch.setattr(config.pipeline, "knowledge_strategy", "skip")
+    completion.first_token.set()
+
+    final_plan = asyncio.run(run_pipeline(ExplanationManager()))
+    assert knowledge.cancelled
+    assert final_plan.startswith("> ⚠️")
+    assert cached == []
+
+
+def test_wait_strategy_uses_knowledge_and_caches_plan(pipeline, monkeypatch):
+    completion, knowledge, cached = pipeline
+    monkeypatch.setattr(config.pipeline, "knowledge_strategy", "wait")
+    completion.first_token.set()
+
+    async def main():
+        run = asyncio.create_task(run_pipeline(ExplanationManager()))
+        # 超过deadline后才到达，wait策略仍然waiting
+        await asyncio.sleep(0.15)
+        assert not completion.requests
+        knowledge.arrive.set()
+        return await run
+
+    final_plan = asyncio.run(main())
+    assert len(completion.requests) == 1 and knowledge_in(completion.requests[0])
+    assert "未参考" not in final_plan
+    assert len(cached) == 1
@@ -0,0 +1,126 @@
+"""相似创意index：指纹对空白/标点稳定、阈值边界、上下文隔离、失效条目移除，以及从方案缓存恢复"""
+
+import sqlite3
+
+import idea_similarity
+from config import IdeaSimilarityConfig, PlanCacheConfig
+from idea_similarity import IdeaSimilarityIndex, simhash
+from plan_cache import PlanCache
+
+IDEA = "一个帮助独立开发者管理待办事项的网页应用, supports Kanban boards"
+CONTEXT = "context-a"
+
+
+def make_index(**overrides) -> IdeaSimilarityIndex:
+    settings = dict(max_distance=3)
+    settings.update(overrides)
+    return IdeaSimilarityIndex(IdeaSimilarityConfig(**settings))
+
+
+def make_cache(tmp_path, **overrides) -> PlanCache:
+    settings = dict(db_path=str(tmp_path / "plans.sqlite3"))
+    settings.update(overrides)
+    return PlanCache(PlanCacheConfig(**settings))
+
+
+def flip_bits(fingerprint: int, bits) -> int:
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def test_fingerprint_ignores_whitespace_punctuation_and_case():
+    variants = [
+        "  一个帮助独立开发者管理待办事项的网页应用，supports kanban boards!  ",
+        "一个 帮助 独立开发者 管理 待办事项 的 网页应用 supports\tKanban\nboards",
+        "一个帮助独立开发者管理待办事项的网页应用。。。SUPPORTS KANBAN BOARDS???",
+    ]
+    assert {simhash(variant) for variant in variants} == {simhash(IDEA)}
+    assert simhash(IDEA) != simhash("一个帮助设计师整理灵感素材的桌面工具")
+
+
+def test_band_lookup_matches_up_to_max_distance(monkeypatch):
+    index = make_index()
+    fingerprint = simhash(IDEA)
+    index.add_fingerprint(fingerprint, CONTEXT, "key", "preview")
+    band_bits = index.band_bits
+
+    def find(query_fingerprint: int):
+        monkeypatch.setattr(idea_similarity, "simhash", lambda user_idea: query_fingerprint)
+        return index.find_similar("query", CONTEXT)
+
+    # 3位差异分布在不同band：仍有一个band完全相同，距离恰好等于阈值
+    match = find(flip_bits(fingerprint, [0, band_bits, band_bits * 2]))
+    assert match is not None and match.cache_key == "key"
+    assert match.distance == index.max_distance == 3
+    assert match.similarity == round(1 - 3 / 64, 3)
+
+    # 4位差异：分散在4个band时没有同桶候选，集中在同一band时距离超过阈值
+    assert find(flip_bits(fingerprint, [0, band_bits, band_bits * 2, band_bits * 3])) is None
+    assert find(flip_bits(fingerprint, [0, 1, 2, 3])) is None
+
+
+def test_contexts_are_kept_apart():
+    index = make_index()
+    index.add(IDEA, CONTEXT, "key-a")
+    assert index.find_similar(IDEA, "context-b") is None
+    index.add(IDEA, "context-b", "key-b")
+    assert index.find_similar(IDEA, CONTEXT).cache_key == "key-a"
+    assert index.find_similar(IDEA, "context-b").cache_key == "key-b"
+
+
+def test_discard_removes_stale_key_and_ignores_unknown_keys():
+    index = make_index()
+    index.add(IDEA, CONTEXT, "stale")
+    index.discard("unknown")
+    assert len(index) == 1
+
+    index.discard("stale")
+    assert len(index) == 0
+    assert index.find_similar(IDEA, CONTEXT) is None
+    assert all(not bucket for bucket in index._buckets)
+    index.discard("stale")
+
+    # 同一创意重新Generate后可以再次加入
+    index.add(IDEA, CONTEXT, "fresh")
+    assert index.find_similar(IDEA, CONTEXT).cache_key == "fresh"
+
+
+def test_index_is_restored_from_plan_cache_after_restart(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("old", "plan", "prompts", None, simhash(IDEA), CONTEXT, "旧创意")
+    cache.put("new", "plan", "prompts", None, simhash("一个帮助设计师整理灵感素材的桌面工具"), CONTEXT, "新创意")
+    cache.put("legacy", "plan", "prompts", None)
+
+    # 模拟重启：新的缓存实例和空index
+    restarted = make_cache(tmp_path)
+    entries = restarted.idea_fingerprints()
+    assert [entry[0] for entry in entries] == ["old", "new"]
+    assert entries[0] == ("old", simhash(IDEA), CONTEXT, "旧创意")
+
+    index = make_index()
+    assert index.load(entries) == 2
+    match = index.find_similar(IDEA + "!!", CONTEXT)
+    assert match.cache_key == "old" and match.idea_preview == "旧创意"
+
+
+def test_expired_rows_are_not_restored(tmp_path):
+    cache = make_cache(tmp_path, ttl_seconds=-1)
+    cache.put("expired", "plan", "prompts", None, simhash(IDEA), CONTEXT, "preview")
+    assert cache.idea_fingerprints() == []
+
+
+def test_existing_plan_table_gains_fingerprint_columns(tmp_path):
+    db_path = tmp_path / "plans.sqlite3"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            CREATE TABLE plans (
+                key TEXT PRIMARY KEY, plan_text TEXT NOT NULL, prompts TEXT NOT NULL, file_path TEXT,
+                size_bytes INTEGER NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL
+            )
+        """)
+    conn.close()
+
+    cache = make_cache(tmp_path)
+    cache.put("key", "plan", "prompts", None, simhash(IDEA), CONTEXT, "preview")
+    assert cache.idea_fingerprints() == [("key", simhash(IDEA), CONTEXT, "preview")]
@@ -0,0 +1,172 @@
+"""JobQueue：带guard的claim、取消运行中任务、显式的successful/failedresult，以及按租约恢复中断任务"""
+
+import asyncio
+import os
+import sqlite3
+import time
+from typing import List
+
+import pytest
+
+from config import JobQueueConfig
+from job_queue import CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues: List[JobQueue] = []
+
+    def factory(**overrides) -> JobQueue:
+        settings = dict(enabled=True, db_path=os.path.join(tmp_path, "jobs.sqlite3"), workers=1,
+                        progress_interval=0.0, lease_seconds=3.0)
+        settings.update(overrides)
+        queue = JobQueue(JobQueueConfig(**settings))
+        queues.append(queue)
+        return queue
+
+    yield factory
+    for queue in queues:
+        queue.stop()
+
+
+def wait_for_status(queue: JobQueue, job_id: str, *statuses: str, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job.status in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} stayed {queue.get(job_id).status}, expected {statuses}")
+
+
+def set_lease(queue: JobQueue, job_id: str, owner: str, heartbeat_age: float, attempts: int = 1):
+    """模拟某个进程持有该任务，最后一次心跳在heartbeat_age秒前"""
+    with sqlite3.connect(queue.config.db_path) as conn:
+        conn.execute("UPDATE jobs SET status = ?, owner = ?, heartbeat_at = ?, attempts = ? WHERE job_id = ?",
+                     (RUNNING, owner, time.time() - heartbeat_age, attempts, job_id))
+
+
+async def finished_plan(idea: str, reference_url: str):
+    yield "partial", "", None
+    yield f"plan for {idea}", "", None  # 没有prompts也是successful
+
+
+async def failing_plan(idea: str, reference_url: str):
+    yield "partial", "", None
+    raise RuntimeError("❌ API request failed")
+
+
+class BlockingPlan:
+    """一直not结束的流水线，记录是否被关闭"""
+
+    def __init__(self):
+        self.started = 0
+        self.closed = 0
+
+    async def __call__(self, idea: str, reference_url: str):
+        self.started += 1
+        try:
+            yield "working", "", None
+            await asyncio.sleep(60)
+            yield "never", "", None
+        finally:
+            self.closed += 1
+
+
+def test_claim_is_exclusive_across_processes(make_queue):
+    first, second = make_queue(), make_queue()
+    job = first.submit("idea")
+    claimed = first._claim()
+    assert claimed.job_id == job.job_id and claimed.status == RUNNING
+    assert second._claim() is None
+    assert first.get_stats()["owner"] != second.get_stats()["owner"]
+
+
+def test_claim_skips_job_cancelled_while_queued(make_queue):
+    queue = make_queue()
+    job = queue.submit("idea")
+    assert queue.cancel(job.job_id).status == CANCELLED
+    assert queue._claim() is None
+
+
+def test_completed_job_reports_explicit_success(make_queue):
+    queue = make_queue()
+    queue.start(finished_plan)
+    job = wait_for_status(queue, queue.submit("todo app").job_id, SUCCEEDED, FAILED)
+    assert job.status == SUCCEEDED
+    assert job.plan_text == "plan for todo app"
+    assert job.error == ""
+
+
+def test_runner_exception_marks_job_failed(make_queue):
+    queue = make_queue()
+    queue.start(failing_plan)
+    job = wait_for_status(queue, queue.submit("todo app").job_id, SUCCEEDED, FAILED)
+    assert job.status == FAILED
+    assert job.error == "❌ API request failed"
+
+
+def test_cancel_interrupts_running_job_immediately(make_queue):
+    queue, runner = make_queue(), BlockingPlan()
+    queue.start(runner)
+    job_id = queue.submit("idea").job_id
+    wait_for_status(queue, job_id, RUNNING)
+    time.sleep(0.1)
+
+    started = time.monotonic()
+    queue.cancel(job_id)
+    job = wait_for_status(queue, job_id, CANCELLED, SUCCEEDED, FAILED)
+    assert job.status == CANCELLED
+    assert time.monotonic() - started < 1.0
+    assert runner.closed == 1
+
+
+def test_cancel_after_completion_keeps_result(make_queue):
+    queue = make_queue()
+    queue.start(finished_plan)
+    job_id = queue.submit("idea").job_id
+    wait_for_status(queue, job_id, SUCCEEDED)
+    assert queue.cancel(job_id).status == SUCCEEDED
+
+
+def test_cancel_from_another_process_stops_job_on_next_heartbeat(make_queue):
+    owner, other, runner = make_queue(), make_queue(), BlockingPlan()
+    owner.start(runner)
+    job_id = owner.submit("idea").job_id
+    wait_for_status(owner, job_id, RUNNING)
+
+    other.cancel(job_id)
+    job = wait_for_status(owner, job_id, CANCELLED, SUCCEEDED, FAILED, timeout=owner.config.lease_seconds)
+    assert job.status == CANCELLED
+    assert runner.closed == 1
+
+
+def test_recover_leaves_live_leases_alone(make_queue):
+    queue = make_queue()
+    job = queue.submit("idea")
+    set_lease(queue, job.job_id, "other-host:1:live", heartbeat_age=0.5)
+    queue._recover()
+    assert queue.get(job.job_id).status == RUNNING
+
+
+def test_recover_requeues_expired_lease_then_gives_up(make_queue):
+    queue = make_queue(max_attempts=2)
+    retry, exhausted = queue.submit("retry"), queue.submit("exhausted")
+    set_lease(queue, retry.job_id, "dead-host:1:gone", heartbeat_age=10, attempts=1)
+    set_lease(queue, exhausted.job_id, "dead-host:1:gone", heartbeat_age=10, attempts=2)
+    queue._recover()
+    assert queue.get(retry.job_id).status == QUEUED
+    assert queue.get(exhausted.job_id).status == FAILED
+
+
+def test_stop_requeues_running_job_without_spending_an_attempt(make_queue):
+    queue, runner = make_queue(), BlockingPlan()
+    queue.start(runner)
+    job_id = queue.submit("idea").job_id
+    wait_for_status(queue, job_id, RUNNING)
+    time.sleep(0.1)
+    queue.stop()
+    job = queue.get(job_id)
+    assert job.status == QUEUED
+    assert job.attempts == 0
+    assert runner.closed == 1
@@ -0,0 +1,134 @@
+"""自动续写：重叠去重（短于min_overlap、长于缓冲窗口）、续写次数上限和token预算"""
+
+import asyncio
+from typing import List
+
+import pytest
+
+import llm_client
+from llm_client import (
+    CONTINUATION_PROMPT, MIN_CONTINUATION_TOKENS, OVERLAP_WINDOW, CompletionChunk, CompletionStats,
+    stream_completion_with_continuation, strip_overlap
+)
+
+REQUEST = {"model": "test", "messages": [{"role": "user", "content": "写一份方案"}], "max_tokens": 1000}
+
+
+def test_strip_overlap_removes_repeated_prefix():
+    previous = "第一段content。The quick brown fox jumps"
+    assert strip_overlap(previous, "brown fox jumps over the lazy dog") == " over the lazy dog"
+
+
+def test_strip_overlap_keeps_overlap_shorter_than_min_overlap():
+    # 末尾只重复了"fox"，短于min_overlap时视为巧合，不去掉
+    assert strip_overlap("the quick fox", "fox runs away") == "fox runs away"
+    assert strip_overlap("the quick fox", "fox runs away", min_overlap=3) == " runs away"
+
+
+def test_strip_overlap_ignores_overlap_beyond_max_overlap():
+    previous = "x" * 10 + "y" * 600
+    continuation = "y" * 600 + "tail"
+    # 超过max_overlap的重复无法识别，只去掉最多max_overlap个字符
+    assert strip_overlap(previous, continuation, max_overlap=500) == "y" * 100 + "tail"
+
+
+class FakeRounds:
+    """替代stream_chat_completion：第n次request按rounds[n]分块output并设置finish_reason和用量"""
+
+    def __init__(self, rounds: List[tuple]):
+        self.rounds = rounds
+        self.requests: List[dict] = []
+
+    async def __call__(self, request_data, api_url=None, api_key=None, stats=None, timeout=None):
+        index = len(self.requests)
+        self.requests.append(request_data)
+        chunks, finish_reason, completion_tokens = self.rounds[index]
+        for position, delta in enumerate(chunks):
+            last = position == len(chunks) - 1
+            if last:
+                stats.finish_reason = finish_reason
+                stats.completion_tokens = completion_tokens
+            yield CompletionChunk(delta=delta, finish_reason=finish_reason if last else None)
+
+
+def split(text: str, size: int = 50) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def run_continuation(monkeypatch, rounds: List[tuple], **kwargs):
+    fake = FakeRounds(rounds)
+    monkeypatch.setattr(llm_client, "stream_chat_completion", fake)
+    stats = CompletionStats()
+
+    async def main():
+        return [chunk async for chunk in stream_completion_with_continuation(REQUEST, stats=stats, **kwargs)]
+
+    chunks = asyncio.run(main())
+    return "".join(chunk.delta for chunk in chunks), stats, fake
+
+
+def test_continues_after_length_and_strips_overlap(monkeypatch):
+    first = "甲" * 300 + "重叠部分的content在这里"
+    second = "重叠部分的content在这里" + "乙" * 300
+    text, stats, fake = run_continuation(monkeypatch, [
+        (split(first), "length", 300),
+        (split(second), "stop", 300),
+    ], token_budget=5000, max_continuations=3)
+
+    assert text == "甲" * 300 + "重叠部分的content在这里" + "乙" * 300
+    assert stats.continuations == 1
+    assert stats.finish_reason == "stop"
+    assert stats.completion_tokens == 600
+    continuation = fake.requests[1]["messages"]
+    assert continuation[-2] == {"role": "assistant", "content": first}
+    assert continuation[-1]["content"] == CONTINUATION_PROMPT
+
+
+def test_overlap_longer_than_head_buffer_is_still_stripped(monkeypatch):
+    overlap = "".join(f"第{i}行重复content。" for i in range(25))
+    assert OVERLAP_WINDOW < len(overlap) < llm_client.OVERLAP_MAX
+    first = "开头" * 50 + overlap
+    second = overlap + "新content结尾"
+    text, stats, _ = run_continuation(monkeypatch, [
+        (split(first), "length", 300),
+        (split(second, 30), "stop", 300),
+    ], token_budget=5000, max_continuations=3)
+
+    assert text == first + "新content结尾"
+
+
+def test_short_accidental_overlap_is_kept(monkeypatch):
+    text, _, _ = run_continuation(monkeypatch, [
+        (["结尾是abc"], "length", 300),
+        (["abc开头的续写"], "stop", 300),
+    ], token_budget=5000, max_continuations=3)
+    assert text == "结尾是abcabc开头的续写"
+
+
+def test_stops_when_max_continuations_exhausted(monkeypatch):
+    rounds = [([f"第{i}轮" + "字" * 20], "length", 300) for i in range(5)]
+    text, stats, fake = run_continuation(monkeypatch, rounds, token_budget=100000, max_continuations=2)
+
+    assert len(fake.requests) == 3
+    assert stats.continuations == 2
+    assert stats.finish_reason == "length"
+    assert text.startswith("第0轮") and "第2轮" in text and "第3轮" not in text
+
+
+@pytest.mark.parametrize("used, continued", [
+    (1000 - MIN_CONTINUATION_TOKENS, True),
+    (1000 - MIN_CONTINUATION_TOKENS + 1, False),
+])
+def test_token_budget_stops_continuation_early(monkeypatch, used, continued):
+    rounds = [(["第一轮content"], "length", used), (["第二轮content"], "stop", 100)]
+    text, stats, fake = run_continuation(monkeypatch, rounds, token_budget=1000, max_continuations=3)
+
+    assert len(fake.requests) == (2 if continued else 1)
+    assert stats.continuations == (1 if continued else 0)
+    if continued:
+        # 续写request的max_tokens不超过剩余预算
+        assert fake.requests[1]["max_tokens"] == MIN_CONTINUATION_TOKENS
+        assert text == "第一轮content第二轮content"
+    else:
+        assert text == "第一轮content"
+        assert stats.finish_reason == "length"
@@ -0,0 +1,129 @@
+"""MCPHealthMonitor熔断器：连续failed熔断、到期后只放行一个试探Call、试探result决定恢复或加倍熔断"""
+
+import time
+
+from config import MCPHealthConfig
+from mcp_health import CLOSED, HALF_OPEN, OPEN, MCPHealthMonitor
+
+
+def make_monitor(**overrides) -> MCPHealthMonitor:
+    settings = dict(enabled=False, failure_threshold=3, open_seconds=0.1, max_open_seconds=1.0)
+    settings.update(overrides)
+    monitor = MCPHealthMonitor(MCPHealthConfig(**settings))
+    monitor.register("svc", "Test MCP")
+    return monitor
+
+
+def breaker(monitor: MCPHealthMonitor) -> dict:
+    return monitor.get_stats()[0]
+
+
+def trip(monitor: MCPHealthMonitor):
+    for _ in range(monitor.config.failure_threshold):
+        assert monitor.allow("svc")
+        monitor.record_failure("svc", "connection refused")
+
+
+def test_trips_after_consecutive_failures_and_rejects_calls():
+    monitor = make_monitor()
+    for _ in range(2):
+        monitor.record_failure("svc", "boom")
+    assert breaker(monitor)["breaker"] == CLOSED
+    monitor.record_failure("svc", "boom")
+    assert breaker(monitor)["breaker"] == OPEN
+    assert not monitor.allow("svc")
+    assert not monitor.is_available("svc")
+    assert breaker(monitor)["rejected"] == 1
+
+
+def test_success_resets_failure_streak():
+    monitor = make_monitor()
+    monitor.record_failure("svc", "boom")
+    monitor.record_failure("svc", "boom")
+    monitor.record_success("svc", 0.1)
+    monitor.record_failure("svc", "boom")
+    assert breaker(monitor)["breaker"] == CLOSED
+
+
+def test_half_open_allows_a_single_trial_call():
+    monitor = make_monitor()
+    trip(monitor)
+    time.sleep(0.15)
+    assert monitor.is_available("svc")
+    assert monitor.allow("svc").trial
+    assert breaker(monitor)["breaker"] == HALF_OPEN
+    # 试探Call进行中：其他Call继续被拒绝
+    assert not monitor.allow("svc")
+    assert not monitor.is_available("svc")
+
+
+def test_successful_trial_closes_breaker():
+    monitor = make_monitor()
+    trip(monitor)
+    time.sleep(0.15)
+    permit = monitor.allow("svc")
+    monitor.record_success("svc", 0.2, permit)
+    state = breaker(monitor)
+    assert state["breaker"] == CLOSED and state["status"] == "healthy"
+    assert monitor.allow("svc") and monitor.allow("svc")
+
+
+def test_failed_trial_reopens_with_doubled_duration():
+    monitor = make_monitor(open_seconds=0.3)
+    trip(monitor)
+    first_open = breaker(monitor)["open_for"]
+    time.sleep(0.35)
+    permit = monitor.allow("svc")
+    monitor.record_failure("svc", "still down", permit)
+    state = breaker(monitor)
+    assert state["breaker"] == OPEN
+    assert state["open_for"] > first_open
+    assert not monitor.allow("svc")
+
+
+def test_released_trial_lets_next_caller_probe():
+    """试探Call被取消、没有得出result时归还名额，not会永远卡在半开"""
+    monitor = make_monitor()
+    trip(monitor)
+    time.sleep(0.15)
+    permit = monitor.allow("svc")
+    monitor.release("svc", permit)
+    assert breaker(monitor)["breaker"] == HALF_OPEN
+    assert monitor.allow("svc")
+
+
+def test_call_admitted_while_closed_cannot_end_another_trial():
+    """熔断前放行的普通Call在半开期间被取消或failed：not能清掉别人的试探名额，也not算试探result"""
+    monitor = make_monitor()
+    early = monitor.allow("svc")
+    assert early.trial == 0
+    trip(monitor)
+    time.sleep(0.15)
+    trial = monitor.allow("svc")
+    assert trial.trial
+
+    monitor.release("svc", early)
+    assert not monitor.allow("svc")
+    monitor.record_failure("svc", "late failure", early)
+    assert breaker(monitor)["breaker"] == HALF_OPEN
+    assert not monitor.allow("svc")
+
+    monitor.record_success("svc", 0.1, trial)
+    assert breaker(monitor)["breaker"] == CLOSED
+
+
+def test_stale_trial_permit_cannot_release_a_newer_trial():
+    monitor = make_monitor()
+    trip(monitor)
+    time.sleep(0.15)
+    first = monitor.allow("svc")
+    monitor.record_failure("svc", "probe failed")  # 后台探测failed：重新熔断，第一次试探作废
+    assert breaker(monitor)["breaker"] == OPEN
+    time.sleep(0.25)
+    second = monitor.allow("svc")
+    assert second.trial > first.trial
+
+    monitor.release("svc", first)
+    assert not monitor.allow("svc")
+    monitor.release("svc", second)
+    assert monitor.allow("svc")
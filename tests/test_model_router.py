@@ -0,0 +1,104 @@
+"""ModelRouter：连续failed/error率摘除、到期恢复、再次摘除加倍，以及全部摘除时fail-open"""
+
+import time
+
+import pytest
+
+from config import ModelEndpointConfig, ModelRouterConfig
+from model_router import ModelRouter, NoEndpointAvailable
+
+
+def endpoint(name: str, weight: float = 1.0, max_concurrency: int = 8) -> ModelEndpointConfig:
+    return ModelEndpointConfig(name=name, api_url=f"http://{name}/v1/chat/completions", api_key="key",
+                               model_name="model", weight=weight, max_concurrency=max_concurrency)
+
+
+def make_router(*endpoints: ModelEndpointConfig, **overrides) -> ModelRouter:
+    settings = dict(eject_consecutive_failures=3, ejection_seconds=0.3, max_ejection_seconds=5.0)
+    settings.update(overrides)
+    return ModelRouter(list(endpoints), ModelRouterConfig(**settings))
+
+
+def routed_name(router: ModelRouter, status_code: int = None, fail: bool = False) -> str:
+    with router.route() as ticket:
+        if fail:
+            ticket.failed(status_code)
+        else:
+            ticket.first_token()
+            ticket.succeeded()
+        return ticket.endpoint.name
+
+
+def stats_for(router: ModelRouter, name: str) -> dict:
+    return next(stats for stats in router.get_stats() if stats["name"] == name)
+
+
+def test_consecutive_failures_eject_endpoint_and_traffic_moves():
+    # 权重足够大，摘除前failed的endpoint仍然优先
+    router = make_router(endpoint("primary", weight=100), endpoint("backup"))
+    for _ in range(3):
+        assert routed_name(router, fail=True) == "primary"
+    assert stats_for(router, "primary")["ejected"]
+    assert routed_name(router) == "backup"
+
+
+def test_client_errors_do_not_count_against_endpoint():
+    router = make_router(endpoint("primary", weight=10), endpoint("backup"))
+    for _ in range(5):
+        routed_name(router, status_code=400, fail=True)
+    primary = stats_for(router, "primary")
+    assert not primary["ejected"]
+    assert primary["consecutive_failures"] == 0
+
+
+def test_error_rate_ejects_even_without_consecutive_streak():
+    router = make_router(endpoint("primary"), eject_consecutive_failures=100, eject_min_requests=4,
+                         eject_error_rate=0.5, ewma_alpha=0.5)
+    for fail in (True, False, True, True):
+        routed_name(router, fail=fail)
+    assert stats_for(router, "primary")["ejected"]
+
+
+def test_ejected_endpoint_recovers_and_backs_off_on_repeat_failure():
+    # 只看连续failed摘除；error率摘除由上一个测试覆盖
+    router = make_router(endpoint("primary"), eject_error_rate=2.0)
+    for _ in range(3):
+        routed_name(router, fail=True)
+    first_ejection = stats_for(router, "primary")["ejected_for"]
+    assert first_ejection > 0
+
+    time.sleep(0.35)
+    assert not stats_for(router, "primary")["ejected"]
+    # 恢复后处于半健康状态：一次failed即再次摘除，时长加倍
+    routed_name(router, fail=True)
+    primary = stats_for(router, "primary")
+    assert primary["ejected"]
+    assert primary["ejected_for"] > first_ejection
+
+    time.sleep(0.65)
+    routed_name(router)
+    assert stats_for(router, "primary")["consecutive_failures"] == 0
+    # successful后重置摘除次数：要重新连续failed才摘除，且回到基础时长
+    routed_name(router, fail=True)
+    assert not stats_for(router, "primary")["ejected"]
+    routed_name(router, fail=True)
+    routed_name(router, fail=True)
+    assert 0 < stats_for(router, "primary")["ejected_for"] <= first_ejection
+
+
+def test_all_ejected_fails_open_to_earliest_recovery():
+    router = make_router(endpoint("a"), endpoint("b"), eject_consecutive_failures=1)
+    routed_name(router, fail=True)
+    routed_name(router, fail=True)
+    assert all(stats["ejected"] for stats in router.get_stats())
+    earliest = min(router.get_stats(), key=lambda stats: stats["ejected_for"])["name"]
+    assert routed_name(router) == earliest
+
+
+def test_full_endpoints_raise_no_endpoint_available():
+    router = make_router(endpoint("only", max_concurrency=1))
+    with router.route():
+        with pytest.raises(NoEndpointAvailable):
+            with router.route():
+                pass
+    assert stats_for(router, "only")["in_flight"] == 0
@@ -0,0 +1,119 @@
+"""PromptAssembler.assemble：预算内原样组装、超预算时先压缩知识再按大小截断、静态部分自身超预算"""
+
+import logging
+
+from config import PipelineConfig
+from prompt_assembler import PromptAssembler, TRUNCATION_NOTICE, estimate_tokens
+
+SYSTEM = "You are a product architect."  # 7 tokens
+TEMPLATE = "Idea: {idea}\nNotes: {notes}\nReference:\n{knowledge}"
+MAX_OUTPUT = 1000
+
+
+def make_assembler(budget: int, max_knowledge_tokens: int = 3000) -> PromptAssembler:
+    """input_budget(MAX_OUTPUT) == budget"""
+    return PromptAssembler(PipelineConfig(context_window=budget + MAX_OUTPUT, context_margin=0,
+                                          max_knowledge_tokens=max_knowledge_tokens))
+
+
+def words(count: int, word: str = "word") -> str:
+    """count个"word "，每个约5/4个token"""
+    return " ".join([word] * count)
+
+
+def knowledge_text(paragraphs: int) -> str:
+    return "\n\n".join(
+        f"## Section {index}\nFirst sentence of section {index}. " + words(60, "detail")
+        for index in range(paragraphs)
+    )
+
+
+def test_under_budget_keeps_every_part_verbatim():
+    assembler = make_assembler(budget=2000)
+    parts = {"idea": "A todo app for indie developers", "notes": "Use FastAPI", "knowledge": knowledge_text(2)}
+    prompt = assembler.assemble(SYSTEM, TEMPLATE, parts, MAX_OUTPUT)
+
+    assert prompt.trimmed == {}
+    assert prompt.user_prompt == TEMPLATE.format(**parts)
+    assert prompt.system_prompt == SYSTEM
+    assert prompt.budget == 2000
+    assert prompt.input_tokens == estimate_tokens(SYSTEM) + estimate_tokens(prompt.user_prompt)
+    assert set(prompt.part_tokens) == {"system", "template", "idea", "notes", "knowledge"}
+    assert prompt.part_tokens["knowledge"] == estimate_tokens(parts["knowledge"])
+
+
+def test_knowledge_is_capped_even_when_under_budget():
+    assembler = make_assembler(budget=5000, max_knowledge_tokens=100)
+    knowledge = knowledge_text(6)
+    prompt = assembler.assemble(SYSTEM, TEMPLATE, {"idea": "idea", "notes": "", "knowledge": knowledge}, MAX_OUTPUT)
+
+    assert list(prompt.trimmed) == ["knowledge"]
+    assert prompt.part_tokens["knowledge"] <= 100
+    # 抽取式摘要保留各段title
+    assert "## Section 0" in prompt.user_prompt and "## Section 5" in prompt.user_prompt
+    assert prompt.trimmed["knowledge"] == f"{estimate_tokens(knowledge)} → {prompt.part_tokens['knowledge']}"
+
+
+def test_over_budget_condenses_knowledge_before_other_parts():
+    assembler = make_assembler(budget=400)
+    idea = "A todo app for indie developers with kanban boards"
+    parts = {"idea": idea, "notes": "Use FastAPI", "knowledge": knowledge_text(6)}
+    prompt = assembler.assemble(SYSTEM, TEMPLATE, parts, MAX_OUTPUT)
+
+    # 只压缩知识就能放进预算，Idea Description和其他部分保持原样
+    assert list(prompt.trimmed) == ["knowledge"]
+    assert prompt.input_tokens <= prompt.budget
+    assert prompt.user_prompt.startswith(f"Idea: {idea}\nNotes: Use FastAPI\n")
+
+
+def test_over_budget_truncates_remaining_parts_largest_first():
+    assembler = make_assembler(budget=300, max_knowledge_tokens=50)
+    notes = "\n".join(words(10, "note") for _ in range(30))  # 最大的可变部分
+    idea = words(40, "idea")
+    parts = {"idea": idea, "notes": notes, "knowledge": knowledge_text(6)}
+    prompt = assembler.assemble(SYSTEM, TEMPLATE, parts, MAX_OUTPUT)
+
+    # 先按知识上限压缩，再截断最大的notes；Idea Description较小，截断notes后已放得下
+    assert list(prompt.trimmed) == ["knowledge", "notes"]
+    assert prompt.input_tokens <= prompt.budget
+    assert f"Idea: {idea}\n" in prompt.user_prompt
+    assert TRUNCATION_NOTICE in prompt.user_prompt
+    original_notes = estimate_tokens(notes)
+    assert prompt.trimmed["notes"] == f"{original_notes} → {prompt.part_tokens['notes']}"
+    assert prompt.part_tokens["notes"] < original_notes
+
+
+def test_idea_is_truncated_last_when_it_is_the_largest_remaining_part():
+    assembler = make_assembler(budget=150, max_knowledge_tokens=20)
+    idea = "\n".join(words(10, "idea") for _ in range(20))
+    parts = {"idea": idea, "notes": "short", "knowledge": knowledge_text(3)}
+    prompt = assembler.assemble(SYSTEM, TEMPLATE, parts, MAX_OUTPUT)
+
+    assert list(prompt.trimmed) == ["knowledge", "idea"]
+    assert prompt.input_tokens <= prompt.budget
+    assert "Notes: short\n" in prompt.user_prompt
+
+
+def test_static_parts_over_budget_leave_variable_parts_alone(caplog):
+    assembler = make_assembler(budget=50, max_knowledge_tokens=3000)
+    system = words(100, "rule")  # 约125 tokens，单独就超过预算
+    parts = {"idea": "A todo app for indie developers", "notes": "Use FastAPI", "knowledge": "Short reference."}
+
+    with caplog.at_level(logging.WARNING, logger="prompt_assembler"):
+        prompt = assembler.assemble(system, TEMPLATE, parts, MAX_OUTPUT)
+
+    # 压缩parts无法让tip词放进预算，不应毁掉user的Idea Description
+    assert prompt.trimmed == {}
+    assert prompt.user_prompt == TEMPLATE.format(**parts)
+    assert prompt.input_tokens > prompt.budget
+    assert any("超出预算" in record.getMessage() for record in caplog.records)
+
+
+def test_static_parts_over_budget_still_apply_knowledge_cap():
+    assembler = make_assembler(budget=50, max_knowledge_tokens=40)
+    system = words(100, "rule")
+    knowledge = knowledge_text(4)
+    prompt = assembler.assemble(system, TEMPLATE, {"idea": "idea", "notes": "", "knowledge": knowledge}, MAX_OUTPUT)
+
+    assert list(prompt.trimmed) == ["knowledge"]
+    assert prompt.part_tokens["knowledge"] <= 40
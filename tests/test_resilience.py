@@ -0,0 +1,240 @@
+"""ResiliencePolicy：retry条件、Retry-After、退避超出deadline时放弃、总deadline，以及对冲request"""
+
+import asyncio
+import time
+from typing import List
+
+import httpx
+import pytest
+
+import resilience
+from admission_control import AdmissionController
+from config import LLMResilienceConfig
+from llm_client import LLMError
+from resilience import AttemptOutcome, DeadlineExceeded, ResiliencePolicy
+
+
+def make_policy(**overrides) -> ResiliencePolicy:
+    settings = dict(max_attempts=3, backoff_base=0.01, backoff_max=0.02, deadline=5.0)
+    settings.update(overrides)
+    return ResiliencePolicy("test", LLMResilienceConfig(**settings))
+
+
+def attempts_failing_with(errors: List[BaseException]):
+    """第n次attempt抛出errors[n]，用完后正常output两个item"""
+    started = []
+
+    def start_attempt(remaining: float):
+        index = len(started)
+        started.append(remaining)
+
+        async def attempt():
+            if index < len(errors):
+                raise errors[index]
+            yield "a"
+            yield "b"
+        return attempt()
+    return start_attempt, started
+
+
+async def collect(policy: ResiliencePolicy, start_attempt, outcome: AttemptOutcome = None) -> List[str]:
+    return [item async for item in policy.stream(start_attempt, outcome)]
+
+
+def test_retries_retryable_status_then_succeeds():
+    policy = make_policy()
+    start_attempt, started = attempts_failing_with([LLMError(503, "busy"), httpx.ConnectError("reset")])
+    outcome = AttemptOutcome()
+    assert asyncio.run(collect(policy, start_attempt, outcome)) == ["a", "b"]
+    assert len(started) == 3
+    assert outcome.retries == 2
+
+
+def test_client_error_is_not_retried():
+    policy = make_policy()
+    start_attempt, started = attempts_failing_with([LLMError(400, "bad request")])
+    with pytest.raises(LLMError):
+        asyncio.run(collect(policy, start_attempt))
+    assert len(started) == 1
+    assert policy.get_metrics()["failures"] == 1
+
+
+def test_gives_up_after_max_attempts():
+    policy = make_policy(max_attempts=2)
+    start_attempt, started = attempts_failing_with([LLMError(502, "x"), LLMError(502, "y"), LLMError(502, "z")])
+    with pytest.raises(LLMError) as raised:
+        asyncio.run(collect(policy, start_attempt))
+    assert raised.value.message == "y"
+    assert len(started) == 2
+
+
+def test_backoff_delay_follows_retry_after_even_above_backoff_max():
+    policy = make_policy(backoff_max=1.0)
+    assert policy.backoff_delay(0, LLMError(429, "slow down", retry_after=7.5)) == 7.5
+    assert policy.backoff_delay(0, LLMError(429, "slow down", retry_after=-3)) == 0.0
+    for retry_index in range(5):
+        cap = min(1.0, 0.01 * 2 ** retry_index)
+        assert cap / 2 <= policy.backoff_delay(retry_index, LLMError(503, "busy")) <= cap
+
+
+def test_waits_for_retry_after_before_retrying():
+    policy = make_policy()
+    start_attempt, started = attempts_failing_with([LLMError(429, "slow down", retry_after=0.2)])
+    begin = time.monotonic()
+    assert asyncio.run(collect(policy, start_attempt)) == ["a", "b"]
+    assert time.monotonic() - begin >= 0.2
+    assert len(started) == 2
+
+
+def test_retry_after_beyond_deadline_fails_without_sleeping():
+    policy = make_policy(deadline=1.0)
+    start_attempt, started = attempts_failing_with([LLMError(429, "slow down", retry_after=30)])
+    begin = time.monotonic()
+    with pytest.raises(LLMError):
+        asyncio.run(collect(policy, start_attempt))
+    assert time.monotonic() - begin < 0.5
+    assert len(started) == 1
+
+
+def test_deadline_stops_an_attempt_that_never_responds():
+    policy = make_policy(deadline=0.2)
+    closed: List[int] = []
+
+    def start_attempt(remaining: float):
+        async def attempt():
+            try:
+                await asyncio.sleep(60)
+                yield "late"
+            finally:
+                closed.append(0)
+        return attempt()
+
+    begin = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(collect(policy, start_attempt))
+    assert time.monotonic() - begin < 1.0
+    assert closed == [0]
+    assert policy.get_metrics()["deadline_exceeded"] == 1
+
+
+def test_attempt_receives_remaining_deadline():
+    policy = make_policy(deadline=2.0)
+    start_attempt, started = attempts_failing_with([LLMError(503, "busy")])
+    asyncio.run(collect(policy, start_attempt))
+    assert 1.5 < started[0] <= 2.0
+    assert started[1] < started[0]
+
+
+HEDGE_DELAY = 0.1
+
+
+def make_hedging_policy(**overrides) -> ResiliencePolicy:
+    """已积累足够延迟样本的对冲策略：首item超过HEDGE_DELAY时发出对冲request"""
+    settings = dict(hedge_enabled=True, hedge_min_samples=5, hedge_min_delay=0.01)
+    settings.update(overrides)
+    policy = make_policy(**settings)
+    policy._latencies.extend([HEDGE_DELAY] * 5)
+    return policy
+
+
+class HedgeAttempts:
+    """第n次attempt在delays[n]秒后output首item（为(秒数, 异常)时到时抛出），每次attempt都占用一个admissionslot"""
+
+    def __init__(self, delays: list, admission: AdmissionController):
+        self.delays = delays
+        self.admission = admission
+        self.started: List[float] = []
+        self.closed: List[int] = []
+
+    def __call__(self, remaining: float):
+        index = len(self.started)
+        self.started.append(time.monotonic())
+
+        async def attempt():
+            try:
+                async with self.admission.async_slot():
+                    delay = self.delays[index]
+                    if isinstance(delay, tuple):
+                        await asyncio.sleep(delay[0])
+                        raise delay[1]
+                    await asyncio.sleep(delay)
+                    yield f"attempt {index}"
+                    yield "done"
+            finally:
+                self.closed.append(index)
+        return attempt()
+
+
+@pytest.fixture
+def admission(monkeypatch) -> AdmissionController:
+    controller = AdmissionController("test", max_in_flight=4, max_queue=10, queue_timeout=5.0)
+    monkeypatch.setattr(resilience, "llm_admission", controller)
+    return controller
+
+
+def test_hedge_fires_after_percentile_delay_and_wins(admission):
+    policy = make_hedging_policy()
+    assert policy.hedge_delay() == HEDGE_DELAY
+    attempts = HedgeAttempts([5.0, 0.01], admission)
+    outcome = AttemptOutcome()
+
+    begin = time.monotonic()
+    assert asyncio.run(collect(policy, attempts, outcome)) == ["attempt 1", "done"]
+    assert time.monotonic() - begin < 1.0
+    assert attempts.started[1] - attempts.started[0] >= HEDGE_DELAY
+    assert outcome.hedged and outcome.attempts == 2
+    metrics = policy.get_metrics()
+    assert (metrics["hedges"], metrics["hedge_wins"]) == (1, 1)
+
+
+def test_losing_attempt_is_closed_and_its_slot_released(admission):
+    policy = make_hedging_policy()
+    attempts = HedgeAttempts([5.0, 0.01], admission)
+
+    async def main():
+        stream = policy.stream(attempts)
+        first = await stream.__anext__()
+        # 获胜attempt仍在output时，落败的主request已关闭并归还slot
+        in_flight = admission.get_metrics()["in_flight"]
+        rest = [item async for item in stream]
+        return [first] + rest, in_flight
+
+    items, in_flight = asyncio.run(main())
+    assert items == ["attempt 1", "done"]
+    assert attempts.closed == [0, 1]
+    assert in_flight == 1
+    assert admission.get_metrics()["in_flight"] == 0
+
+
+def test_primary_winning_before_hedge_delay_sends_no_hedge(admission):
+    policy = make_hedging_policy()
+    attempts = HedgeAttempts([0.01, 0.01], admission)
+    outcome = AttemptOutcome()
+    assert asyncio.run(collect(policy, attempts, outcome)) == ["attempt 0", "done"]
+    assert len(attempts.started) == 1
+    assert not outcome.hedged
+    assert policy.get_metrics()["hedges"] == 0
+
+
+def test_no_hedge_when_admission_has_no_capacity(admission, monkeypatch):
+    policy = make_hedging_policy()
+    monkeypatch.setattr(admission, "has_capacity", lambda: False)
+    attempts = HedgeAttempts([HEDGE_DELAY * 3, 0.01], admission)
+    outcome = AttemptOutcome()
+    assert asyncio.run(collect(policy, attempts, outcome)) == ["attempt 0", "done"]
+    assert len(attempts.started) == 1
+    assert not outcome.hedged
+    assert policy.get_metrics()["hedges"] == 0
+
+
+def test_primary_failing_while_hedge_in_flight_returns_hedge(admission):
+    policy = make_hedging_policy()
+    # 主request在对冲发出后才failed，对冲request随后output，不应触发retry
+    attempts = HedgeAttempts([(HEDGE_DELAY * 2, LLMError(503, "busy")), HEDGE_DELAY * 2], admission)
+    outcome = AttemptOutcome()
+    assert asyncio.run(collect(policy, attempts, outcome)) == ["attempt 1", "done"]
+    assert len(attempts.started) == 2
+    assert outcome.hedged and outcome.retries == 0
+    assert attempts.closed == [0, 1]
+    assert admission.get_metrics()["in_flight"] == 0
+    assert policy.get_metrics()["hedge_wins"] == 1
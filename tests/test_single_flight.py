@@ -0,0 +1,160 @@
+"""SingleFlight：合并相同request、跟随者离开not影响上游、全部离开才取消上游、error传给所有调用方"""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+class Upstream:
+    """可控的上游stream：每次release()产出一个累计快照"""
+
+    def __init__(self, steps: int = 3):
+        self.steps = steps
+        self.started = 0
+        self.closed = False
+        self.cancelled = False
+        self._step = asyncio.Event()
+
+    def release(self):
+        self._step.set()
+
+    async def run(self):
+        self.started += 1
+        try:
+            for index in range(1, self.steps + 1):
+                await self._step.wait()
+                self._step.clear()
+                yield f"part {index}"
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        finally:
+            self.closed = True
+
+
+async def consume(flights: SingleFlight, key: str, upstream: Upstream, seen: List[str]) -> List[str]:
+    async for item in flights.stream(key, upstream.run):
+        seen.append(item)
+    return seen
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_identical_requests_share_one_upstream_call():
+    async def main():
+        flights, upstream = SingleFlight("test"), Upstream()
+        leader = asyncio.create_task(consume(flights, "k", upstream, []))
+        await settle()
+        follower = asyncio.create_task(consume(flights, "k", upstream, []))
+        await settle()
+        for _ in range(upstream.steps):
+            upstream.release()
+            await settle()
+        return await leader, await follower, upstream, flights.get_stats()
+
+    leader_seen, follower_seen, upstream, stats = asyncio.run(main())
+    assert upstream.started == 1
+    assert leader_seen[-1] == follower_seen[-1] == "part 3"
+    assert stats["leaders"] == 1 and stats["coalesced"] == 1 and stats["in_flight"] == 0
+
+
+def test_follower_cancellation_does_not_cancel_upstream():
+    async def main():
+        flights, upstream = SingleFlight("test"), Upstream()
+        leader = asyncio.create_task(consume(flights, "k", upstream, []))
+        await settle()
+        follower = asyncio.create_task(consume(flights, "k", upstream, []))
+        await settle()
+        upstream.release()
+        await settle()
+
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        assert not upstream.cancelled
+        assert flights.get_stats()["waiting_callers"] == 1
+
+        for _ in range(upstream.steps - 1):
+            upstream.release()
+            await settle()
+        return await leader, upstream, flights.get_stats()
+
+    leader_seen, upstream, stats = asyncio.run(main())
+    assert leader_seen[-1] == "part 3"
+    assert not upstream.cancelled
+    assert stats["abandoned"] == 0
+
+
+def test_leader_cancellation_keeps_upstream_for_follower():
+    async def main():
+        flights, upstream = SingleFlight("test"), Upstream()
+        leader = asyncio.create_task(consume(flights, "k", upstream, []))
+        await settle()
+        follower = asyncio.create_task(consume(flights, "k", upstream, []))
+        await settle()
+        leader.cancel()
+        await asyncio.gather(leader, return_exceptions=True)
+        for _ in range(upstream.steps):
+            upstream.release()
+            await settle()
+        return await follower, upstream
+
+    follower_seen, upstream = asyncio.run(main())
+    assert follower_seen[-1] == "part 3"
+    assert not upstream.cancelled
+
+
+def test_upstream_is_cancelled_when_every_caller_leaves():
+    async def main():
+        flights, upstream = SingleFlight("test"), Upstream()
+        callers = [asyncio.create_task(consume(flights, "k", upstream, [])) for _ in range(2)]
+        await settle()
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await settle()
+        return upstream, flights.get_stats()
+
+    upstream, stats = asyncio.run(main())
+    assert upstream.cancelled and upstream.closed
+    assert stats["abandoned"] == 1 and stats["in_flight"] == 0
+
+
+def test_upstream_error_reaches_every_caller():
+    async def failing():
+        yield "partial"
+        raise RuntimeError("upstream failed")
+
+    async def main():
+        flights = SingleFlight("test")
+
+        async def caller():
+            async for _ in flights.stream("k", failing):
+                await asyncio.sleep(0)
+
+        return await asyncio.gather(caller(), caller(), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert [str(result) for result in results] == ["upstream failed", "upstream failed"]
+
+
+def test_different_keys_do_not_coalesce():
+    async def main():
+        flights = SingleFlight("test")
+        first, second = Upstream(steps=1), Upstream(steps=1)
+        tasks = [asyncio.create_task(consume(flights, "a", first, [])),
+                 asyncio.create_task(consume(flights, "b", second, []))]
+        await settle()
+        first.release()
+        second.release()
+        await asyncio.gather(*tasks)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first.started == second.started == 1
@@ -0,0 +1,102 @@
+"""
+Token用量与成本statistics
+记录每次LLMCall的Enter/outputtoken、Generate速度和估算成本，按阶段和模型累计，
+并以Prometheus文本format输出供监控抓取。API未返回usage时按文本估算token数
+"""
+
+import threading
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import config, ModelEndpointConfig, UsageConfig
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class UsageTotals:
+    """一个(阶段, 模型, endpoint)组合的累计用量"""
+    calls: int = 0
+    estimated_calls: int = 0  # usage由文本估算的Call数
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    duration: float = 0.0  # Generate耗时合计（秒），用于计算平均tokens/s
+    cost: float = 0.0
+
+class UsageTracker:
+    """进程级用量计数器（线程安全，各事件循环共用）"""
+
+    def __init__(self, usage_config: UsageConfig):
+        self.config = usage_config
+        self._lock = threading.Lock()
+        self._totals: Dict[Tuple[str, str, str], UsageTotals] = {}
+
+    def estimate_cost(self, prompt_tokens: int, completion_tokens: int,
+                      endpoint: Optional[ModelEndpointConfig] = None) -> float:
+        """按endpoint价格（未configuration时用默认价格）估算成本"""
+        input_price = self.config.input_price
+        output_price = self.config.output_price
+        if endpoint is not None:
+            if endpoint.input_price is not None:
+                input_price = endpoint.input_price
+            if endpoint.output_price is not None:
+                output_price = endpoint.output_price
+        return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+    def record(self, stage: str, model: str, endpoint: str, prompt_tokens: int,
+               completion_tokens: int, duration: float, cost: float, estimated: bool = False):
+        key = (stage or "unknown", model or "unknown", endpoint or "direct")
+        with self._lock:
+            totals = self._totals.setdefault(key, UsageTotals())
+            totals.calls += 1
+            totals.estimated_calls += int(estimated)
+            totals.prompt_tokens += prompt_tokens
+            totals.completion_tokens += completion_tokens
+            totals.duration += duration
+            totals.cost += cost
+        logger.debug(f"🧮 [{key[0]}] {key[1]}@{key[2]}: {prompt_tokens} + {completion_tokens} tokens, "
+                     f"{cost:.6f} {self.config.currency}{'（估算）' if estimated else ''}")
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """按阶段/模型/endpoint分组的累计用量"""
+        with self._lock:
+            items = [(key, UsageTotals(**vars(totals))) for key, totals in self._totals.items()]
+        return [{
+            "stage": stage,
+            "model": model,
+            "endpoint": endpoint,
+            "calls": totals.calls,
+            "estimated_calls": totals.estimated_calls,
+            "prompt_tokens": totals.prompt_tokens,
+            "completion_tokens": totals.completion_tokens,
+            "tokens_per_second": round(totals.completion_tokens / totals.duration, 1) if totals.duration > 0 else 0.0,
+            "cost": round(totals.cost, 6),
+            "currency": self.config.currency
+        } for (stage, model, endpoint), totals in sorted(items)]
+
+    def render_prometheus(self) -> str:
+        """Prometheus文本format的计数器"""
+        metrics = [
+            ("vibedoc_llm_calls_total", "LLM calls", "calls"),
+            ("vibedoc_llm_estimated_usage_calls_total", "LLM calls whose usage was estimated from text", "estimated_calls"),
+            ("vibedoc_llm_prompt_tokens_total", "Prompt tokens sent to the LLM", "prompt_tokens"),
+            ("vibedoc_llm_completion_tokens_total", "Completion tokens received from the LLM", "completion_tokens"),
+            ("vibedoc_llm_generation_seconds_total", "Time spent generating completions", "duration"),
+            ("vibedoc_llm_cost_total", f"Estimated LLM cost in {self.config.currency}", "cost"),
+        ]
+        with self._lock:
+            items = sorted((key, UsageTotals(**vars(totals))) for key, totals in self._totals.items())
+        lines = []
+        for name, help_text, attr in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (stage, model, endpoint), totals in items:
+                labels = f'stage="{_escape(stage)}",model="{_escape(model)}",endpoint="{_escape(endpoint)}"'
+                lines.append(f"{name}{{{labels}}} {getattr(totals, attr)}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# 全局用量statistics
+usage_tracker = UsageTracker(config.usage)